@@ -0,0 +1,18 @@
+from django.urls import path
+from . import async_views
+
+
+# Mounted ahead of api/urls.py when ASYNC_VIEWS is on, so these paths are answered by
+# the async views and everything else falls through to the DRF views
+urlpatterns = [
+    path('makes/', async_views.make_list),
+    path('models/make/<int:make_id>/', async_views.carmodels_by_make),
+    path('models/model/<int:model_id>/', async_views.carmodels_by_model),
+    path('catalog/tree/', async_views.catalog_tree),
+    path('products/<int:product_id>/page/', async_views.product_page),
+    path('variants/<int:pk>/', async_views.variant_detail),
+    path('variants/product/<int:product_id>', async_views.variants_by_product),
+    path('variantimages/variant/<int:variant_id>', async_views.variant_images_by_variant),
+    path('stats/variant/<int:variant_id>/', async_views.stats_by_variant),
+    path('audiotracks/variant/<int:variant_id>/', async_views.audiotracks_by_variant),
+]
@@ -0,0 +1,279 @@
+import asyncio
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .cache import ScopedVersion, versioned_cache_page
+from .hierarchy import get_catalog_tree
+from .models import (
+    Make,
+    CarModel,
+    Product,
+    Variant,
+    VariantImage,
+    Stat,
+    AudioTrack
+)
+from .renderers import FastJSONRenderer
+from .serializers import (
+    MakeSerializer,
+    ModelSerializer,
+    VariantSerializer,
+    VariantImageSerializer,
+    StatSerializer,
+    AudioTrackSerializer,
+    ProductPageSerializer,
+    VariantPageSerializer
+)
+from .views import (
+    get_cached_content_type,
+    MakeListAPIView,
+    CatalogTreeView,
+    CarModelByMakeView,
+    CarModelByModelView,
+    ProductPageView,
+    VariantDetailView,
+    VariantListView,
+    VariantImagesByVariantView,
+    StatByVariantAPIView,
+    AudioTrackByVariantAPIView
+)
+
+# Async counterparts of the read views in views.py, for the ASGI deployment (see
+# core/asgi.py and ASYNC_VIEWS in settings). They return the same JSON as the DRF
+# views, keep the same versioned page cache, and never block the event loop.
+# Requests for anything but JSON are handed to the DRF view (see negotiated).
+
+renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type='application/json')
+
+
+# The body DRF's NotFound produces, so clients see the same 404 from either path
+def not_found(detail):
+    return json_response({'detail': detail}, status=404)
+
+
+def serialize(serializer_class, instance, request, many=False):
+    return serializer_class(instance, many=many, context={'request': request}).data
+
+
+# Serialized without the given nested fields, which the caller fills in from rows it
+# fetched itself
+def serialize_shallow(serializer_class, instance, request, exclude, many=False):
+    serializer = serializer_class(instance, many=many, context={'request': request})
+    fields = serializer.child.fields if many else serializer.fields
+    for name in exclude:
+        fields.pop(name)
+    return serializer.data
+
+
+negotiator = DefaultContentNegotiation()
+
+
+def negotiated(drf_view=None):
+    """
+    Content negotiation for an async view, as the DRF view it mirrors would do it. GET
+    and HEAD requests the JSON renderer answers are served by the async view; anything
+    else (the browsable API, ?format=, OPTIONS, other methods, requests for a page of
+    a paginated list) goes to drf_view, so either path sends the same responses. Both send `Vary: Accept` and `Allow`. A view
+    with no DRF counterpart only renders JSON and answers 406 otherwise.
+    """
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES if drf_view else [FastJSONRenderer]
+    allowed_methods = 'GET, HEAD'
+    pagination_class = None
+    if drf_view:
+        view = drf_view.view_class(**drf_view.view_initkwargs)
+        view.setup(None)  # adds head() as as_view() does
+        allowed_methods = ', '.join(view.allowed_methods)
+        pagination_class = getattr(view, 'pagination_class', None)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            try:
+                selected, _ = negotiator.select_renderer(
+                    Request(request), [renderer_class() for renderer_class in renderer_classes]
+                )
+            except NotAcceptable as e:
+                if drf_view:
+                    return await sync_to_async(drf_view)(request, *args, **kwargs)
+                response = json_response({'detail': e.detail}, status=406)
+            else:
+                if drf_view and (
+                    request.method not in ('GET', 'HEAD')
+                    or not isinstance(selected, FastJSONRenderer)
+                    or (hasattr(pagination_class, 'is_requested') and pagination_class.is_requested(request.GET))
+                ):
+                    return await sync_to_async(drf_view)(request, *args, **kwargs)
+                response = await view_func(request, *args, **kwargs)
+
+            response.headers.setdefault('Allow', allowed_methods)
+            patch_vary_headers(response, ('Accept',))
+            return response
+        return _wrapped_view
+    return decorator
+
+
+def _evaluate(queryset):
+    try:
+        return list(queryset)
+    finally:
+        close_old_connections()
+
+
+# Django's async ORM runs every query of a request on the same thread, one after the
+# other, so gathering those would not overlap anything. Parts of a composite response
+# are instead fetched on separate worker threads, each with its own connection.
+async def fetch(queryset):
+    return await sync_to_async(_evaluate, thread_sensitive=False)(queryset)
+
+
+@negotiated(MakeListAPIView.as_view())
+@require_safe
+@versioned_cache_page(Make)
+async def make_list(request):
+    makes = [make async for make in Make.objects.all()]
+    return json_response(serialize(MakeSerializer, makes, request, many=True))
+
+
+@negotiated(CatalogTreeView.as_view())
+@require_safe
+@versioned_cache_page(Make, CarModel)
+async def catalog_tree(request):
+    return json_response(await sync_to_async(get_catalog_tree)())
+
+
+@negotiated(CarModelByMakeView.as_view())
+@require_safe
+@versioned_cache_page(CarModel)
+async def carmodels_by_make(request, make_id):
+    content_type = await sync_to_async(get_cached_content_type)(Make)
+    queryset = CarModel.objects.filter(parent_id=make_id, parent_type=content_type).select_related('parent_type')
+    models = [model async for model in queryset]
+    if not models:
+        return not_found("CarModels not found for the given Make ID")
+    return json_response(serialize(ModelSerializer, models, request, many=True))
+
+
+@negotiated(CarModelByModelView.as_view())
+@require_safe
+@versioned_cache_page(CarModel)
+async def carmodels_by_model(request, model_id):
+    content_type = await sync_to_async(get_cached_content_type)(CarModel)
+    queryset = CarModel.objects.filter(parent_id=model_id, parent_type=content_type).select_related('parent_type')
+    models = [model async for model in queryset]
+    if not models:
+        return not_found("CarModels not found for the given Model ID")
+    return json_response(serialize(ModelSerializer, models, request, many=True))
+
+
+@negotiated(VariantListView.as_view())
+@require_safe
+@versioned_cache_page(Variant, Product)
+async def variants_by_product(request, product_id):
+    queryset = Variant.objects.filter(product_id=product_id).order_by('id').select_related('product')
+    variants = [variant async for variant in queryset]
+    return json_response(serialize(VariantSerializer, variants, request, many=True))
+
+
+@negotiated(VariantDetailView.as_view())
+@require_safe
+@versioned_cache_page(Variant, Product)
+async def variant_detail(request, pk):
+    try:
+        variant = await Variant.objects.select_related('product').aget(pk=pk)
+    except Variant.DoesNotExist:
+        return not_found("No Variant matches the given query.")
+    return json_response(serialize(VariantSerializer, variant, request))
+
+
+@negotiated(VariantImagesByVariantView.as_view())
+@require_safe
+@versioned_cache_page(VariantImage, ScopedVersion(VariantImage, 'variant', 'variant_id'))
+async def variant_images_by_variant(request, variant_id):
+    images = [image async for image in VariantImage.objects.filter(variant_id=variant_id).order_by('position', 'id')]
+    return json_response(serialize(VariantImageSerializer, images, request, many=True))
+
+
+@negotiated(StatByVariantAPIView.as_view())
+@require_safe
+@versioned_cache_page(Stat)
+async def stats_by_variant(request, variant_id):
+    stats = [stat async for stat in Stat.objects.filter(variant_id=variant_id)]
+    return json_response(serialize(StatSerializer, stats, request, many=True))
+
+
+@negotiated(AudioTrackByVariantAPIView.as_view())
+@require_safe
+@versioned_cache_page(AudioTrack)
+async def audiotracks_by_variant(request, variant_id):
+    tracks = [track async for track in AudioTrack.objects.filter(variant_id=variant_id)]
+    return json_response(serialize(AudioTrackSerializer, tracks, request, many=True))
+
+
+# A variant with its images, stats and audio tracks; the four queries run concurrently
+@negotiated()
+@require_safe
+@versioned_cache_page(Variant, Product, VariantImage, Stat, AudioTrack, ScopedVersion(VariantImage, 'variant', 'pk'))
+async def variant_full(request, pk):
+    variants, images, stats, tracks = await asyncio.gather(
+        fetch(Variant.objects.filter(pk=pk).select_related('product')),
+        fetch(VariantImage.objects.filter(variant_id=pk).order_by('position', 'id')),
+        fetch(Stat.objects.filter(variant_id=pk).order_by('id')),
+        fetch(AudioTrack.objects.filter(variant_id=pk).order_by('id')),
+    )
+    if not variants:
+        return not_found("No Variant matches the given query.")
+
+    data = serialize(VariantSerializer, variants[0], request)
+    data['images'] = serialize(VariantImageSerializer, images, request, many=True)
+    data['stats'] = serialize(StatSerializer, stats, request, many=True)
+    data['audio_tracks'] = serialize(AudioTrackSerializer, tracks, request, many=True)
+    return json_response(data)
+
+
+# Same response as ProductPageView. The product and its variants are fetched together,
+# then the images, stats and audio tracks of every variant together
+@negotiated(ProductPageView.as_view())
+@require_safe
+@versioned_cache_page(Product, Variant, VariantImage, Stat, AudioTrack, ScopedVersion(VariantImage, 'product', 'product_id'))
+async def product_page(request, product_id):
+    products, variants = await asyncio.gather(
+        fetch(Product.objects.filter(pk=product_id)),
+        fetch(Variant.objects.filter(product_id=product_id).order_by('id')),
+    )
+    if not products:
+        return not_found("No Product matches the given query.")
+
+    variant_ids = [variant.id for variant in variants]
+    images, stats, tracks = await asyncio.gather(
+        fetch(VariantImage.objects.filter(variant_id__in=variant_ids).order_by('position', 'id')),
+        fetch(Stat.objects.filter(variant_id__in=variant_ids).order_by('id')),
+        fetch(AudioTrack.objects.filter(variant_id__in=variant_ids).order_by('id')),
+    )
+
+    # Same output as ProductPageSerializer, assembled from the rows fetched above
+    children = (('images', VariantImageSerializer), ('stats', StatSerializer), ('audio_tracks', AudioTrackSerializer))
+    rows_by_variant = {variant.id: {name: [] for name, _ in children} for variant in variants}
+    for (name, _), rows in zip(children, (images, stats, tracks)):
+        for row in rows:
+            rows_by_variant[row.variant_id][name].append(row)
+
+    variant_data = serialize_shallow(VariantPageSerializer, variants, request, [name for name, _ in children], many=True)
+    for variant, data in zip(variants, variant_data):
+        for name, serializer_class in children:
+            data[name] = serialize(serializer_class, rows_by_variant[variant.id][name], request, many=True)
+    variant_data = [{name: data[name] for name in VariantPageSerializer.Meta.fields} for data in variant_data]
+
+    data = serialize_shallow(ProductPageSerializer, products[0], request, ['variants'])
+    data['variants'] = variant_data
+    return json_response({name: data[name] for name in ProductPageSerializer.Meta.fields})
@@ -0,0 +1,88 @@
+import logging
+import subprocess
+import numpy as np
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+
+try:
+    import imageio_ffmpeg  # ships a static ffmpeg build, for hosts without one installed
+except ImportError:
+    imageio_ffmpeg = None
+
+logger = logging.getLogger(__name__)
+
+# Enough points for a full-width player; each is the loudest sample in its slice, 0-100
+WAVEFORM_PEAKS = 600
+WAVEFORM_SCALE = 100
+# Peaks only need the envelope, so decode to low-rate mono
+DECODE_SAMPLE_RATE = 8000
+
+
+def ffmpeg_binary():
+    if settings.FFMPEG_BINARY:
+        return settings.FFMPEG_BINARY
+    if imageio_ffmpeg is not None:
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    return 'ffmpeg'
+
+
+def decode_track(data):
+    # ffmpeg reads any container/codec we upload and writes raw 16-bit mono PCM
+    result = subprocess.run(
+        [
+            ffmpeg_binary(), '-v', 'error', '-i', 'pipe:0',
+            '-ac', '1', '-ar', str(DECODE_SAMPLE_RATE), '-f', 's16le', 'pipe:1',
+        ],
+        input=data,
+        capture_output=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()[-500:]}")
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+def compute_peaks(samples, count=WAVEFORM_PEAKS):
+    if not len(samples):
+        return []
+    magnitudes = np.abs(samples.astype(np.int32))
+    slices = np.array_split(magnitudes, min(count, len(magnitudes)))
+    peaks = np.array([part.max() for part in slices], dtype=np.float64)
+    loudest = peaks.max()
+    if loudest:
+        peaks = peaks / loudest  # normalise so quiet recordings still draw a visible waveform
+    return [int(round(peak * WAVEFORM_SCALE)) for peak in peaks]
+
+
+def build_waveform(audio_track):
+    with default_storage.open(audio_track.track.name) as track_file:
+        data = track_file.read()
+    samples = decode_track(data)
+    fields = {
+        'peaks': compute_peaks(samples),
+        'duration': round(len(samples) / DECODE_SAMPLE_RATE, 3),
+        'size': len(data),
+    }
+
+    # Only if the file is still the one decoded; a replacement waits for the next build
+    type(audio_track).objects.filter(pk=audio_track.pk, track=audio_track.track.name).update(**fields)
+    for name, value in fields.items():
+        setattr(audio_track, name, value)
+    # Callers bump the AudioTrack version once for their whole batch
+    return fields
+
+
+def _build_in_background(audio_track):
+    try:
+        build_waveform(audio_track)
+    except Exception:
+        logger.exception("Could not build waveform for AudioTrack %s", audio_track.pk)
+    finally:
+        connection.close()
+
+
+# Queue waveform builds on a command's thread pool, so an import decodes each saved batch
+# while the next one uploads
+def schedule_waveforms(executor, audio_tracks):
+    return [executor.submit(_build_in_background, audio_track) for audio_track in audio_tracks]
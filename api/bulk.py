@@ -0,0 +1,179 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, Value, When
+from rest_framework.exceptions import ValidationError
+from .cache import bump_scoped_versions, bump_version
+from .models import Stat, Variant, VariantImage
+from .serializers import GalleryUpdateSerializer, StatBulkRowSerializer
+
+BATCH_SIZE = 1000
+
+# Mirrors the limit enforced by Stat.save(), which bulk_create bypasses
+MAX_STATS_PER_VARIANT = 3
+
+STAT_VALUE_FIELDS = ('number', 'unit', 'additional')
+
+
+def import_stats(data, dry_run=False):
+    """
+    Creates or updates stats from a list of {variant, name, number, unit, additional}
+    rows, matched on (variant, name). Every row is checked against the variants, the
+    per-variant limit and name uniqueness with two queries in total, then written with
+    bulk_create/bulk_update in one transaction. One invalid row rejects the whole
+    import with a ValidationError listing the errors of each row, as a many=True
+    serializer would. Returns the created/updated/unchanged counts.
+    """
+    serializer = StatBulkRowSerializer(data=data, many=True)
+    serializer.is_valid(raise_exception=True)
+    rows = serializer.validated_data
+    errors = [{} for _ in rows]
+
+    with transaction.atomic():
+        # Locking the variants keeps concurrent imports from both passing the limit check
+        variant_ids = set(
+            Variant.objects.select_for_update().filter(id__in={row['variant'] for row in rows}).values_list('id', flat=True)
+        )
+        existing = {}
+        counts = defaultdict(int)
+        for stat in Stat.objects.filter(variant_id__in=variant_ids).only('id', 'variant_id', 'name', *STAT_VALUE_FIELDS):
+            existing[(stat.variant_id, stat.name)] = stat
+            counts[stat.variant_id] += 1
+
+        created = []
+        updated = []
+        unchanged = 0
+        seen = set()
+        for index, row in enumerate(rows):
+            key = (row['variant'], row['name'])
+            if row['variant'] not in variant_ids:
+                errors[index]['variant'] = [f'Invalid pk "{row["variant"]}" - object does not exist.']
+                continue
+            if key in seen:
+                errors[index]['name'] = ["Stat names must be unique within the same variant."]
+                continue
+            seen.add(key)
+
+            stat = existing.get(key)
+            if stat is None:
+                counts[row['variant']] += 1
+                created.append(Stat(variant_id=row['variant'], name=row['name'], **{field: row[field] for field in STAT_VALUE_FIELDS}))
+            elif any(getattr(stat, field) != row[field] for field in STAT_VALUE_FIELDS):
+                for field in STAT_VALUE_FIELDS:
+                    setattr(stat, field, row[field])
+                updated.append(stat)
+            else:
+                unchanged += 1
+
+        for index, row in enumerate(rows):
+            if counts[row['variant']] > MAX_STATS_PER_VARIANT and (row['variant'], row['name']) not in existing and not errors[index]:
+                errors[index]['non_field_errors'] = [f"A variant can only have {MAX_STATS_PER_VARIANT} stats."]
+
+        if any(errors):
+            raise ValidationError(errors)
+
+        if not dry_run:
+            Stat.objects.bulk_create(created, batch_size=BATCH_SIZE)
+            Stat.objects.bulk_update(updated, STAT_VALUE_FIELDS, batch_size=BATCH_SIZE)
+
+    if (created or updated) and not dry_run:
+        # bulk_create/bulk_update send no post_save, so invalidate cached responses here
+        bump_version(Stat)
+    return {'created': len(created), 'updated': len(updated), 'unchanged': unchanged}
+
+
+def update_galleries(data):
+    """
+    Reorders the galleries and switches the main images of many variants at once, from
+    a list of {variant, images, main} (see GalleryUpdateSerializer). Every image of
+    those variants is read and locked with one query, then only the rows that change
+    are written: one CASE UPDATE for positions and two UPDATEs for main images, all in
+    one transaction. Only the cached responses about the affected variants and their
+    products go stale, plus the image listing when positions changed and the listings
+    showing main images (the 'main_images' scope) when a main image, or the image
+    standing in for a missing one, changed.
+    """
+    serializer = GalleryUpdateSerializer(data=data, many=True)
+    serializer.is_valid(raise_exception=True)
+    items = serializer.validated_data
+    errors = [{} for _ in items]
+
+    with transaction.atomic():
+        variant_ids = set(
+            Variant.objects.filter(id__in={item['variant'] for item in items}).values_list('id', flat=True)
+        )
+        galleries = defaultdict(list)
+        products = {}
+        images = (
+            VariantImage.objects.select_for_update(of=('self',))
+            .filter(variant_id__in={item['variant'] for item in items})
+            .order_by('position', 'id')
+            .values_list('id', 'variant_id', 'variant__product_id', 'position', 'is_main')
+        )
+        for image_id, variant_id, product_id, position, is_main in images:
+            galleries[variant_id].append((image_id, position, is_main))
+            products[variant_id] = product_id
+
+        positions = {}
+        mains = {}
+        changed = set()
+        reordered = set()
+        seen = set()
+        for index, item in enumerate(items):
+            variant_id = item['variant']
+            if variant_id not in variant_ids:
+                errors[index]['variant'] = [f'Invalid pk "{variant_id}" - object does not exist.']
+                continue
+            if variant_id in seen:
+                errors[index]['variant'] = ["Each variant can only be listed once."]
+                continue
+            seen.add(variant_id)
+
+            gallery = galleries[variant_id]
+            image_ids = {image_id for image_id, _, _ in gallery}
+            unknown = [image_id for image_id in item.get('images', []) if image_id not in image_ids]
+            if unknown:
+                errors[index]['images'] = [f"Images {', '.join(map(str, unknown))} do not belong to variant {variant_id}."]
+            if 'main' in item and item['main'] not in image_ids:
+                errors[index]['main'] = [f"Image {item['main']} does not belong to variant {variant_id}."]
+            if errors[index]:
+                continue
+
+            if 'images' in item:
+                listed = set(item['images'])
+                order = item['images'] + [image_id for image_id, _, _ in gallery if image_id not in listed]
+                current = {image_id: position for image_id, position, _ in gallery}
+                for position, image_id in enumerate(order):
+                    if current[image_id] != position:
+                        positions[image_id] = position
+                        changed.add(variant_id)
+                        reordered.add(variant_id)
+            if 'main' in item and item['main'] not in {image_id for image_id, _, is_main in gallery if is_main}:
+                mains[variant_id] = item['main']
+                changed.add(variant_id)
+
+        if any(errors):
+            raise ValidationError(errors)
+
+        moves = list(positions.items())
+        for start in range(0, len(moves), BATCH_SIZE):
+            batch = moves[start:start + BATCH_SIZE]
+            VariantImage.objects.filter(id__in=[image_id for image_id, _ in batch]).update(
+                position=Case(*[When(id=image_id, then=Value(position)) for image_id, position in batch])
+            )
+        if mains:
+            # Unset the old main images first: the partial unique index allows one per variant
+            VariantImage.objects.filter(variant_id__in=mains, is_main=True).update(is_main=False)
+            VariantImage.objects.filter(id__in=mains.values()).update(is_main=True)
+
+    if changed:
+        # Queryset updates send no post_save, so invalidate cached responses here
+        bump_scoped_versions(VariantImage, 'variant', changed)
+        bump_scoped_versions(VariantImage, 'product', {products[variant_id] for variant_id in changed})
+    if positions:
+        # The image listing shows positions
+        bump_version(VariantImage, 'galleries')
+    if mains or any(not any(is_main for _, _, is_main in galleries[variant_id]) for variant_id in reordered):
+        # Product grids and image listings show the main image, or the first image in
+        # gallery order when a variant has none
+        bump_version(VariantImage, 'main_images')
+    return {'variants': len(changed), 'reordered': len(positions), 'main_switched': len(mains)}
@@ -0,0 +1,221 @@
+import hashlib
+import time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from core.db_router import pin_primary_after_write
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, quote_etag
+from .compression import available_encodings, choose_encoding, compress
+
+# Cached responses are keyed by model versions, so edits show up immediately
+# and entries can live for a week
+CACHE_TIME = 60 * 60 * 24 * 7
+
+VERSION_KEY_PREFIX = 'cache_version:'
+
+# Bodies shorter than this are not worth compressing (same threshold as GZipMiddleware)
+MIN_COMPRESS_LENGTH = 200
+
+
+def version_key(model, scope=None):
+    key = f"{VERSION_KEY_PREFIX}{model._meta.label_lower}"
+    return f"{key}:{scope}" if scope is not None else key
+
+
+class ScopedVersion:
+    """
+    Version of the rows of a model that belong to one object, such as the images of
+    one variant, read from the view's URL kwarg. Bulk edits that know which objects
+    they touched bump these with bump_scoped_versions(), so only the responses about
+    those objects go stale instead of every response keyed by the model version.
+    Without a URL kwarg it is one named part of the model, bumped with
+    bump_version(model, scope).
+    """
+
+    def __init__(self, model, scope, url_kwarg=None):
+        self.model = model
+        self.scope = scope
+        self.url_kwarg = url_kwarg
+
+    def key(self, view_kwargs):
+        if self.url_kwarg is None:
+            return version_key(self.model, self.scope)
+        return version_key(self.model, f"{self.scope}:{view_kwargs[self.url_kwarg]}")
+
+
+# Versions are millisecond timestamps rather than plain counters: if a version key is
+# evicted and recreated it can never collide with a value an old entry was stored under
+def _now_ms():
+    return time.time_ns() // 1_000_000
+
+
+def get_versions(models, view_kwargs=None):
+    keys = [model.key(view_kwargs) if isinstance(model, ScopedVersion) else version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            initial = _now_ms()
+            versions[key] = initial if cache.add(key, initial, None) else cache.get(key, initial)
+    versions = [versions[key] for key in keys]
+    if versions:
+        pin_primary_after_write(max(versions))
+    return versions
+
+
+def bump_version(model, scope=None):
+    key = version_key(model, scope)
+    cache.set(key, max(_now_ms(), (cache.get(key) or 0) + 1), None)
+
+
+# For writes that may still be inside a transaction. A read racing it sees the old rows
+# and can cache them under the first bump, so the version is bumped again once the
+# write commits (at once, under autocommit).
+def bump_version_on_commit(model, scope=None):
+    bump_version(model, scope)
+    transaction.on_commit(lambda: bump_version(model, scope))
+
+
+def bump_scoped_versions(model, scope, ids):
+    keys = [version_key(model, f"{scope}:{pk}") for pk in ids]
+    versions = cache.get_many(keys)
+    now = _now_ms()
+    cache.set_many({key: max(now, versions.get(key, 0) + 1) for key in keys}, None)
+
+
+def versioned_key(name, models):
+    versions = '.'.join(str(version) for version in get_versions(models))
+    return f"{name}:{versions}"
+
+
+def request_digest(request):
+    # The Accept header picks the renderer, so it identifies the response alongside the URL
+    return hashlib.md5(
+        f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}".encode()
+    ).hexdigest()
+
+
+def set_validators(response, etag, last_modified):
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    # Let clients keep the body but revalidate every time; a 304 costs no database work
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def encoded_etag(etag, encoding):
+    # Each content coding is its own representation, so it needs its own strong ETag
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        representations = {encoded_etag(etag, encoding) for encoding in (None,) + available_encodings()}
+        for client_etag in parse_etags(if_none_match):
+            if client_etag == '*' or client_etag in representations:
+                return set_validators(HttpResponseNotModified(), client_etag, last_modified)
+        return None
+    response = get_conditional_response(request, last_modified=last_modified)
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+    return None
+
+
+# Cached responses are stored rendered, with gzip/brotli encodings computed once when
+# the entry is written, so hits are served without any per-request compression
+def cache_entry(response):
+    body = response.content
+    return {
+        'status': response.status_code,
+        'headers': list(response.items()),
+        'body': body,
+        'encoded': compress(body) if len(body) >= MIN_COMPRESS_LENGTH else {},
+    }
+
+
+def response_from_entry(request, entry):
+    encoding = choose_encoding(request, entry['encoded'])
+    response = HttpResponse(entry['encoded'][encoding] if encoding else entry['body'], status=entry['status'])
+    for header, value in entry['headers']:
+        response.headers[header] = value
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        response.headers['ETag'] = encoded_etag(response.headers['ETag'], encoding)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+# Conditional GET and cache lookup shared by the sync and async wrappers. Returns the
+# response to send, or None with what store_response needs once the view has run.
+def cached_response(request, models, view_kwargs):
+    versions = get_versions(models, view_kwargs)
+    token = '.'.join(str(version) for version in versions)
+    digest = request_digest(request)
+    etag = quote_etag(hashlib.md5(f"{digest}:{token}".encode()).hexdigest())
+    last_modified = max(versions) // 1000
+
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response, None
+
+    cache_key = f"response:{digest}:{token}"
+    entry = cache.get(cache_key)
+    if entry is not None:
+        return response_from_entry(request, entry), None
+    return None, (cache_key, etag, last_modified)
+
+
+def store_response(request, response, cache_key, etag, last_modified, timeout):
+    if response.status_code != 200 or response.streaming:
+        return response
+
+    set_validators(response, etag, last_modified)
+
+    def store(rendered):
+        entry = cache_entry(rendered)
+        cache.set(cache_key, entry, timeout)
+        # Replace the response so this request is also served compressed
+        return response_from_entry(request, entry)
+
+    if hasattr(response, 'render') and callable(response.render):
+        response.add_post_render_callback(store)
+        return response
+    return store(response)
+
+
+# Drop-in replacement for cache_page whose entries are invalidated by bumping the
+# version of any of the given models (or ScopedVersions) instead of waiting for the TTL.
+# The same versions drive a strong ETag and Last-Modified, so conditional GETs
+# get a 304 before the cache, the database or the serializer are touched.
+# Async views get an async wrapper that runs the cache I/O off the event loop.
+def versioned_cache_page(*models, timeout=CACHE_TIME):
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view_func(request, *args, **kwargs)
+
+                response, pending = await sync_to_async(cached_response, thread_sensitive=False)(request, models, kwargs)
+                if response is not None:
+                    return response
+                response = await view_func(request, *args, **kwargs)
+                return await sync_to_async(store_response, thread_sensitive=False)(
+                    request, response, *pending, timeout
+                )
+            return _wrapped_async_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            response, pending = cached_response(request, models, kwargs)
+            if response is not None:
+                return response
+            return store_response(request, view_func(request, *args, **kwargs), *pending, timeout)
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,149 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from .cache import VERSION_KEY_PREFIX
+
+_MISSING = object()
+
+
+class TwoTierCache(BaseCache):
+    """
+    A small bounded LRU inside each process (L1) in front of a cache shared by
+    every worker (L2). LOCATION is the CACHES alias of the shared tier.
+
+    Keys starting with one of L1_BYPASS_PREFIXES always go to L2. By default that
+    is the model version counters, so a version bump by any worker is seen at once
+    and the L1 entries keyed by the old version are simply never read again.
+    Other L1 entries expire after at most L1_TIMEOUT seconds.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 500))
+        self._l1_timeout = int(options.get('L1_TIMEOUT', 60))
+        self._bypass_prefixes = tuple(options.get('L1_BYPASS_PREFIXES', (VERSION_KEY_PREFIX,)))
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # L1 helpers. Values are pickled like LocMemCache does, so callers never share
+    # (and mutate) the same response object across requests.
+
+    def _l1_key(self, key, version):
+        return (key, self.version if version is None else version)
+
+    def _l1_get(self, key, version):
+        l1_key = self._l1_key(key, version)
+        with self._lock:
+            entry = self._l1.get(l1_key)
+            if entry is None:
+                return _MISSING
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self._l1[l1_key]
+                return _MISSING
+            self._l1.move_to_end(l1_key)
+        return pickle.loads(pickled)
+
+    def _l1_set(self, key, value, timeout, version):
+        if key.startswith(self._bypass_prefixes):
+            return
+        l1_timeout = self._l1_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            if timeout <= 0:
+                self._l1_delete(key, version)
+                return
+            l1_timeout = min(l1_timeout, timeout)
+
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        l1_key = self._l1_key(key, version)
+        with self._lock:
+            self._l1[l1_key] = (time.monotonic() + l1_timeout, pickled)
+            self._l1.move_to_end(l1_key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, key, version):
+        with self._lock:
+            self._l1.pop(self._l1_key(key, version), None)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        value = self._l1_get(key, version)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._l1_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self._l1_get(key, version)
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        if remaining:
+            shared_values = self.shared.get_many(remaining, version=version)
+            for key, value in shared_values.items():
+                self._l1_set(key, value, DEFAULT_TIMEOUT, version)
+            found.update(shared_values)
+        return found
+
+    def has_key(self, key, version=None):
+        if self._l1_get(key, version) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self._l1_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = self.shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed_keys:
+                self._l1_set(key, value, timeout, version)
+        return failed_keys
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._l1_set(key, value, timeout, version)
+        else:
+            self._l1_delete(key, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(key, version)
+        return self.shared.incr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(key, version)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._l1_delete(key, version)
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.shared.clear()
@@ -0,0 +1,40 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+# Content codings we precompute, in order of preference
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(body):
+    # mtime=0 keeps gzip output deterministic, so unchanged data compresses to identical bytes
+    encoded = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body, quality=11)
+    return encoded
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q=') and quality[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+# Best precomputed coding the client accepts, or None for the identity body
+def choose_encoding(request, encodings):
+    accepted = accepted_encodings(request)
+    for coding in ('br', 'gzip'):
+        if coding in encodings and (coding in accepted or '*' in accepted):
+            return coding
+    return None
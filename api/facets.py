@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.contrib.contenttypes.models import ContentType
+from .cache import CACHE_TIME, versioned_key
+from .models import Make, CarModel, Product, ProductMakeModelConnection
+
+FACET_MODELS = (Make, CarModel, Product, ProductMakeModelConnection)
+
+
+# Product -> ancestor index as bitmaps: bit i of a node's bitmap is set when
+# product_ids[i] sits under that make/model, directly or through a descendant.
+# Python ints are arbitrary-precision, so &, | and bit_count() do the set work in C.
+def build_facet_index():
+    make_type = ContentType.objects.get_for_model(Make)
+    model_type = ContentType.objects.get_for_model(CarModel)
+
+    product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+    positions = {product_id: position for position, product_id in enumerate(product_ids)}
+    make_ids = set(Make.objects.values_list('id', flat=True))
+
+    # A connection to a model also counts for every ancestor on its materialized path
+    model_chains = {}
+    for model_id, path in CarModel.objects.values_list('id', 'path'):
+        parts = [int(part) for part in path.split('/')[:-1]]
+        if parts:
+            model_chains[model_id] = (parts[0], parts[1:] + [model_id])
+
+    makes = {}
+    models = {}
+    connections = ProductMakeModelConnection.objects.values_list('product_id', 'parent_type_id', 'parent_id')
+    for product_id, parent_type_id, parent_id in connections:
+        bit = 1 << positions[product_id]
+        if parent_type_id == make_type.id and parent_id in make_ids:
+            makes[parent_id] = makes.get(parent_id, 0) | bit
+        elif parent_type_id == model_type.id and parent_id in model_chains:
+            make_id, chain = model_chains[parent_id]
+            makes[make_id] = makes.get(make_id, 0) | bit
+            for model_id in chain:
+                models[model_id] = models.get(model_id, 0) | bit
+
+    return {
+        'product_ids': product_ids,
+        'all': (1 << len(product_ids)) - 1,
+        'makes': makes,
+        'models': models,
+    }
+
+
+def get_facet_index():
+    cache_key = versioned_key('facet_index', FACET_MODELS)
+    index = cache.get(cache_key)
+    if index is None:
+        index = build_facet_index()
+        cache.set(cache_key, index, CACHE_TIME)
+    return index
+
+
+def union(bitmaps, ids):
+    result = 0
+    for node_id in ids:
+        result |= bitmaps.get(node_id, 0)
+    return result
+
+
+def bitmap_ids(index, bitmap):
+    product_ids = index['product_ids']
+    # Reversed binary digits put bit i at string position i; find() skips the zeros in C
+    bits = bin(bitmap)[:1:-1]
+    ids = []
+    position = bits.find('1')
+    while position != -1:
+        ids.append(product_ids[position])
+        position = bits.find('1', position + 1)
+    return ids
+
+
+def count_nodes(bitmaps, selection):
+    counts = {}
+    for node_id, bitmap in bitmaps.items():
+        count = (bitmap & selection).bit_count()
+        if count:
+            counts[node_id] = count
+    return counts
+
+
+def facet_search(make_ids, model_ids):
+    """
+    Selected ids are ORed within a facet and the two facets ANDed together; no
+    selection matches everything. Each node's count applies the selection of the
+    other facet only, so picking one make still shows counts for the rest.
+    Nodes without a matching product are left out.
+    """
+    index = get_facet_index()
+    make_filter = union(index['makes'], make_ids) if make_ids else index['all']
+    model_filter = union(index['models'], model_ids) if model_ids else index['all']
+
+    return {
+        'product_ids': bitmap_ids(index, make_filter & model_filter),
+        'makes': count_nodes(index['makes'], model_filter),
+        'models': count_nodes(index['models'], make_filter),
+    }
+
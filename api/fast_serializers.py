@@ -0,0 +1,102 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Fields whose to_representation() returns the database value unchanged
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+)
+
+
+class ValuesPlan:
+    """
+    Read-only fast path for a ModelSerializer: the serializer's fields are compiled
+    once into a plan of .values() lookups, and rows are mapped straight to the same
+    dicts the serializer would produce, skipping model instances and per-row field
+    introspection. Supports plain model fields, primary key relations and nested
+    (depth) serializers.
+    """
+
+    _plans = {}
+
+    def __init__(self, serializer_class):
+        self.lookups = []
+        self.steps = self._compile(serializer_class(), '')
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        plan = cls._plans.get(serializer_class)
+        if plan is None:
+            plan = cls._plans[serializer_class] = cls(serializer_class)
+        return plan
+
+    def _compile(self, serializer, prefix):
+        steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(f"{name}: dotted and '*' sources are not supported")
+
+            lookup = prefix + field.source
+            self.lookups.append(lookup)
+
+            if isinstance(field, serializers.ListSerializer):
+                raise ImproperlyConfigured(f"{name}: many=True nested serializers are not supported")
+            elif isinstance(field, serializers.BaseSerializer):
+                # The relation lookup itself yields the foreign key, used to emit None for empty relations
+                steps.append((name, lookup, self._compile(field, lookup + '__')))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                steps.append((name, lookup, None))
+            elif type(field) in IDENTITY_FIELDS:
+                steps.append((name, lookup, None))
+            elif isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField, serializers.FileField, serializers.SerializerMethodField)):
+                raise ImproperlyConfigured(f"{name}: {type(field).__name__} needs a model instance")
+            else:
+                steps.append((name, lookup, field.to_representation))
+        return steps
+
+    def values(self, queryset, *extra_lookups):
+        lookups = self.lookups + [lookup for lookup in extra_lookups if lookup not in self.lookups]
+        return queryset.values(*lookups)
+
+    def _build(self, steps, row):
+        data = {}
+        for name, lookup, convert in steps:
+            value = row[lookup]
+            if value is None:
+                data[name] = None
+            elif convert is None:
+                data[name] = value
+            elif isinstance(convert, list):
+                data[name] = self._build(convert, row)
+            else:
+                data[name] = convert(value)
+        return data
+
+    def serialize(self, rows):
+        steps = self.steps
+        return [self._build(steps, row) for row in rows]
+
+
+# ListAPIView.list() through a ValuesPlan; output matches the regular serializer
+class ValuesListMixin:
+    def list(self, request, *args, **kwargs):
+        plan = ValuesPlan.for_serializer(self.get_serializer_class())
+
+        # Cursor pagination reads its ordering fields from each row
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        queryset = plan.values(
+            self.filter_queryset(self.get_queryset()),
+            *[field.lstrip('-') for field in ordering]
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.serialize(page))
+        return Response(plan.serialize(queryset))
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.contrib.contenttypes.models import ContentType
+from .cache import CACHE_TIME, versioned_key
+from .models import Make, CarModel
+
+
+# CarModel.path of every model from {model id: (parent type id, parent id)}, resolved
+# in memory. Models with no reachable make, including cycles, get an empty path.
+def resolve_model_paths(parents, make_type_id):
+    paths = {}
+
+    def resolve(model_id):
+        if model_id in paths:
+            return paths[model_id]
+        # Mark as in progress so a cycle resolves to an empty path instead of recursing forever
+        paths[model_id] = ''
+        parent_type_id, parent_id = parents[model_id]
+        if parent_type_id == make_type_id:
+            path = f"{parent_id}/"
+        else:
+            parent_path = resolve(parent_id) if parent_id in parents else ''
+            path = f"{parent_path}{parent_id}/" if parent_path else ''
+        paths[model_id] = path
+        return path
+
+    for model_id in parents:
+        resolve(model_id)
+    return paths
+
+
+# Build the nested make -> model -> sub-model tree from two queries
+def build_catalog_tree():
+    make_type = ContentType.objects.get_for_model(Make)
+    model_type = ContentType.objects.get_for_model(CarModel)
+
+    makes = [
+        {'id': make_id, 'name': name, 'type': 'make', 'children': []}
+        for make_id, name in Make.objects.order_by('name').values_list('id', 'name')
+    ]
+    models = CarModel.objects.order_by('name').values_list('id', 'name', 'parent_type_id', 'parent_id')
+
+    # Index every node by (content type, id) so children can find their parent in O(1)
+    nodes = {(make_type.id, make['id']): make for make in makes}
+    for model_id, name, _, _ in models:
+        nodes[(model_type.id, model_id)] = {'id': model_id, 'name': name, 'type': 'model', 'children': []}
+
+    for model_id, _, parent_type_id, parent_id in models:
+        parent = nodes.get((parent_type_id, parent_id))
+        if parent is not None:
+            parent['children'].append(nodes[(model_type.id, model_id)])
+
+    return makes
+
+
+# The tree is only rebuilt after a Make/CarModel change bumps their cache versions
+def get_catalog_tree():
+    cache_key = versioned_key('catalog_tree', (Make, CarModel))
+    tree = cache.get(cache_key)
+    if tree is None:
+        tree = build_catalog_tree()
+        cache.set(cache_key, tree, CACHE_TIME)
+    return tree
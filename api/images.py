@@ -0,0 +1,122 @@
+import base64
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageFilter, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401  registers AVIF on Pillow builds without native support
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (320, 640, 1024, 1600)
+DERIVATIVE_QUALITY = {'AVIF': 50, 'WEBP': 75}
+DERIVATIVE_DIRECTORY = 'variant_images/derivatives/'
+PLACEHOLDER_WIDTH = 16
+
+
+# Modern formats this Pillow build can write, best compression first
+def derivative_formats():
+    Image.init()
+    return [image_format for image_format in ('AVIF', 'WEBP') if image_format in Image.SAVE]
+
+
+def placeholder_data_uri(image):
+    # A tiny blurred JPEG inlined in the API response while the real image loads
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    thumbnail = image.resize((PLACEHOLDER_WIDTH, height), Image.LANCZOS).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+# Pure function run in a worker process: original image bytes in, encoded derivatives out
+def render_derivatives(data):
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    # Never upscale; an image narrower than every width gets one derivative at its own size
+    widths = [width for width in DERIVATIVE_WIDTHS if width < image.width] or [image.width]
+    derivatives = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for image_format in derivative_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, quality=DERIVATIVE_QUALITY[image_format])
+            derivatives.append({
+                'width': width,
+                'height': height,
+                'format': image_format.lower(),
+                'data': buffer.getvalue(),
+            })
+    return {'derivatives': derivatives, 'placeholder': placeholder_data_uri(image)}
+
+
+# Only the media commands (build_image_derivatives, add_images) render derivatives, so
+# web processes never start this pool
+_process_pool = None
+
+
+def get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        # spawn rather than fork: the command creating the pool is already running threads
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _process_pool
+
+
+def delete_derivatives(derivatives):
+    for derivative in derivatives:
+        default_storage.delete(derivative['name'])
+
+
+def build_derivatives(variant_image):
+    with default_storage.open(variant_image.image.name) as image_file:
+        data = image_file.read()
+    rendered = get_process_pool().submit(render_derivatives, data).result()
+
+    stem = os.path.splitext(os.path.basename(variant_image.image.name))[0]
+    derivatives = []
+    for derivative in rendered['derivatives']:
+        name = default_storage.save(
+            f"{DERIVATIVE_DIRECTORY}{stem}-{derivative['width']}w.{derivative['format']}",
+            ContentFile(derivative['data']),
+        )
+        derivatives.append({key: value for key, value in derivative.items() if key != 'data'} | {'name': name})
+
+    # update() rather than save() so the post_save upload hook does not fire again
+    type(variant_image).objects.filter(pk=variant_image.pk).update(
+        derivatives=derivatives, placeholder=rendered['placeholder']
+    )
+    delete_derivatives(variant_image.derivatives)
+    variant_image.derivatives = derivatives
+    variant_image.placeholder = rendered['placeholder']
+    # Callers bump the VariantImage version once for their whole batch
+    return derivatives
+
+
+def _build_in_background(variant_image):
+    try:
+        build_derivatives(variant_image)
+    except Exception:
+        logger.exception("Could not build derivatives for VariantImage %s", variant_image.pk)
+    finally:
+        connection.close()
+
+
+# Queue derivative builds on a command's thread pool, e.g. for rows bulk_create just
+# wrote: bulk_create sends no post_save, and web processes never build derivatives
+def schedule_derivatives(executor, variant_images):
+    return [executor.submit(_build_in_background, variant_image) for variant_image in variant_images]
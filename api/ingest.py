@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import cached_property
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .cache import bump_version
+
+# Upload progress is written out at least this often, so a crash orphans few stored files
+CHECKPOINT_FLUSH_INTERVAL = 5  # seconds
+CHECKPOINT_FLUSH_UPLOADS = 50
+
+
+@dataclass
+class IngestJob:
+    source_path: str
+    # Model field values for the row, apart from the file itself
+    fields: dict = field(default_factory=dict)
+    # pk of a row this file supersedes, deleted in the transaction that creates the new row
+    replaces: int = None
+
+    @cached_property
+    def key(self):
+        # A changed file (size or mtime) is treated as a new upload
+        stat = os.stat(self.source_path)
+        return f"{os.path.abspath(self.source_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class Checkpoint:
+    """
+    JSON manifest of source files already uploaded ('name') and already written to
+    the database ('saved'), so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path) as checkpoint_file:
+                self.entries = json.load(checkpoint_file)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+        self.unflushed = 0
+        self.flushed_at = time.monotonic()
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def mark_uploaded(self, key, name):
+        with self.lock:
+            self.entries[key] = {'name': name, 'saved': False}
+            self.unflushed += 1
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def mark_saved(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries[key]['saved'] = True
+
+    def flush_if_due(self):
+        with self.lock:
+            due = self.unflushed >= CHECKPOINT_FLUSH_UPLOADS or (
+                self.unflushed and time.monotonic() - self.flushed_at >= CHECKPOINT_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            data = json.dumps(self.entries)
+            self.unflushed = 0
+            self.flushed_at = time.monotonic()
+        # Write to a temporary file first so a crash never leaves a truncated checkpoint
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w') as checkpoint_file:
+            checkpoint_file.write(data)
+        os.replace(temporary_path, self.path)
+
+
+class MediaIngestor:
+    """
+    Uploads files to the default storage through a bounded thread pool and writes
+    their rows with bulk_create in batches. Only storage I/O happens in the worker
+    threads; all database writes stay on the calling thread. on_saved, if given, is
+    called with the instances of each batch once they are written.
+    """
+
+    def __init__(self, model, file_field, checkpoint, workers=8, batch_size=200, log=print, on_saved=None):
+        self.model = model
+        self.file_field = model._meta.get_field(file_field)
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.batch_size = batch_size
+        self.log = log
+        self.on_saved = on_saved
+        self.uploaded_files = 0
+        self.uploaded_bytes = 0
+        self.saved_rows = 0
+        self.start = None
+
+    def upload(self, job):
+        name = self.file_field.generate_filename(None, os.path.basename(job.source_path))
+        with open(job.source_path, 'rb') as source_file:
+            name = default_storage.save(name, File(source_file))
+        self.checkpoint.mark_uploaded(job.key, name)
+        return os.path.getsize(job.source_path)
+
+    def run(self, jobs):
+        self.start = time.perf_counter()
+        batch = []
+        skipped = 0
+
+        def add_row(job, name):
+            batch.append((job, self.model(**job.fields, **{self.file_field.name: name})))
+            if len(batch) >= self.batch_size:
+                self.save_batch(batch)
+
+        pending = iter(jobs)
+        in_flight = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while True:
+                    # Keep at most two uploads per worker queued so memory stays bounded
+                    while len(in_flight) < self.workers * 2:
+                        job = next(pending, None)
+                        if job is None:
+                            break
+                        entry = self.checkpoint.get(job.key)
+                        if entry and entry['saved']:
+                            skipped += 1
+                        elif entry:
+                            add_row(job, entry['name'])  # uploaded before the last run stopped
+                        else:
+                            in_flight[executor.submit(self.upload, job)] = job
+
+                    if not in_flight:
+                        break
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = in_flight.pop(future)
+                        try:
+                            self.uploaded_bytes += future.result()
+                            self.uploaded_files += 1
+                        except Exception as e:
+                            self.log(f"Error uploading {job.source_path}: {e}")
+                            continue
+                        add_row(job, self.checkpoint.get(job.key)['name'])
+                    # Uploads between two batches are recorded too, or a crash would orphan them
+                    self.checkpoint.flush_if_due()
+
+            if batch:
+                self.save_batch(batch)
+        finally:
+            # Whatever stopped the run, keep the record of the files already stored
+            self.checkpoint.flush()
+
+        if self.saved_rows:
+            # bulk_create sends no post_save, so invalidate cached responses here
+            bump_version(self.model)
+
+        self.log(f"Skipped {skipped} files already imported. {self.throughput()}")
+
+    def save_batch(self, batch):
+        # A crash between bulk_create and the checkpoint flush leaves rows the checkpoint
+        # still lists as unsaved. Each stored name belongs to exactly one upload (storage
+        # never overwrites), so rows already holding one of these names are not written again.
+        names = [getattr(instance, self.file_field.name).name for _, instance in batch]
+        existing = set(
+            self.model.objects.filter(**{f"{self.file_field.name}__in": names}).values_list(self.file_field.name, flat=True)
+        )
+        created = [instance for _, instance in batch if getattr(instance, self.file_field.name).name not in existing]
+        replaced = [job.replaces for job, _ in batch if job.replaces]
+        with transaction.atomic():
+            # The old row goes only once its replacement is uploaded; post_delete removes
+            # its stored file after this commits
+            self.model.objects.filter(id__in=replaced).delete()
+            self.model.objects.bulk_create(created)
+        self.checkpoint.mark_saved([job.key for job, _ in batch])
+        self.checkpoint.flush()
+        if self.on_saved and created:
+            # bulk_create sends no post_save, so follow-up work on the new rows starts here
+            self.on_saved(created)
+        self.saved_rows += len(created)
+        self.log(f"Saved {self.saved_rows} rows. {self.throughput()}")
+        batch.clear()
+
+    def throughput(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (
+            f"Uploaded {self.uploaded_files} files ({self.uploaded_bytes / 1e6:.1f} MB) in {elapsed:.1f}s: "
+            f"{self.uploaded_files / elapsed:.1f} files/s, {self.uploaded_bytes / 1e6 / elapsed:.2f} MB/s"
+        )
@@ -1,75 +1,86 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from django.core.management.base import BaseCommand
-from django.core.files import File
 from django.conf import settings
-from api.models import Variant, AudioTrack
+from api.audio import schedule_waveforms
+from api.cache import bump_version
+from api.ingest import Checkpoint
+from api.manifest import apply_diff, diff_audio, read_manifest, resolve_rows
+from api.models import AudioTrack
 import logging
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
-    help = 'Create AudioTrack records for each variant based on the audio folders, with filename parsing for names'
+    help = 'Sync AudioTrack records with the audio folders listed in the media manifest, with filename parsing for names'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--manifest', default=os.path.join(settings.BASE_DIR, 'data', 'variant_image_folders.xlsx'), help='Manifest .xlsx or .csv: product name, image folder, audio folder')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument('--workers', type=int, default=8, help='Parallel uploads')
+        parser.add_argument('--batch-size', type=int, default=200, help='Rows per bulk_create')
+        parser.add_argument('--waveform-workers', type=int, default=4, help='Tracks decoded in parallel as batches are saved (one ffmpeg process each)')
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, 'data', 'add_audio.checkpoint.json'), help='Resume manifest of files already imported')
+
+    def handle(self, *args, **options):
         # Path to the base directory where audio files are stored
         audio_base_path = os.path.join(settings.BASE_DIR, 'data', 'audio')
 
-        # Load the Excel file (replace this with the actual path if necessary)
-        excel_file_path = r'C:\Users\kavya\OneDrive\Desktop\Dev\zenrenne_backend\variant_image_folders.xlsx'
-
-        import pandas as pd
+        # The manifest is streamed. Nothing is written until all of it has been read, so a
+        # file that fails to read part way through still leaves everything untouched
+        folders = {}
         try:
-            df = pd.read_excel(excel_file_path)
+            for row, variants in resolve_rows(read_manifest(options['manifest'])):
+                if not row.audio_folder:
+                    self.stdout.write(self.style.WARNING(f"No audio folder found for product: {row.product_name}"))
+                    continue
+
+                if row.product_name not in variants:
+                    self.stdout.write(self.style.ERROR(f"Variant not found for product_name: {row.product_name}"))
+                    continue
+                variant = variants[row.product_name]
+                if variant is None:
+                    self.stdout.write(self.style.ERROR(f"Several variants have the product_name: {row.product_name}"))
+                    continue
+
+                # Path to the audio folder for this variant
+                variant_audio_folder_path = os.path.join(audio_base_path, row.audio_folder)
+
+                if not os.path.exists(variant_audio_folder_path):
+                    self.stdout.write(self.style.ERROR(f"Audio folder not found: {variant_audio_folder_path}"))
+                    continue
+
+                # List all .mp3 files in the folder
+                audio_files = [f for f in sorted(os.listdir(variant_audio_folder_path)) if f.endswith('.mp3')]
+
+                if not audio_files:
+                    self.stdout.write(self.style.WARNING(f"No audio files found in folder: {variant_audio_folder_path}"))
+                    continue
+
+                folders[variant] = [os.path.join(variant_audio_folder_path, audio_file) for audio_file in audio_files]
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error loading Excel file: {e}"))
+            self.stdout.write(self.style.ERROR(f"Error loading manifest: {e}"))
             return
 
-        # Iterate over the rows in the Excel file
-        for _, row in df.iterrows():
-            # Strip any extra spaces from the product_name
-            product_name = row[0].strip()
-            audio_folder = row[2]  # Third column for audio folder
-
-            if pd.isna(audio_folder):
-                self.stdout.write(self.style.WARNING(f"No audio folder found for product: {product_name}"))
-                continue
-
-            # Fetch the variant associated with this product_name
-            try:
-                variant = Variant.objects.get(product_name=product_name)
-            except Variant.DoesNotExist:
-                self.stdout.write(self.style.ERROR(f"Variant not found for product_name: {product_name}"))
-                continue
-
-            # Path to the audio folder for this variant
-            variant_audio_folder_path = os.path.join(audio_base_path, audio_folder)
-
-            if not os.path.exists(variant_audio_folder_path):
-                self.stdout.write(self.style.ERROR(f"Audio folder not found: {variant_audio_folder_path}"))
-                continue
-
-            # List all .mp3 files in the folder
-            audio_files = [f for f in sorted(os.listdir(variant_audio_folder_path)) if f.endswith('.mp3')]
-
-            if not audio_files:
-                self.stdout.write(self.style.WARNING(f"No audio files found in folder: {variant_audio_folder_path}"))
-                continue
-
-            # Create AudioTrack records for the variant
-            for audio_file in audio_files:
-                audio_path = os.path.join(variant_audio_folder_path, audio_file)
-                
-                # Derive the name from the filename (without extension), replace underscores with spaces, and capitalize
-                name = os.path.splitext(audio_file)[0].replace('_', ' ').title()
-
-                with open(audio_path, 'rb') as audio_file_obj:
-                    audio_track = AudioTrack(
-                        variant=variant,
-                        name=name,
-                        track=File(audio_file_obj, name=audio_file)
-                    )
-                    audio_track.save()
-
-                    self.stdout.write(self.style.SUCCESS(f"Added audio track '{name}' for variant: {variant.product_name}"))
+        diff = diff_audio(folders, audio_base_path, log=lambda message: self.stdout.write(self.style.WARNING(message)))
+        self.stdout.write(self.style.SUCCESS(f"{len(folders)} variants in the manifest: {diff}"))
+        if options['dry_run']:
+            return
 
-            logger.info(f"Processed audio tracks for variant: {variant.product_name}")
\ No newline at end of file
+        logger.info(f"Importing {len(diff.jobs)} audio tracks, removing {len(diff.stale)}")
+        # Waveforms of each saved batch are decoded while the next batch uploads. Failed
+        # builds are logged and left to the build_waveforms command.
+        builds = []
+        with ThreadPoolExecutor(max_workers=options['waveform_workers']) as waveform_executor:
+            apply_diff(
+                AudioTrack, 'track', diff, Checkpoint(options['checkpoint']),
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                log=self.stdout.write,
+                on_saved=lambda tracks: builds.extend(schedule_waveforms(waveform_executor, tracks)),
+            )
+            if builds:
+                self.stdout.write(f"Waiting for the waveforms of {len(builds)} audio tracks")
+                wait(builds)
+                # Waveforms are written with update(), so invalidate cached responses once here
+                bump_version(AudioTrack)
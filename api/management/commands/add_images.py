@@ -1,81 +1,89 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from django.core.management.base import BaseCommand
-from django.core.files import File
 from django.conf import settings
-from api.models import Variant, VariantImage
+from api.cache import bump_version
+from api.images import schedule_derivatives
+from api.ingest import Checkpoint
+from api.manifest import apply_diff, diff_images, ensure_main_images, read_manifest, resolve_rows
+from api.models import VariantImage
 import logging
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
-    help = 'Create VariantImage records for each variant based on the image folders, skip if images already exist'
+    help = 'Sync VariantImage records with the image folders listed in the media manifest: only new, changed and removed images are applied'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--manifest', default=os.path.join(settings.BASE_DIR, 'data', 'variant_image_folders.xlsx'), help='Manifest .xlsx or .csv: product name, image folder, audio folder')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument('--workers', type=int, default=8, help='Parallel uploads')
+        parser.add_argument('--batch-size', type=int, default=200, help='Rows per bulk_create')
+        parser.add_argument('--derivative-workers', type=int, default=4, help='Images whose derivatives are built in parallel as batches are saved')
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, 'data', 'add_images.checkpoint.json'), help='Resume manifest of files already imported')
+
+    def handle(self, *args, **options):
         # Path to the base directory where images are stored
         images_base_path = os.path.join(settings.BASE_DIR, 'data', 'images')
 
-        # Load the Excel file (replace this with the actual path if necessary)
-        excel_file_path = r'C:\Users\kavya\OneDrive\Desktop\Dev\zenrenne_backend\variant_image_folders.xlsx'
-
-        import pandas as pd
+        # The manifest is streamed. Nothing is written until all of it has been read, so a
+        # file that fails to read part way through still leaves everything untouched
+        folders = {}
         try:
-            df = pd.read_excel(excel_file_path)
+            for row, variants in resolve_rows(read_manifest(options['manifest'])):
+                if not row.image_folder:
+                    self.stdout.write(self.style.WARNING(f"No image folder found for product: {row.product_name}"))
+                    continue
+
+                if row.product_name not in variants:
+                    self.stdout.write(self.style.ERROR(f"Variant not found for product_name: {row.product_name}"))
+                    continue
+                variant = variants[row.product_name]
+                if variant is None:
+                    self.stdout.write(self.style.ERROR(f"Several variants have the product_name: {row.product_name}"))
+                    continue
+
+                # Path to the image folder for this variant
+                variant_image_folder_path = os.path.join(images_base_path, row.image_folder)
+
+                if not os.path.exists(variant_image_folder_path):
+                    self.stdout.write(self.style.ERROR(f"Image folder not found: {variant_image_folder_path}"))
+                    continue
+
+                # List all .jpg files in the folder
+                image_files = [f for f in sorted(os.listdir(variant_image_folder_path)) if f.endswith('.jpg')]
+
+                if not image_files:
+                    self.stdout.write(self.style.WARNING(f"No image files found in folder: {variant_image_folder_path}"))
+                    continue
+
+                folders[variant] = [os.path.join(variant_image_folder_path, image_file) for image_file in image_files]
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error loading Excel file: {e}"))
+            self.stdout.write(self.style.ERROR(f"Error loading manifest: {e}"))
             return
 
-        # Iterate over the rows in the Excel file
-        for _, row in df.iterrows():
-            # Strip any extra spaces from the product_name
-            product_name = row[0].strip()
-            image_folder = row[1].strip()
-
-            if pd.isna(image_folder):
-                self.stdout.write(self.style.WARNING(f"No image folder found for product: {product_name}"))
-                continue
-
-            # Fetch the variant associated with this product_name
-            try:
-                variant = Variant.objects.get(product_name=product_name)
-            except Variant.DoesNotExist:
-                self.stdout.write(self.style.ERROR(f"Variant not found for product_name: {product_name}"))
-                continue
-
-            # Check if the variant already has images
-            if variant.images.exists():
-                self.stdout.write(self.style.WARNING(f"Variant '{product_name}' already has images, skipping."))
-                continue
-
-            # Path to the image folder for this variant
-            variant_image_folder_path = os.path.join(images_base_path, image_folder)
-
-            if not os.path.exists(variant_image_folder_path):
-                self.stdout.write(self.style.ERROR(f"Image folder not found: {variant_image_folder_path}"))
-                continue
-
-            # List all .jpg files in the folder
-            image_files = [f for f in sorted(os.listdir(variant_image_folder_path)) if f.endswith('.jpg')]
-
-            if not image_files:
-                self.stdout.write(self.style.WARNING(f"No image files found in folder: {variant_image_folder_path}"))
-                continue
-
-            # Create VariantImage records for the variant
-            for index, image_file in enumerate(image_files):
-                image_path = os.path.join(variant_image_folder_path, image_file)
-                is_main = index == 0  # The first image will be set as the main image
-
-                with open(image_path, 'rb') as img_file:
-                    variant_image = VariantImage(
-                        variant=variant,
-                        image=File(img_file, name=image_file),
-                        is_main=is_main
-                    )
-                    variant_image.save()
-
-                    if is_main:
-                        self.stdout.write(self.style.SUCCESS(f"Main image set for variant: {variant.product_name}"))
-                    else:
-                        self.stdout.write(self.style.SUCCESS(f"Added image for variant: {variant.product_name}"))
+        diff = diff_images(folders, images_base_path)
+        self.stdout.write(self.style.SUCCESS(f"{len(folders)} variants in the manifest: {diff}"))
+        if options['dry_run']:
+            return
 
-            logger.info(f"Processed images for variant: {variant.product_name}")
+        logger.info(f"Importing {len(diff.jobs)} images, removing {len(diff.stale)}")
+        # Derivatives of each saved batch are built while the next batch uploads. Failed
+        # builds are logged and left to the build_image_derivatives command.
+        builds = []
+        with ThreadPoolExecutor(max_workers=options['derivative_workers']) as derivative_executor:
+            apply_diff(
+                VariantImage, 'image', diff, Checkpoint(options['checkpoint']),
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                log=self.stdout.write,
+                on_saved=lambda images: builds.extend(schedule_derivatives(derivative_executor, images)),
+            )
+            promoted = ensure_main_images(folders)
+            if promoted:
+                self.stdout.write(f"Set the main image of {promoted} variants that had none")
+            if builds:
+                self.stdout.write(f"Waiting for the derivatives of {len(builds)} images")
+                wait(builds)
+                # Derivatives are written with update(), so invalidate cached responses once here
+                bump_version(VariantImage)
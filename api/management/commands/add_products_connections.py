@@ -1,77 +1,93 @@
+import time
 from django.core.management.base import BaseCommand
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from api.cache import bump_version
 from api.models import CarModel, Product, ProductMakeModelConnection, Make
 
+BATCH_SIZE = 1000
+
+
 class Command(BaseCommand):
     help = 'Create products for each last-level CarModel and add ProductMakeModelConnections'
 
-    def handle(self, *args, **kwargs):
-        # Get all CarModels that are not parents of any other models
-        all_car_models = CarModel.objects.all()
-        last_level_models = [
-            car_model for car_model in all_car_models
-            if not CarModel.objects.filter(parent_type=ContentType.objects.get_for_model(CarModel), parent_id=car_model.id).exists()
-        ]
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.start = self.stage_start = time.perf_counter()
 
-        self.stdout.write(self.style.SUCCESS(f"Found {len(last_level_models)} last-level models."))
-
-        for car_model in last_level_models:
-            try:
-                # Construct the product name
-                product_name = self.get_product_name(car_model)
+        # Load the whole hierarchy up front: the rest works in memory
+        make_type = ContentType.objects.get_for_model(Make)
+        model_type = ContentType.objects.get_for_model(CarModel)
+        makes = dict(Make.objects.values_list('id', 'name'))
+        models = {
+            model_id: (name, parent_type_id, parent_id, path)
+            for model_id, name, parent_type_id, parent_id, path in CarModel.objects.values_list(
+                'id', 'name', 'parent_type_id', 'parent_id', 'path'
+            )
+        }
+        self.stage(f"Loaded {len(makes)} makes and {len(models)} models")
 
-                # Create a Product
-                product = Product.objects.create(name=product_name)
-                self.stdout.write(self.style.SUCCESS(f"Created Product: {product_name}"))
+        # Leaves are the models no other model points to as its parent
+        parents = {parent_id for _, parent_type_id, parent_id, _ in models.values() if parent_type_id == model_type.id}
+        leaves = sorted(model_id for model_id in models if model_id not in parents)
+        self.stdout.write(self.style.SUCCESS(f"Found {len(leaves)} last-level models."))
 
-                # Create ProductMakeModelConnections
-                self.create_connections(product, car_model)
-                self.stdout.write(self.style.SUCCESS(f"Created ProductMakeModelConnections for Product: {product_name}"))
+        products = {}
+        for model_id in leaves:
+            try:
+                make_id, chain = self.ancestor_chain(model_id, models, makes)
+            except ValueError as e:
+                self.stdout.write(self.style.ERROR(f"Error processing CarModel {model_id}: {e}"))
+                continue
+            # The make, then the models from bottom to top
+            name = ' '.join([makes[make_id]] + [models[chain_id][0] for chain_id in reversed(chain)])
+            if name in products:
+                self.stdout.write(self.style.WARNING(f"CarModel {model_id} has the same product name as CarModel {products[name][1][-1]}: {name}"))
+                continue
+            products[name] = (make_id, chain)
+        self.stage(f"Computed {len(products)} product names and ancestor chains")
 
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error processing CarModel {car_model.id}: {str(e)}"))
+        with transaction.atomic():
+            # Reruns reuse the products that already exist under the same name
+            existing = dict(Product.objects.filter(name__in=products).values_list('name', 'id'))
+            new_products = Product.objects.bulk_create(
+                [Product(name=name) for name in products if name not in existing], batch_size=BATCH_SIZE
+            )
+            product_ids = {**existing, **{product.name: product.id for product in new_products}}
+            if self.verbosity > 1:
+                for product in new_products:
+                    self.stdout.write(f"Created Product: {product.name}")
+            self.stage(f"Created {len(new_products)} products, {len(existing)} already existed")
 
-    def get_product_name(self, car_model):
-        # Build the product name
-        name_parts = []
+            connections = []
+            for name, (make_id, chain) in products.items():
+                connections.append(ProductMakeModelConnection(product_id=product_ids[name], parent_type_id=make_type.id, parent_id=make_id))
+                connections.extend(
+                    ProductMakeModelConnection(product_id=product_ids[name], parent_type_id=model_type.id, parent_id=model_id)
+                    for model_id in chain
+                )
+            before = ProductMakeModelConnection.objects.count()
+            # Connections that already exist hit the unique constraint and are skipped
+            ProductMakeModelConnection.objects.bulk_create(connections, batch_size=BATCH_SIZE, ignore_conflicts=True)
+            created = ProductMakeModelConnection.objects.count() - before
+            self.stage(f"Created {created} ProductMakeModelConnections, {len(connections) - created} already existed")
 
-        # Add the make and models from bottom to top
-        current_model = car_model
-        while current_model:
-            name_parts.append(current_model.name)
-            if isinstance(current_model, CarModel) and current_model.parent_type:
-                parent_model = current_model.parent_type.model_class()
-                if parent_model:
-                    try:
-                        current_model = parent_model.objects.get(id=current_model.parent_id)
-                    except parent_model.DoesNotExist:
-                        self.stdout.write(self.style.ERROR(f"Parent CarModel not found: ID={current_model.parent_id}, Type={parent_model}"))
-                        break
-                else:
-                    break
-            elif isinstance(current_model, Make):
-                break
-            else:
-                break
+        # bulk_create sends no post_save, so invalidate cached responses here
+        bump_version(Product)
+        bump_version(ProductMakeModelConnection)
+        self.stdout.write(self.style.SUCCESS(f"Catalog built in {time.perf_counter() - self.start:.2f}s"))
 
-        make = name_parts.pop()
-        return make + ' ' + ' '.join(name_parts)
+    def ancestor_chain(self, model_id, models, makes):
+        # Read from the materialized path: (make id, [top-level model, ..., model_id])
+        path = models[model_id][3]
+        if not path:
+            raise ValueError("CarModel has no make (run rebuild_model_paths if its path is out of date)")
+        make_id, *ancestor_ids = [int(part) for part in path.split('/')[:-1]]
+        if make_id not in makes or any(ancestor_id not in models for ancestor_id in ancestor_ids):
+            raise ValueError(f"CarModel path {path} refers to a missing make or model")
+        return make_id, ancestor_ids + [model_id]
 
-    def create_connections(self, product, car_model):
-        # Create ProductMakeModelConnections up the hierarchy
-        current_model = car_model
-        while current_model:
-            try:
-                ProductMakeModelConnection.objects.create(
-                    product=product,
-                    parent_type=ContentType.objects.get_for_model(current_model),
-                    parent_id=current_model.id
-                )
-                if isinstance(current_model, Make):
-                    break
-                else:
-                    parent_model = current_model.parent_type.model_class()
-                    current_model = parent_model.objects.get(id=current_model.parent_id)
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error creating connection for Product: {product.name}, CarModel ID={current_model.id}: {str(e)}"))
-                break
+    def stage(self, message):
+        now = time.perf_counter()
+        self.stdout.write(f"{message} ({(now - self.stage_start) * 1000:.0f} ms)")
+        self.stage_start = now
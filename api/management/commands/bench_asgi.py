@@ -0,0 +1,140 @@
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Make, Product, Variant
+
+SERVER_COMMANDS = {
+    'wsgi': ['core.wsgi'],
+    'asgi': ['core.asgi', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark throughput under concurrent load: gunicorn sync workers (WSGI) against uvicorn workers with the async views (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes in both modes')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--cached', action='store_true', help='Keep the configured response cache; by default it is disabled so every request runs the view')
+
+    def handle(self, *args, **options):
+        paths = self.benchmark_paths()
+        if not paths:
+            raise CommandError("No catalog data to benchmark against")
+        self.stdout.write(f"{len(paths)} endpoints, {options['requests']} requests, concurrency {options['concurrency']}, {options['workers']} workers")
+
+        bodies = {}
+        for mode in SERVER_COMMANDS:
+            server = self.start_server(mode, options)
+            try:
+                bodies[mode] = {path: self.request(options['port'], path)[1] for path in paths}  # warm up
+                self.report(mode, self.load(options, paths))
+            finally:
+                server.terminate()
+                server.wait()
+
+        for path in paths:
+            if bodies['wsgi'][path] != bodies['asgi'][path]:
+                self.stdout.write(self.style.ERROR(f"{path}: WSGI and ASGI responses differ"))
+
+    # The read endpoints a product page visit hits, on real ids from the database
+    def benchmark_paths(self):
+        make = Make.objects.order_by('id').first()
+        product = Product.objects.filter(variants__isnull=False).order_by('id').first()
+        variant = Variant.objects.order_by('id').first()
+        if not (make and product and variant):
+            return []
+        return [
+            '/api/makes/',
+            '/api/catalog/tree/',
+            f'/api/models/make/{make.id}/',
+            f'/api/products/{product.id}/page/',
+            f'/api/variants/product/{product.id}',
+            f'/api/variants/{variant.id}/',
+            f'/api/variants/{variant.id}/full/',
+            f'/api/variantimages/variant/{variant.id}',
+            f'/api/stats/variant/{variant.id}/',
+            f'/api/audiotracks/variant/{variant.id}/',
+        ]
+
+    def start_server(self, mode, options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+        env['ASYNC_VIEWS'] = 'true' if mode == 'asgi' else 'false'
+        if not options['cached']:
+            env['CACHE_BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+            env['CACHE_L1_MAX_ENTRIES'] = '0'
+
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *SERVER_COMMANDS[mode],
+             '--workers', str(options['workers']), '--bind', f"127.0.0.1:{options['port']}",
+             '--log-level', 'warning'],
+            env=env,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                self.request(options['port'], '/api/makes/')
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"{mode} server did not start")
+
+    def request(self, port, path, connection=None):
+        connection = connection or http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        connection.request('GET', path, headers={'Accept': 'application/json'})
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def load(self, options, paths):
+        local = threading.local()
+        counter = iter(range(options['requests']))
+        lock = threading.Lock()
+        latencies = []
+        errors = []
+
+        def worker():
+            local.connection = http.client.HTTPConnection('127.0.0.1', options['port'], timeout=60)
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                path = paths[index % len(paths)]
+                start = time.perf_counter()
+                try:
+                    status, _ = self.request(options['port'], path, local.connection)
+                except (OSError, http.client.HTTPException) as e:
+                    local.connection = http.client.HTTPConnection('127.0.0.1', options['port'], timeout=60)
+                    errors.append(f"{path}: {e}")
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if status != 200:
+                        errors.append(f"{path}: HTTP {status}")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for _ in range(options['concurrency']):
+                executor.submit(worker)
+        return time.perf_counter() - start, latencies, errors
+
+    def report(self, mode, result):
+        elapsed, latencies, errors = result
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(self.style.SUCCESS(
+            f"{mode.upper()}: {len(latencies) / elapsed:.0f} req/s, p50 {quantiles[49] * 1000:.1f} ms, "
+            f"p95 {quantiles[94] * 1000:.1f} ms, p99 {quantiles[98] * 1000:.1f} ms, {len(errors)} errors"
+        ))
+        for error in errors[:5]:
+            self.stdout.write(self.style.ERROR(error))
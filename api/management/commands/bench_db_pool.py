@@ -0,0 +1,82 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.utils import ConnectionHandler
+from api.models import Make
+from core.db_pool import pool_stats
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request database latency: a new connection per request, persistent connections and the connection pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Simulated requests per mode')
+        parser.add_argument('--threads', type=int, default=1, help='Concurrent request threads, as in an ASGI worker')
+
+    def handle(self, *args, **options):
+        base = settings.DATABASES['default']
+        if base['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError("Connection pooling needs the PostgreSQL backend")
+
+        plain_options = {key: value for key, value in base['OPTIONS'].items() if key != 'pool'}
+        pool_options = base['OPTIONS'].get('pool') or settings.DB_POOL_OPTIONS
+        handler = ConnectionHandler({
+            # What every request did before pooling: connect, authenticate, query, disconnect
+            'default': {**base, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': plain_options},
+            'persistent': {**base, 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': plain_options},
+            'bench_pool': {**base, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': {**plain_options, 'pool': pool_options}},
+        })
+
+        # A typical catalog read, compiled once so only connection handling differs between modes
+        sql, params = Make.objects.order_by('id').values_list('id', 'name')[:20].query.sql_with_params()
+
+        baseline = None
+        modes = [('new connection per request', 'default'), ('persistent connection', 'persistent'), ('pool', 'bench_pool')]
+        for label, alias in modes:
+            latencies = self.run(handler, alias, sql, params, options)
+            mean = statistics.mean(latencies)
+            baseline = baseline or mean
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: mean {mean * 1000:.2f} ms, p50 {quantiles[49] * 1000:.2f} ms, "
+                f"p95 {quantiles[94] * 1000:.2f} ms, saves {(baseline - mean) * 1000:.2f} ms per request"
+            ))
+
+        pool = handler['bench_pool'].pool
+        stats = pool.get_stats()
+        self.stdout.write(
+            f"Pool: size {stats.get('pool_size', 0)} (min {pool.min_size}, max {pool.max_size}), "
+            f"{stats.get('requests_num', 0)} checkouts, {stats.get('requests_wait_ms', 0)} ms waited, "
+            f"{stats.get('connections_num', 0)} connections opened"
+        )
+        handler['bench_pool'].close_pool()
+        handler.close_all()
+
+        self.stdout.write(f"Configured pools in this process: {pool_stats()}")
+
+    # Each simulated request goes through the same connection lifecycle as Django's
+    # request_started/request_finished handlers
+    def run(self, handler, alias, sql, params, options):
+        latencies = []
+        lock = threading.Lock()
+
+        def request():
+            connection = handler[alias]
+            start = time.perf_counter()
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                cursor.fetchall()
+            connection.close_if_unusable_or_obsolete()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+        request()  # open the pool / first persistent connection outside the measurement
+        latencies.clear()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            for future in [executor.submit(request) for _ in range(options['requests'])]:
+                future.result()
+        return latencies
@@ -0,0 +1,76 @@
+import datetime
+import decimal
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from api.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FastJSONRenderer against the stock DRF JSONRenderer on our payload shapes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Rows per payload')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best run is reported')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        description = ('ZenRenne Autowerke exhaust system with TIG welded mandrel bends. ' * 50)[:3000]
+        now = timezone.now()
+
+        payloads = {
+            'variants/': [
+                {
+                    'id': index,
+                    'name': 'Titanium Catback',
+                    'product_name': f'ZenRenne Autowerke ValveLogic Grade5 Titanium Catback Exhaust System - BMW F80 M3 {index}',
+                    'description': description,
+                    'product': {'id': index // 4, 'name': f'BMW F80 M3 {index}'},
+                }
+                for index in range(rows)
+            ],
+            'productconnections/': [
+                {'product': index // 3, 'parent_type': 7 + index % 2, 'parent_id': index}
+                for index in range(rows)
+            ],
+            'newsletter subscribers': [
+                {
+                    'id': index,
+                    'email': f'subscriber{index}@example.com',
+                    'subscribed_at': now - datetime.timedelta(minutes=index),
+                    'unsubscribed': index % 7 == 0,
+                    'discount': decimal.Decimal('12.50'),
+                    'label': gettext_lazy('Subscribed'),
+                }
+                for index in range(rows)
+            ],
+        }
+
+        stock = JSONRenderer()
+        fast = FastJSONRenderer()
+        for name, data in payloads.items():
+            expected = stock.render(data)
+            if fast.render(data) != expected:
+                self.stdout.write(self.style.ERROR(f"{name}: output differs from JSONRenderer"))
+                continue
+
+            baseline = self.best_of(lambda: stock.render(data), options['repeat'])
+            optimized = self.best_of(lambda: fast.render(data), options['repeat'])
+            if optimized <= baseline:
+                style, comparison = self.style.SUCCESS, f"{baseline / optimized:.1f}x faster"
+            else:
+                style, comparison = self.style.WARNING, f"{optimized / baseline:.1f}x slower"
+            self.stdout.write(style(
+                f"{name} ({rows} rows, {len(expected) / 1024:.0f} KB): JSONRenderer {baseline * 1000:.1f} ms, "
+                f"FastJSONRenderer {optimized * 1000:.1f} ms ({comparison}, identical output)"
+            ))
+
+    def best_of(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,78 @@
+import time
+from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from api.models import Make, CarModel, Product, Variant
+from api.serializers import ModelSerializer, VariantSerializer
+from api.fast_serializers import ValuesPlan
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the ValuesPlan fast path against the regular serializers for models/ and variants/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0, help='Generate this many synthetic rows per table (rolled back afterwards)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best run is reported')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['rows']:
+                    self.generate(options['rows'])
+                self.run_benchmarks(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def generate(self, rows):
+        make = Make.objects.create(name='Benchmark Make')
+        make_type = ContentType.objects.get_for_model(Make)
+        CarModel.objects.bulk_create(
+            CarModel(name=f'Model {index}', parent_type=make_type, parent_id=make.id, path=f'{make.id}/')
+            for index in range(rows)
+        )
+        product = Product.objects.create(name='Benchmark Product')
+        Variant.objects.bulk_create(
+            Variant(name=f'Variant {index}', product_name=f'Benchmark Variant {index}', description='x' * 3000, product=product)
+            for index in range(rows)
+        )
+
+    def run_benchmarks(self, repeat):
+        renderer = JSONRenderer()
+        benchmarks = [
+            ('models/', CarModel.objects.order_by('id').select_related('parent_type'), ModelSerializer),
+            ('variants/', Variant.objects.order_by('id').select_related('product'), VariantSerializer),
+        ]
+
+        for endpoint, queryset, serializer_class in benchmarks:
+            plan = ValuesPlan.for_serializer(serializer_class)
+
+            def serializer_path():
+                return renderer.render(serializer_class(queryset.all(), many=True).data)
+
+            def plan_path():
+                return renderer.render(plan.serialize(plan.values(queryset.all())))
+
+            if serializer_path() != plan_path():
+                self.stdout.write(self.style.ERROR(f"{endpoint}: output differs from the serializer"))
+                continue
+
+            baseline = self.best_of(serializer_path, repeat)
+            fast = self.best_of(plan_path, repeat)
+            self.stdout.write(self.style.SUCCESS(
+                f"{endpoint} {queryset.count()} rows: serializer {baseline * 1000:.1f} ms, "
+                f"values plan {fast * 1000:.1f} ms ({baseline / fast:.1f}x faster, identical output)"
+            ))
+
+    def best_of(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections
+from api.cache import bump_version
+from api.images import build_derivatives
+from api.models import VariantImage
+
+
+class Command(BaseCommand):
+    help = 'Build responsive WebP/AVIF derivatives and blur placeholders for VariantImages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Images downloaded and uploaded in parallel; rendering uses IMAGE_DERIVATIVE_WORKERS processes')
+        parser.add_argument('--all', action='store_true', help='Rebuild images that already have derivatives')
+        parser.add_argument('--watch', type=float, metavar='SECONDS', help='Keep running as a worker, checking for new images every SECONDS')
+
+    def handle(self, *args, **options):
+        if not options['watch']:
+            self.build_images(options['all'], options['workers'])
+            return
+
+        # Worker mode for images uploaded through the admin, which web processes never render.
+        # Images that failed are not retried until the worker restarts or their file changes.
+        failed = set()
+        while True:
+            failed |= self.build_images(options['all'], options['workers'], exclude=failed, quiet=True)
+            options['all'] = False
+            connections.close_all()
+            time.sleep(options['watch'])
+
+    def build_images(self, rebuild, workers, exclude=(), quiet=False):
+        # Saving a new file clears derivatives (see VariantImage.save), so it is picked up again
+        images = VariantImage.objects.exclude(image='').order_by('id')
+        if not rebuild:
+            images = images.filter(derivatives=[])
+
+        # exclude holds (id, file name) pairs of failed builds
+        images = [variant_image for variant_image in images if (variant_image.id, variant_image.image.name) not in exclude]
+        if not images:
+            if not quiet:
+                self.stdout.write(self.style.WARNING("No images need derivatives"))
+            return set()
+
+        def build(variant_image):
+            try:
+                return build_derivatives(variant_image)
+            finally:
+                # Each worker thread has its own database connection
+                connections.close_all()
+
+        start = time.perf_counter()
+        built = 0
+        failed = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(build, variant_image): variant_image for variant_image in images}
+            for future in as_completed(futures):
+                variant_image = futures[future]
+                try:
+                    derivatives = future.result()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Error building derivatives for image {variant_image.id}: {e}"))
+                    failed.add((variant_image.id, variant_image.image.name))
+                    continue
+                built += 1
+                self.stdout.write(f"Built {len(derivatives)} derivatives for image {variant_image.id}")
+
+        if built:
+            # Derivatives are written with update(), so invalidate cached responses once per batch
+            bump_version(VariantImage)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} of {len(images)} images in {elapsed:.1f}s ({built / elapsed:.1f} images/s)"))
+        return failed
@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from api.snapshots import (
+    SnapshotRenderer,
+    build_version,
+    data_name,
+    get_storage,
+    latest_manifest,
+    publish_manifest,
+    save_manifest,
+    snapshot_paths,
+    versions_token,
+    write_snapshot,
+)
+
+
+class Command(BaseCommand):
+    help = 'Render every read endpoint to precompressed, content-addressed JSON snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Endpoints rendered and uploaded in parallel')
+        parser.add_argument('--base-url', default=settings.SNAPSHOT_BASE_URL, help='Scheme and host used for absolute links such as pagination')
+        parser.add_argument('--prune', action='store_true', help='Delete snapshot files no longer referenced by the manifest')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        built = int(time.time())
+        storage = get_storage()
+        # Taken before rendering: a write during the build changes the versions, so the
+        # manifest is never served for data it may not reflect
+        token = versions_token()
+        previous_name, previous = latest_manifest(storage)
+        existing_shas = {entry['sha'] for entry in previous['entries'].values()}
+        renderer = SnapshotRenderer(options['base_url'])
+        known_shas = set(existing_shas)
+        lock = threading.Lock()
+
+        paths = snapshot_paths()
+        self.stdout.write(f"Rendering {len(paths)} endpoints with {options['workers']} workers")
+
+        def snapshot(path):
+            entries = {}
+            written = 0
+            try:
+                for page_path, body in renderer.render_pages(path):
+                    sha, encodings, changed = write_snapshot(storage, body, known_shas, lock)
+                    # Last-Modified only moves when the path's body changes
+                    previous_entry = previous['entries'].get(page_path, {})
+                    modified = previous_entry.get('modified') if previous_entry.get('sha') == sha else None
+                    entries[page_path] = {
+                        'sha': sha,
+                        'encodings': encodings,
+                        'content_type': 'application/json',
+                        'modified': modified or built,
+                    }
+                    written += changed
+            except Exception as e:
+                # A failed endpoint is left out of the snapshot and keeps being served live
+                self.stdout.write(self.style.ERROR(f"Error rendering {path}: {e}"))
+                return {}, 0
+            finally:
+                # Each worker thread has its own database connection
+                connections.close_all()
+            return entries, written
+
+        entries = {}
+        written = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for path_entries, path_written in executor.map(snapshot, paths):
+                entries.update(path_entries)
+                written += path_written
+
+        manifest = {'version': build_version(), 'entries': entries}
+        if previous_name and entries == previous['entries']:
+            manifest, name = previous, previous_name
+            self.stdout.write(self.style.SUCCESS("No endpoint changed; reusing the previous manifest"))
+        else:
+            name = save_manifest(manifest, storage)
+        publish_manifest(name, token)
+
+        if options['prune']:
+            stale = existing_shas - {entry['sha'] for entry in entries.values()}
+            for sha in stale:
+                for encoding in (None, 'gzip', 'br'):
+                    if storage.exists(data_name(sha, encoding)):
+                        storage.delete(data_name(sha, encoding))
+            if previous_name and previous_name != name:
+                storage.delete(previous_name)
+            self.stdout.write(f"Pruned {len(stale)} stale snapshots")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {manifest['version']}: {len(entries)} responses, {written} new files written "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
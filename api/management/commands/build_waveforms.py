@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections
+from api.audio import build_waveform
+from api.cache import bump_version
+from api.models import AudioTrack
+
+
+class Command(BaseCommand):
+    help = 'Decode AudioTracks once and store their waveform peaks, duration and size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Tracks decoded in parallel (one ffmpeg process each)')
+        parser.add_argument('--all', action='store_true', help='Rebuild tracks that already have a waveform')
+        parser.add_argument('--watch', type=float, metavar='SECONDS', help='Keep running as a worker, checking for new tracks every SECONDS')
+
+    def handle(self, *args, **options):
+        if not options['watch']:
+            self.build_tracks(options['all'], options['workers'])
+            return
+
+        # Worker mode for tracks uploaded through the admin, which web processes never decode.
+        # Tracks that failed are not retried until the worker restarts or their file changes.
+        failed = set()
+        while True:
+            failed |= self.build_tracks(options['all'], options['workers'], exclude=failed, quiet=True)
+            options['all'] = False
+            connections.close_all()
+            time.sleep(options['watch'])
+
+    def build_tracks(self, rebuild, workers, exclude=(), quiet=False):
+        # Saving a new file clears the duration (see AudioTrack.save), so it is picked up again
+        tracks = AudioTrack.objects.exclude(track='').order_by('id')
+        if not rebuild:
+            tracks = tracks.filter(duration__isnull=True)
+
+        # exclude holds (id, file name) pairs of failed builds
+        tracks = [audio_track for audio_track in tracks if (audio_track.id, audio_track.track.name) not in exclude]
+        if not tracks:
+            if not quiet:
+                self.stdout.write(self.style.WARNING("No audio tracks need waveforms"))
+            return set()
+
+        def build(audio_track):
+            try:
+                return build_waveform(audio_track)
+            finally:
+                # Each worker thread has its own database connection
+                connections.close_all()
+
+        start = time.perf_counter()
+        built = 0
+        failed = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(build, audio_track): audio_track for audio_track in tracks}
+            for future in as_completed(futures):
+                audio_track = futures[future]
+                try:
+                    fields = future.result()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Error building waveform for audio track {audio_track.id}: {e}"))
+                    failed.add((audio_track.id, audio_track.track.name))
+                    continue
+                built += 1
+                self.stdout.write(f"Built waveform for audio track {audio_track.id}: {fields['duration']:.1f}s, {len(fields['peaks'])} peaks")
+
+        if built:
+            # Waveforms are written with update(), so invalidate cached responses once per batch
+            bump_version(AudioTrack)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Built waveforms for {built} of {len(tracks)} tracks in {elapsed:.1f}s"))
+        return failed
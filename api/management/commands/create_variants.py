@@ -1,49 +1,85 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.cache import bump_version
 from api.models import Product, Variant
 
+BATCH_SIZE = 1000
+
+# Every product gets one variant per template
+VARIANT_TEMPLATES = [
+    {
+        'name': 'Catless Downpipe',
+        'product_name': 'ZenRenne Autowerke Catless Downpipe with Heat Shield - {product_name}'
+    },
+    {
+        'name': 'Catted Downpipe',
+        'product_name': 'ZenRenne Autowerke Catted Downpipe with Heat Shield - {product_name}'
+    },
+    {
+        'name': 'Stainless Steel Catback',
+        'product_name': 'ZenRenne Autowerke ValveLogic T304 Stainless Steel Catback Exhaust System - {product_name}'
+    },
+    {
+        'name': 'Titanium Catback',
+        'product_name': 'ZenRenne Autowerke ValveLogic Grade5 Titanium Catback Exhaust System - {product_name}'
+    }
+]
+
+
 class Command(BaseCommand):
-    help = 'Create 4 variants for each product with specific names and product names'
-
-    def handle(self, *args, **kwargs):
-        # Define the variant details
-        variant_details = [
-            {
-                'name': 'Catless Downpipe',
-                'product_name': 'ZenRenne Autowerke Catless Downpipe with Heat Shield - {product_name}'
-            },
-            {
-                'name': 'Catted Downpipe',
-                'product_name': 'ZenRenne Autowerke Catted Downpipe with Heat Shield - {product_name}'
-            },
-            {
-                'name': 'Stainless Steel Catback',
-                'product_name': 'ZenRenne Autowerke ValveLogic T304 Stainless Steel Catback Exhaust System - {product_name}'
-            },
-            {
-                'name': 'Titanium Catback',
-                'product_name': 'ZenRenne Autowerke ValveLogic Grade5 Titanium Catback Exhaust System - {product_name}'
-            }
-        ]
-
-        # Fetch all products
-        products = Product.objects.all()
-
-        if not products.exists():
+    help = 'Create the template variants missing from each product; optionally refresh changed product names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--update-names', action='store_true', help='Rewrite product_name of existing template variants that no longer match their template')
+
+    def handle(self, *args, **options):
+        products = dict(Product.objects.values_list('id', 'name'))
+
+        if not products:
             self.stdout.write(self.style.WARNING("No products found"))
             return
 
         self.stdout.write(self.style.SUCCESS("Creating variants for all products"))
 
-        # Create variants for each product
-        for product in products:
-            for variant_detail in variant_details:
-                variant_name = variant_detail['name']
-                variant_product_name = variant_detail['product_name'].format(product_name=product.name)
-                
-                Variant.objects.create(
-                    name=variant_name,
-                    product=product,
-                    product_name=variant_product_name
-                )
-
-                self.stdout.write(f"Created Variant: {variant_name} for Product: {product.name}")
+        # One query for every template variant that already exists, then diff in memory
+        templates = {template['name']: template['product_name'] for template in VARIANT_TEMPLATES}
+        existing = {}
+        duplicates = 0
+        for variant in Variant.objects.filter(name__in=templates).only('id', 'product_id', 'name', 'product_name').order_by('id'):
+            if (variant.product_id, variant.name) in existing:
+                duplicates += 1
+                continue
+            existing[(variant.product_id, variant.name)] = variant
+
+        missing = []
+        changed = []
+        for product_id, product_name in products.items():
+            for name, product_name_template in templates.items():
+                variant_product_name = product_name_template.format(product_name=product_name)
+                variant = existing.get((product_id, name))
+                if variant is None:
+                    missing.append(Variant(name=name, product_id=product_id, product_name=variant_product_name))
+                elif variant.product_name != variant_product_name:
+                    variant.product_name = variant_product_name
+                    changed.append(variant)
+
+        with transaction.atomic():
+            Variant.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+            if options['update_names']:
+                Variant.objects.bulk_update(changed, ['product_name'], batch_size=BATCH_SIZE)
+
+        if options['verbosity'] > 1:
+            for variant in missing:
+                self.stdout.write(f"Created Variant: {variant.name} for Product: {products[variant.product_id]}")
+
+        if missing or (changed and options['update_names']):
+            # bulk_create/bulk_update send no post_save, so invalidate cached responses here
+            bump_version(Variant)
+
+        self.stdout.write(self.style.SUCCESS(f"Created {len(missing)} variants; {len(existing)} already existed"))
+        if options['update_names']:
+            self.stdout.write(self.style.SUCCESS(f"Updated the product name of {len(changed)} variants"))
+        elif changed:
+            self.stdout.write(self.style.WARNING(f"{len(changed)} variants have an outdated product name; rerun with --update-names to fix them"))
+        if duplicates:
+            self.stdout.write(self.style.WARNING(f"{duplicates} duplicate template variants from earlier runs were left untouched"))
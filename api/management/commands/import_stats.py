@@ -0,0 +1,49 @@
+import csv
+from django.core.management.base import BaseCommand
+from rest_framework.exceptions import ValidationError
+from api.bulk import import_stats
+from api.manifest import resolve_variants
+
+
+class Command(BaseCommand):
+    help = 'Create or update stats from a CSV file with variant (or product_name), name, number, unit and additional columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without writing')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stats_file:
+                rows = [{key.strip(): (value or '').strip() for key, value in row.items() if key} for row in csv.DictReader(stats_file)]
+        except OSError as e:
+            self.stdout.write(self.style.ERROR(f"Error loading stats file: {e}"))
+            return
+
+        # Spec sheets usually name the variant by its product name
+        if rows and 'variant' not in rows[0] and 'product_name' in rows[0]:
+            variants = resolve_variants(row['product_name'] for row in rows)
+            for row in rows:
+                variant = variants.get(row['product_name'])
+                if variant is None:
+                    self.stdout.write(self.style.ERROR(f"No single variant has the product_name: {row['product_name']}"))
+                row['variant'] = variant.id if variant else None
+        for row in rows:
+            if not row.get('additional'):
+                row['additional'] = None
+
+        try:
+            counts = import_stats(rows, dry_run=options['dry_run'])
+        except ValidationError as e:
+            # Line 1 is the header
+            for index, row_errors in enumerate(e.detail):
+                for field, messages in row_errors.items():
+                    for message in messages:
+                        self.stdout.write(self.style.ERROR(f"Line {index + 2}: {field}: {message}"))
+            self.stdout.write(self.style.ERROR("No stats were imported"))
+            return
+
+        prefix = "Dry run: " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{counts['created']} stats created, {counts['updated']} updated, {counts['unchanged']} unchanged"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+from api.cache import bump_version
+from api.hierarchy import resolve_model_paths
+from api.models import CarModel, Make
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized ancestor path of every CarModel'
+
+    def handle(self, *args, **kwargs):
+        make_type = ContentType.objects.get_for_model(Make)
+
+        # Load the whole adjacency list once and resolve paths in memory
+        car_models = {car_model.id: car_model for car_model in CarModel.objects.all()}
+        paths = resolve_model_paths(
+            {car_model.id: (car_model.parent_type_id, car_model.parent_id) for car_model in car_models.values()},
+            make_type.id,
+        )
+
+        changed = []
+        for car_model in car_models.values():
+            if car_model.path != paths[car_model.id]:
+                car_model.path = paths[car_model.id]
+                changed.append(car_model)
+
+        CarModel.objects.bulk_update(changed, ['path'], batch_size=1000)
+        if changed:
+            # bulk_update sends no post_save, so invalidate cached responses here
+            bump_version(CarModel)
+
+        orphans = sum(1 for path in paths.values() if not path)
+        if orphans:
+            self.stdout.write(self.style.WARNING(f"{orphans} models have no reachable make"))
+        self.stdout.write(self.style.SUCCESS(f"Updated paths for {len(changed)} of {len(car_models)} models"))
@@ -0,0 +1,271 @@
+import csv
+import itertools
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from django.core.files.storage import default_storage
+from .cache import bump_version
+from .ingest import IngestJob, MediaIngestor
+from .models import AudioTrack, Variant, VariantImage
+
+# Keeps every IN (...) well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+# Mirrors the limit enforced by AudioTrack.save(), which bulk_create bypasses
+MAX_TRACKS_PER_VARIANT = 3
+
+
+@dataclass
+class ManifestRow:
+    product_name: str
+    image_folder: str
+    audio_folder: str
+
+
+def read_manifest(path):
+    """
+    Yields the rows of a media manifest: variant product name, image folder and audio
+    folder in the first three columns, below a header row. Workbooks are streamed with
+    openpyxl in read-only mode; .csv files are read with the csv module.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as manifest_file:
+            rows = csv.reader(manifest_file)
+            next(rows, None)
+            yield from _manifest_rows(rows)
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from _manifest_rows(workbook.active.iter_rows(min_row=2, values_only=True))
+    finally:
+        workbook.close()
+
+
+def _manifest_rows(rows):
+    for row in rows:
+        cells = [str(value).strip() if value is not None else '' for value in list(row)[:3]]
+        cells += [''] * (3 - len(cells))
+        if cells[0]:
+            yield ManifestRow(*cells)
+
+
+def _chunks(values):
+    values = iter(values)
+    while chunk := list(itertools.islice(values, LOOKUP_CHUNK_SIZE)):
+        yield chunk
+
+
+def resolve_variants(product_names):
+    # product_name -> Variant with one indexed IN lookup per chunk. A name shared by
+    # several variants maps to None, since the manifest can't tell them apart.
+    variants = {}
+    for chunk in _chunks(dict.fromkeys(product_names)):
+        for variant in Variant.objects.filter(product_name__in=chunk).only('id', 'product_name'):
+            variants[variant.product_name] = None if variant.product_name in variants else variant
+    return variants
+
+
+def resolve_rows(rows):
+    """
+    Yields each manifest row with the resolve_variants() mapping for its chunk of rows,
+    so a manifest is matched to variants as it streams instead of being loaded whole.
+    """
+    for chunk in _chunks(rows):
+        variants = resolve_variants(row.product_name for row in chunk)
+        for row in chunk:
+            yield row, variants
+
+
+def source_fingerprint(base_path, path):
+    # As IngestJob.key, a changed size or mtime means a changed file
+    stat = os.stat(path)
+    relative_path = os.path.relpath(path, base_path).replace(os.sep, '/')
+    return f"{relative_path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _source_path(source):
+    return source.rsplit(':', 2)[0]
+
+
+def _existing_rows(model, variants, fields):
+    rows = defaultdict(list)
+    for chunk in _chunks(variant.id for variant in variants):
+        for row in model.objects.filter(variant_id__in=chunk).only('id', 'variant_id', 'source', *fields).order_by('id'):
+            rows[row.variant_id].append(row)
+    return rows
+
+
+@dataclass
+class MediaDiff:
+    jobs: list = field(default_factory=list)  # files to upload, new or changed (replacing their old row)
+    stale: list = field(default_factory=list)  # ids of rows whose file left the manifest
+    adopted: dict = field(default_factory=dict)  # id -> source, for rows imported before sources were recorded
+    new: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+    def __str__(self):
+        return (
+            f"{self.new} new, {self.changed} changed, {self.removed} removed, {self.unchanged} unchanged files"
+            f" ({len(self.adopted)} matched to rows imported without a source)"
+        )
+
+
+def _adopt_image(legacy, path):
+    # Rows imported before sources were recorded are matched on the stored file name,
+    # which is the source file name plus the suffix storage adds on collisions
+    stem, extension = os.path.splitext(default_storage.get_valid_name(os.path.basename(path)))
+    pattern = re.compile(rf'{re.escape(stem)}(_[a-zA-Z0-9]{{7}})?{re.escape(extension)}')
+    for image in legacy:
+        if pattern.fullmatch(os.path.basename(image.image.name)):
+            legacy.remove(image)
+            return image
+    return None
+
+
+def diff_images(folders, base_path):
+    """
+    Compares the image files of each variant's manifest folder, {variant: [path, ...]},
+    with its VariantImage rows. Only rows imported from the manifest are ever removed;
+    images uploaded through the admin are left alone.
+    """
+    diff = MediaDiff()
+    existing = _existing_rows(VariantImage, folders, ('image', 'is_main'))
+    for variant, paths in folders.items():
+        managed = {_source_path(image.source): image for image in existing[variant.id] if image.source}
+        legacy = [image for image in existing[variant.id] if not image.source]
+        wanted = []
+        for position, path in enumerate(paths):
+            source = source_fingerprint(base_path, path)
+            image = managed.pop(_source_path(source), None)
+            if image is None:
+                image = _adopt_image(legacy, path)
+                if image is not None:
+                    diff.adopted[image.id] = source
+            elif image.source != source:
+                diff.changed += 1
+                wanted.append((path, source, position, image))
+                continue
+
+            if image is None:
+                diff.new += 1
+                wanted.append((path, source, position, None))
+            else:
+                diff.unchanged += 1
+
+        diff.stale.extend(image.id for image in managed.values())
+        diff.removed += len(managed)
+
+        # A changed image stays the main one; variants left without one get theirs from
+        # ensure_main_images once the diff is applied
+        for path, source, position, replaced in wanted:
+            diff.jobs.append(IngestJob(path, {
+                'variant': variant,
+                'is_main': replaced is not None and replaced.is_main,
+                'position': position,
+                'source': source,
+            }, replaces=replaced.id if replaced else None))
+    return diff
+
+
+def ensure_main_images(variants):
+    # Makes the first image, by position, the main one of each variant that has images
+    # but none marked main, e.g. because its main image left the manifest
+    first_images = {}
+    for chunk in _chunks(variant.id for variant in variants):
+        with_main = VariantImage.objects.filter(variant_id__in=chunk, is_main=True).values('variant_id')
+        images = (
+            VariantImage.objects.filter(variant_id__in=chunk).exclude(variant_id__in=with_main)
+            .order_by('variant_id', 'position', 'id').values_list('variant_id', 'id')
+        )
+        for variant_id, image_id in images:
+            first_images.setdefault(variant_id, image_id)
+
+    for chunk in _chunks(first_images.values()):
+        VariantImage.objects.filter(id__in=chunk).update(is_main=True)
+    if first_images:
+        # Queryset updates send no post_save, so invalidate cached responses here
+        bump_version(VariantImage)
+    return len(first_images)
+
+
+def track_name(path):
+    # The filename without its extension, underscores replaced with spaces, capitalized
+    return os.path.splitext(os.path.basename(path))[0].replace('_', ' ').title()
+
+
+def diff_audio(folders, base_path, log=print):
+    """
+    Compares the tracks of each variant's manifest folder, {variant: [path, ...]}, with
+    its AudioTrack rows, matched on the track name derived from the file name.
+    """
+    diff = MediaDiff()
+    existing = _existing_rows(AudioTrack, folders, ('name',))
+    for variant, paths in folders.items():
+        tracks = {track.name: track for track in existing[variant.id]}
+        names = set()
+        kept = 0
+        wanted = []
+        for path in paths:
+            name = track_name(path)
+            if name in names:
+                log(f"Skipping {path}: another file of '{variant.product_name}' has the track name '{name}'")
+                continue
+            names.add(name)
+            source = source_fingerprint(base_path, path)
+            track = tracks.pop(name, None)
+            if track is not None and track.source in ('', source):
+                if not track.source:
+                    diff.adopted[track.id] = source
+                diff.unchanged += 1
+                kept += 1
+                continue
+            if track is None:
+                diff.new += 1
+            else:
+                diff.changed += 1
+            wanted.append((path, source, name, track))
+
+        # Tracks uploaded through the admin stay, and count towards the limit
+        removed = [track.id for track in tracks.values() if track.source]
+        diff.stale.extend(removed)
+        diff.removed += len(removed)
+        slots = MAX_TRACKS_PER_VARIANT - kept - (len(tracks) - len(removed))
+
+        for path, source, name, replaced in wanted:
+            if slots <= 0:
+                log(f"Variant '{variant.product_name}' already has {MAX_TRACKS_PER_VARIANT} audio tracks, skipping {path}")
+                continue
+            slots -= 1
+            diff.jobs.append(IngestJob(
+                path, {'variant': variant, 'name': name, 'source': source}, replaces=replaced.id if replaced else None
+            ))
+    return diff
+
+
+def apply_diff(model, file_field, diff, checkpoint, workers=8, batch_size=200, log=print, on_saved=None):
+    """
+    Uploads the new and changed files of a MediaDiff and writes their rows first; each
+    changed file's old row is deleted in the transaction that creates its replacement.
+    Rows that left the manifest are deleted last, so a failed run never loses a file
+    that is still wanted. Stored files go only once their row's deletion commits.
+    """
+    model.objects.bulk_update(
+        [model(id=pk, source=source) for pk, source in diff.adopted.items()], ['source'], batch_size=batch_size
+    )
+
+    if diff.jobs:
+        # A checkpoint entry marked saved belongs to a row the diff no longer found
+        checkpoint.discard([job.key for job in diff.jobs if (checkpoint.get(job.key) or {}).get('saved')])
+        MediaIngestor(
+            model, file_field, checkpoint, workers=workers, batch_size=batch_size, log=log, on_saved=on_saved
+        ).run(diff.jobs)
+
+    # Deleting through the queryset still sends post_delete, which removes the stored
+    # files once the deletion commits and bumps the cache version
+    for chunk in _chunks(diff.stale):
+        model.objects.filter(id__in=chunk).delete()
@@ -0,0 +1,78 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from core.db_router import end_request_routing, pin_primary, start_request_routing
+from .snapshots import serve_snapshot
+
+
+def is_snapshot_request(request):
+    return request.method in ('GET', 'HEAD') and request.path_info.startswith('/api/')
+
+
+# Serve GET requests from the prebuilt, precompressed catalog snapshot when one exists
+# for the exact path; anything else falls through to the live views. Works natively
+# under ASGI as well, so it does not force the async views onto a thread.
+class SnapshotMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVE_SNAPSHOTS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if is_snapshot_request(request):
+            response = serve_snapshot(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if is_snapshot_request(request):
+            response = await sync_to_async(serve_snapshot, thread_sensitive=False)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+
+# Lets ReplicaRouter send this request's reads to a replica. Only safe requests outside
+# the admin qualify; anything else is pinned to the primary from the start.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        token = start_request_routing()
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') or request.path_info.startswith('/admin/'):
+            pin_primary()
+        return token
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            return self.get_response(request)
+        finally:
+            end_request_routing(token)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            end_request_routing(token)
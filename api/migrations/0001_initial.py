@@ -0,0 +1,116 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Make',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Make',
+                'verbose_name_plural': 'Makes',
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsletterSubscriber',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('subscribed_at', models.DateTimeField(auto_now_add=True)),
+                ('unsubscribed', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Variant',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50)),
+                ('product_name', models.CharField(max_length=200)),
+                ('description', models.TextField(max_length=3000)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='api.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VariantImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='variant_images/')),
+                ('is_main', models.BooleanField(default=False)),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='api.variant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CarModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('parent_id', models.PositiveIntegerField()),
+                ('parent_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Model',
+                'verbose_name_plural': 'Models',
+                'indexes': [models.Index(fields=['parent_id', 'parent_type'], name='api_carmode_parent__2137b8_idx')],
+                'unique_together': {('name', 'parent_type', 'parent_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductMakeModelConnection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parent_id', models.PositiveIntegerField()),
+                ('parent_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['parent_id', 'parent_type'], name='api_product_parent__c6aee6_idx')],
+                'unique_together': {('product', 'parent_type', 'parent_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Stat',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=12)),
+                ('number', models.CharField(max_length=12)),
+                ('unit', models.CharField(max_length=12)),
+                ('additional', models.CharField(blank=True, max_length=20, null=True)),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='api.variant')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('variant', 'name'), name='unique_stat_name_per_variant')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AudioTrack',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=20)),
+                ('track', models.FileField(upload_to='audio_tracks/')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audio_tracks', to='api.variant')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('variant', 'name'), name='unique_audio_track_name_per_variant')],
+            },
+        ),
+    ]
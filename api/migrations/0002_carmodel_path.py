@@ -0,0 +1,62 @@
+from django.db import migrations, models
+
+
+def resolve_paths(parents, make_type_id):
+    # A frozen copy of api.hierarchy.resolve_model_paths, so the migration doesn't
+    # depend on the live models and cache code that module imports
+    paths = {}
+
+    def resolve(model_id):
+        if model_id in paths:
+            return paths[model_id]
+        paths[model_id] = ''
+        parent_type_id, parent_id = parents[model_id]
+        if parent_type_id == make_type_id:
+            path = f"{parent_id}/"
+        else:
+            parent_path = resolve(parent_id) if parent_id in parents else ''
+            path = f"{parent_path}{parent_id}/" if parent_path else ''
+        paths[model_id] = path
+        return path
+
+    for model_id in parents:
+        resolve(model_id)
+    return paths
+
+
+def backfill_paths(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    CarModel = apps.get_model('api', 'CarModel')
+    make_type = ContentType.objects.filter(app_label='api', model='make').first()
+    if make_type is None:
+        return
+
+    car_models = list(CarModel.objects.only('id', 'parent_type_id', 'parent_id'))
+    paths = resolve_paths(
+        {car_model.id: (car_model.parent_type_id, car_model.parent_id) for car_model in car_models},
+        make_type.id,
+    )
+    for car_model in car_models:
+        car_model.path = paths[car_model.id]
+    CarModel.objects.bulk_update(car_models, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carmodel',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='carmodel',
+            index=models.Index(fields=['path'], name='carmodel_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
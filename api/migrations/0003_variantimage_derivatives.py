@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_carmodel_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='variantimage',
+            name='placeholder',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_variantimage_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiotrack',
+            name='duration',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiotrack',
+            name='peaks',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='audiotrack',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_audiotrack_waveform'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='variant',
+            name='product_name',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='variantimage',
+            name='source',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='audiotrack',
+            name='source',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
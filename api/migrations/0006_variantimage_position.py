@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+def assign_positions(apps, schema_editor):
+    # Galleries were ordered by id, so that order becomes the positions. A variant with
+    # several main images keeps the newest one, which is what saving it last would do.
+    VariantImage = apps.get_model('api', 'VariantImage')
+    images = list(VariantImage.objects.order_by('variant_id', '-id').only('id', 'variant_id', 'is_main'))
+
+    with_main = set()
+    sizes = {}
+    for image in images:
+        if image.is_main:
+            image.is_main = image.variant_id not in with_main
+            with_main.add(image.variant_id)
+        sizes[image.variant_id] = sizes.get(image.variant_id, 0) + 1
+    # Images are read newest first, so count each gallery down to 0
+    for image in images:
+        sizes[image.variant_id] -= 1
+        image.position = sizes[image.variant_id]
+    VariantImage.objects.bulk_update(images, ['position', 'is_main'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_media_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantimage',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(assign_positions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='variantimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_main', True)), fields=('variant',), name='unique_main_image_per_variant'),
+        ),
+    ]
@@ -1,10 +1,14 @@
 import os
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.files.storage import default_storage
+from .cache import bump_version_on_commit
+from .images import delete_derivatives
 
 
 class Make(models.Model):
@@ -13,6 +17,9 @@ class Make(models.Model):
     def __str__(self):
         return self.name
 
+    def descendants(self):
+        return CarModel.objects.filter(path__startswith=f"{self.id}/")
+
     class Meta:
         verbose_name = "Make"
         verbose_name_plural = "Makes"
@@ -25,14 +32,119 @@ class CarModel(models.Model):
     parent_id = models.PositiveIntegerField()
     parent = GenericForeignKey('parent_type', 'parent_id')
 
+    # Materialized ancestor path: the make id followed by every ancestor model id,
+    # e.g. "12/5/" for a sub-model of model 5 under make 12. Maintained on save.
+    path = models.CharField(max_length=255, default='', editable=False)
+
     def __str__(self):
         return self.name
 
+    @property
+    def subtree_prefix(self):
+        # Path prefix shared by every descendant of this model
+        return f"{self.path}{self.id}/"
+
+    @property
+    def make_id(self):
+        return int(self.path.split('/', 1)[0]) if self.path else None
+
+    @property
+    def ancestor_ids(self):
+        # Ancestor CarModel ids ordered from the top-level model down to the parent
+        return [int(part) for part in self.path.split('/')[1:-1]]
+
+    def descendants(self):
+        return CarModel.objects.filter(path__startswith=self.subtree_prefix)
+
+    def ancestors(self):
+        # [make, top-level model, ..., parent] in one query regardless of depth: the make
+        # and the ancestor models are read together with a UNION
+        if self.make_id is None:
+            return []
+        columns = ('id', 'name', 'parent_type_id', 'parent_id', 'path', 'is_make')
+        make_rows = Make.objects.filter(id=self.make_id).annotate(
+            parent_type_id=Value(None, output_field=models.IntegerField()),
+            parent_id=Value(None, output_field=models.IntegerField()),
+            path=Value('', output_field=models.CharField()),
+            is_make=Value(True),
+        ).values_list(*columns)
+        model_rows = CarModel.objects.filter(id__in=self.ancestor_ids).annotate(is_make=Value(False)).values_list(*columns)
+
+        make = None
+        models_by_id = {}
+        for row in make_rows.union(model_rows, all=True):
+            fields = dict(zip(columns, row))
+            if fields.pop('is_make'):
+                make = Make(id=fields['id'], name=fields['name'])
+            else:
+                models_by_id[fields['id']] = CarModel(**fields)
+        chain = [models_by_id[ancestor_id] for ancestor_id in self.ancestor_ids if ancestor_id in models_by_id]
+        return ([make] if make else []) + chain
+
+    def build_path(self):
+        if self.parent_type_id == ContentType.objects.get_for_model(Make).id:
+            return f"{self.parent_id}/"
+        parent_path = CarModel.objects.filter(id=self.parent_id).values_list('path', flat=True).first()
+        if not parent_path:
+            return ''
+        return f"{parent_path}{self.parent_id}/"
+
+    def save(self, *args, **kwargs):
+        existed = self.pk is not None
+        old_prefix = self.subtree_prefix if existed and self.path else None
+        with transaction.atomic():
+            self.path = self.build_path()
+            super().save(*args, **kwargs)
+
+            new_prefix = self.subtree_prefix if self.path else None
+            if old_prefix == new_prefix or not existed:
+                return
+            if old_prefix and new_prefix:
+                # Re-parenting moves the whole subtree: rewrite descendant paths in one UPDATE
+                CarModel.objects.filter(path__startswith=old_prefix).update(
+                    path=Concat(Value(new_prefix), Substr('path', len(old_prefix) + 1), output_field=models.CharField())
+                )
+            elif old_prefix:
+                # Moved under a model with no make: its subtree has no valid path either
+                CarModel.objects.filter(path__startswith=old_prefix).update(path='')
+            else:
+                # The subtree had no path, so it can't be found by prefix: walk it level by level
+                self.rebuild_descendant_paths()
+            # post_save bumped the version before the descendant paths were rewritten
+            bump_version_on_commit(CarModel)
+
+    def rebuild_descendant_paths(self):
+        model_type = ContentType.objects.get_for_model(CarModel)
+        seen = {self.id}
+        level = [self]
+        while level:
+            prefixes = {car_model.id: car_model.subtree_prefix for car_model in level}
+            level = list(CarModel.objects.filter(parent_type=model_type, parent_id__in=prefixes).exclude(id__in=seen))
+            seen.update(car_model.id for car_model in level)
+            for car_model in level:
+                car_model.path = prefixes[car_model.parent_id]
+            CarModel.objects.bulk_update(level, ['path'], batch_size=1000)
+
     class Meta:
         verbose_name = "Model"
         verbose_name_plural = "Models"
         unique_together = ('name', 'parent_type', 'parent_id')
-        indexes = [models.Index(fields=['parent_id', 'parent_type'])]  # Add index
+        indexes = [
+            models.Index(fields=['parent_id', 'parent_type']),  # Add index
+            models.Index(fields=['path'], name='carmodel_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+
+# Parents are generic relations, so nothing cascades to the subtree of a deleted make
+# or model. Its rows stay, with no path until they are re-parented, rather than paths
+# through a deleted id.
+@receiver(post_delete, sender=Make)
+@receiver(post_delete, sender=CarModel)
+def clear_descendant_paths(sender, instance, **kwargs):
+    if sender is CarModel and not instance.path:
+        return
+    if instance.descendants().update(path=''):
+        bump_version_on_commit(CarModel)
 
 
 class Product(models.Model):
@@ -60,7 +172,7 @@ class ProductMakeModelConnection(models.Model):
 class Variant(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=50)
-    product_name = models.CharField(max_length=200)
+    product_name = models.CharField(max_length=200, db_index=True)  # media manifests are keyed by it
     description = models.TextField(max_length=3000)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
 
@@ -72,21 +184,54 @@ class VariantImage(models.Model):
     image = models.ImageField(upload_to='variant_images/')
     variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='images')
     is_main = models.BooleanField(default=False)
+    position = models.PositiveIntegerField(default=0)  # gallery order within the variant
+
+    # Resized WebP/AVIF copies, [{'name', 'width', 'height', 'format'}, ...], and a tiny
+    # blurred data URI placeholder; both built by api.images
+    derivatives = models.JSONField(default=list, blank=True, editable=False)
+    placeholder = models.TextField(blank=True, default='', editable=False)
+
+    # Manifest file the row was imported from, 'folder/file:size:mtime_ns' (see
+    # api.manifest); blank for images uploaded through the admin
+    source = models.CharField(max_length=255, blank=True, default='', editable=False)
 
     def __str__(self):
         return f"Image for {self.variant.name}"
     
     def save(self, *args, **kwargs):
-        if self.is_main:
-            # Set other images of the same variant to not be the main image
-            VariantImage.objects.filter(variant=self.variant, is_main=True).update(is_main=False)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self.is_main:
+                # Set other images of the same variant to not be the main image
+                VariantImage.objects.filter(variant_id=self.variant_id, is_main=True).exclude(pk=self.pk).update(is_main=False)
+            if self.pk and self.derivatives:
+                stored = VariantImage.objects.filter(pk=self.pk).values_list('image', flat=True).first()
+                if stored is not None and stored != self.image.name:
+                    # A new file: its derivatives are rebuilt by build_image_derivatives, and
+                    # the old ones are removed once this commits
+                    old_derivatives = self.derivatives
+                    self.derivatives = []
+                    self.placeholder = ''
+                    transaction.on_commit(lambda: delete_derivatives(old_derivatives))
+            super().save(*args, **kwargs)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['variant'], condition=models.Q(is_main=True), name='unique_main_image_per_variant')
+        ]
 
 
 @receiver(post_delete, sender=VariantImage)
 def delete_variant_image_file(sender, instance, **kwargs):
-    if instance.image:
-        default_storage.delete(instance.image.name)
+    # Only once the deletion commits: a rolled back delete keeps its files
+    name = instance.image.name
+    derivatives = instance.derivatives
+
+    def delete_files():
+        if name:
+            default_storage.delete(name)
+        delete_derivatives(derivatives)
+
+    transaction.on_commit(delete_files)
 
 
 class Stat(models.Model):
@@ -101,7 +246,7 @@ class Stat(models.Model):
         return f"Stat for {self.variant}, {self.name}"
 
     def save(self, *args, **kwargs):
-        if self.variant.stats.count() >= 3:
+        if not self.pk and self.variant.stats.count() >= 3:
             raise ValueError("A variant can only have 3 stats.")
         super().save(*args, **kwargs)
 
@@ -117,12 +262,27 @@ class AudioTrack(models.Model):
     track = models.FileField(upload_to='audio_tracks/')
     variant = models.ForeignKey('Variant', on_delete=models.CASCADE, related_name='audio_tracks')
 
+    # Decoded once by api.audio so the player can draw and seek before downloading the track
+    peaks = models.JSONField(default=list, blank=True, editable=False)
+    duration = models.FloatField(null=True, blank=True, editable=False)
+    size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+
+    # Manifest file the row was imported from, as on VariantImage
+    source = models.CharField(max_length=255, blank=True, default='', editable=False)
+
     def __str__(self):
         return f"Audio Track for {self.variant}, {self.name}"
 
     def save(self, *args, **kwargs):
         if self.variant.audio_tracks.count() >= 3 and not self.pk:
             raise ValueError("A variant can only have 3 audio tracks.")
+        if self.pk and self.duration is not None:
+            stored = AudioTrack.objects.filter(pk=self.pk).values_list('track', flat=True).first()
+            if stored is not None and stored != self.track.name:
+                # A new file: build_waveforms decodes it again
+                self.peaks = []
+                self.duration = None
+                self.size = None
         super().save(*args, **kwargs)
 
     class Meta:
@@ -133,8 +293,10 @@ class AudioTrack(models.Model):
 
 @receiver(post_delete, sender=AudioTrack)
 def delete_audio_file(sender, instance, **kwargs):
+    # As for images, only once the deletion commits
     if instance.track:
-        default_storage.delete(instance.track.name)
+        name = instance.track.name
+        transaction.on_commit(lambda: default_storage.delete(name))
 
 
 class NewsletterSubscriber(models.Model):
@@ -143,4 +305,26 @@ class NewsletterSubscriber(models.Model):
     unsubscribed = models.BooleanField(default=False)
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+# Bump a model's cache version whenever one of its rows changes, which invalidates
+# every cached response that was keyed by that version. Signals fire inside the
+# saving transaction, so the version is bumped again when it commits.
+def bump_cache_version(sender, **kwargs):
+    bump_version_on_commit(sender)
+
+
+for cached_model in (
+    ContentType,
+    Make,
+    CarModel,
+    Product,
+    ProductMakeModelConnection,
+    Variant,
+    VariantImage,
+    Stat,
+    AudioTrack,
+):
+    post_save.connect(bump_cache_version, sender=cached_model, dispatch_uid=f'bump_cache_version_save_{cached_model.__name__}')
+    post_delete.connect(bump_cache_version, sender=cached_model, dispatch_uid=f'bump_cache_version_delete_{cached_model.__name__}')
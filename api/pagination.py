@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+# Keyset pagination on the primary key: every page is an indexed range scan,
+# so deep pages cost the same as the first one.
+# Opt-in: lists stay bare JSON arrays, as they have always been, unless the request
+# asks for a page with ?page_size= or follows a ?cursor= link.
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    @classmethod
+    def is_requested(cls, query_params):
+        return cls.cursor_query_param in query_params or cls.page_size_query_param in query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
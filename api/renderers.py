@@ -0,0 +1,41 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # fall back to the stock renderer without orjson
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson for the compact, unicode output DRF uses by default.
+    Types orjson does not handle natively (lazy strings, decimals, dates, ...) go
+    through DRF's own encoder, so they render as with the stock renderer. Indented
+    output, ensure_ascii, and anything orjson rejects (e.g. integers wider than
+    64 bits) are rendered by the stock renderer.
+
+    The output is not byte-identical for floats: orjson writes exponents as 1e16 and
+    1e-7 where the stock renderer writes 1e+16 and 1e-07 (both parse to the same
+    value), and NaN and infinite floats become null instead of raising. Response
+    entries cached before the switch keep the stock bytes until the next version bump.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict-javascript-subset escaping as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
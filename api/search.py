@@ -0,0 +1,178 @@
+import re
+import threading
+from bisect import bisect_left
+from .cache import get_versions
+from .models import Make, CarModel, Product, Variant
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+MAX_LIMIT = 50
+
+# Tokens in at least this many names keep a precomputed bitmap; rarer ones a tuple of positions
+DENSE_POSTINGS = 32
+PREFIX_CACHE_SIZE = 4096
+
+# (result type, model, indexed field, extra fields returned with each hit), in ranking order
+SOURCES = (
+    ('make', Make, 'name', ()),
+    ('model', CarModel, 'name', ()),
+    ('product', Product, 'name', ()),
+    ('variant', Variant, 'product_name', ('product_id',)),
+)
+SEARCH_MODELS = tuple(model for _, model, _, _ in SOURCES)
+
+# Search responses are cheap to recompute and one is stored per distinct query, so
+# they leave the shared cache long before the week other responses are kept
+SEARCH_CACHE_TIME = 60 * 10
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def positions_bitmap(positions, size):
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def lowest_positions(bitmap, count):
+    positions = []
+    while bitmap and len(positions) < count:
+        low = bitmap & -bitmap
+        positions.append(low.bit_length() - 1)
+        bitmap ^= low
+    return positions
+
+
+class PrefixIndex:
+    """
+    Sorted unique tokens, each with the entries containing it. A prefix matches one
+    contiguous run of tokens, found with bisect, and resolves to a bitmap of entry
+    positions. Results for prefixes are memoised, since typeahead repeats them.
+    """
+
+    def __init__(self, token_positions, size):
+        self.size = size
+        self.tokens = sorted(token_positions)
+        self.postings = [
+            positions_bitmap(positions, size) if len(positions) >= DENSE_POSTINGS else tuple(positions)
+            for positions in (token_positions[token] for token in self.tokens)
+        ]
+        self.prefix_cache = {}
+        # Single characters match the longest runs; resolve them up front
+        for character in {token[0] for token in self.tokens}:
+            self.bitmap(character)
+
+    def bitmap(self, prefix):
+        bitmap = self.prefix_cache.get(prefix)
+        if bitmap is not None:
+            return bitmap
+
+        bitmap = 0
+        sparse = []
+        index = bisect_left(self.tokens, prefix)
+        while index < len(self.tokens) and self.tokens[index].startswith(prefix):
+            posting = self.postings[index]
+            if isinstance(posting, int):
+                bitmap |= posting
+            else:
+                sparse.extend(posting)
+            index += 1
+        if sparse:
+            bitmap |= positions_bitmap(sparse, self.size)
+
+        if len(self.prefix_cache) >= PREFIX_CACHE_SIZE:
+            self.prefix_cache.clear()
+        self.prefix_cache[prefix] = bitmap
+        return bitmap
+
+
+class Segment:
+    """
+    Prefix index over one model's names. Entries are stored shortest name first, so
+    the lowest set bits of a match bitmap are already the best ranked hits.
+    """
+
+    def __init__(self, result_type, rows, extra_fields):
+        entries = []
+        for row in rows:
+            row_id, name, *extra = row
+            tokens = tokenize(name)
+            if tokens:
+                entry = {'type': result_type, 'id': row_id, 'name': name, **dict(zip(extra_fields, extra))}
+                entries.append((len(' '.join(tokens)), row_id, tokens, entry))
+        entries.sort(key=lambda item: item[:2])
+
+        self.entries = [entry for _, _, _, entry in entries]
+        words = {}
+        leading = {}
+        for position, (_, _, tokens, _) in enumerate(entries):
+            for token in set(tokens):
+                words.setdefault(token, []).append(position)
+            leading.setdefault(tokens[0], []).append(position)
+        self.words = PrefixIndex(words, len(entries))
+        self.leading = PrefixIndex(leading, len(entries))
+
+    def match(self, query_tokens):
+        # Every query token has to prefix-match a word of the name
+        matches = -1
+        for token in sorted(set(query_tokens), key=len, reverse=True):  # longest prefix is most selective
+            matches &= self.words.bitmap(token)
+            if not matches:
+                return 0, 0
+        # Names that also start with the first query token rank above the rest
+        leading = matches & self.leading.bitmap(query_tokens[0])
+        return leading, matches & ~leading
+
+
+class SearchIndex:
+    """
+    In-process typeahead index with one Segment per source model. A segment is
+    rebuilt only when its model's cache version changes, so an edit to a make
+    does not re-read every variant, and queries never touch the database.
+
+    Versions are per model, not per row, so a segment is rebuilt whole: renaming one
+    variant re-reads every variant. Row-level deltas would need the changed ids, which
+    the version bumps don't record.
+    """
+
+    def __init__(self):
+        self.segments = {}
+        self.lock = threading.Lock()
+
+    def current_segments(self):
+        versions = get_versions(SEARCH_MODELS)
+        segments = []
+        for (result_type, model, field, extra_fields), version in zip(SOURCES, versions):
+            built = self.segments.get(result_type)
+            if built is None or built[0] != version:
+                with self.lock:
+                    built = self.segments.get(result_type)
+                    if built is None or built[0] != version:
+                        rows = model.objects.values_list('id', field, *extra_fields)
+                        built = (version, Segment(result_type, rows, extra_fields))
+                        self.segments[result_type] = built
+            segments.append(built[1])
+        return segments
+
+    # Ranked by: name starts with the query's first word, then make > model >
+    # product > variant, then shorter names, then id
+    def search(self, query, limit=10):
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        segments = self.current_segments()
+        tiers = list(zip(*(segment.match(query_tokens) for segment in segments)))
+        results = []
+        for tier in tiers:
+            for segment, bitmap in zip(segments, tier):
+                for position in lowest_positions(bitmap, limit - len(results)):
+                    results.append(segment.entries[position])
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+search_index = SearchIndex()
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.core.files.storage import default_storage
 from .models import (
     Make, 
     CarModel, 
@@ -33,6 +34,26 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'name']
 
+# Product card for the grid: expects the annotations added by ProductGridMixin
+class ProductGridSerializer(serializers.ModelSerializer):
+    main_image = serializers.SerializerMethodField()
+    variant_count = serializers.IntegerField(read_only=True)
+    variant_names = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'main_image', 'variant_count', 'variant_names']
+
+    def get_main_image(self, obj):
+        if not obj.main_image:
+            return None
+        url = default_storage.url(obj.main_image)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_variant_names(self, obj):
+        return obj.variant_names or []
+
 class ProductMakeModelConnectionSerializer(serializers.ModelSerializer):
     # parent_type = serializers.SlugRelatedField(slug_field='model', queryset=ContentType.objects.only('model'))
 
@@ -47,9 +68,24 @@ class VariantSerializer(serializers.ModelSerializer):
         depth = 1  # Automatically serialize related Product
 
 class VariantImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = VariantImage
-        fields = ['id', 'image', 'variant', 'is_main']
+        fields = ['id', 'image', 'variant', 'is_main', 'position', 'srcset', 'placeholder']
+
+    def get_srcset(self, obj):
+        request = self.context.get('request')
+        srcset = []
+        for derivative in obj.derivatives:
+            url = default_storage.url(derivative['name'])
+            srcset.append({
+                'url': request.build_absolute_uri(url) if request else url,
+                'width': derivative['width'],
+                'height': derivative['height'],
+                'format': derivative['format'],
+            })
+        return srcset
 
 class StatSerializer(serializers.ModelSerializer):
     class Meta:
@@ -68,10 +104,33 @@ class StatSerializer(serializers.ModelSerializer):
 
         return data
 
+# One row of a bulk stats import. The variant is a plain id so validating thousands of
+# rows runs no queries; api.bulk checks variants, limits and names for all rows at once.
+class StatBulkRowSerializer(serializers.Serializer):
+    variant = serializers.IntegerField(min_value=1)
+    name = serializers.CharField(max_length=12)
+    number = serializers.CharField(max_length=12)
+    unit = serializers.CharField(max_length=12)
+    additional = serializers.CharField(max_length=20, required=False, allow_blank=True, allow_null=True, default=None)
+
+# One variant in a bulk gallery update: image ids in their new order (images left out
+# follow them in their current order) and/or the new main image. Checked by api.bulk.
+class GalleryUpdateSerializer(serializers.Serializer):
+    variant = serializers.IntegerField(min_value=1)
+    images = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    main = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_images(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Image ids must be unique.")
+        return value
+
 class AudioTrackSerializer(serializers.ModelSerializer):
     class Meta:
         model = AudioTrack
-        fields = ['id', 'name', 'track', 'variant']
+        # `track` is served by the storage backend, which answers Range requests, so the
+        # player can draw from peaks/duration and stream instead of downloading first
+        fields = ['id', 'name', 'track', 'variant', 'peaks', 'duration', 'size']
 
     def validate(self, data):
         variant = data['variant']
@@ -86,6 +145,24 @@ class AudioTrackSerializer(serializers.ModelSerializer):
         return data
 
 
+# Read-only product page: the product with every variant and its images, stats and audio
+class VariantPageSerializer(serializers.ModelSerializer):
+    images = VariantImageSerializer(many=True, read_only=True)
+    stats = StatSerializer(many=True, read_only=True)
+    audio_tracks = AudioTrackSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Variant
+        fields = ['id', 'name', 'product_name', 'description', 'images', 'stats', 'audio_tracks']
+
+class ProductPageSerializer(serializers.ModelSerializer):
+    variants = VariantPageSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'variants']
+
+
 class NewsletterSubscriberSerializer(serializers.ModelSerializer):
     class Meta:
         model = NewsletterSubscriber
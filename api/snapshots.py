@@ -0,0 +1,260 @@
+import hashlib
+import itertools
+import json
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.http import HttpResponse, HttpResponseNotModified
+from django.test import RequestFactory
+from django.urls import URLPattern, resolve, reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from .cache import ScopedVersion, get_versions
+from .compression import available_encodings, choose_encoding, compress
+from .models import (
+    Make,
+    CarModel,
+    Product,
+    ProductMakeModelConnection,
+    Variant,
+    VariantImage,
+    Stat,
+    AudioTrack
+)
+from .urls import urlpatterns
+
+# A manifest is only served while none of these versions changed since its build began
+SNAPSHOT_VERSIONS = (
+    ContentType,
+    Make,
+    CarModel,
+    Product,
+    ProductMakeModelConnection,
+    Variant,
+    VariantImage,
+    ScopedVersion(VariantImage, 'galleries'),
+    ScopedVersion(VariantImage, 'main_images'),
+    Stat,
+    AudioTrack,
+)
+
+# Shared-cache keys: the manifest built for a versions token, and the latest build
+MANIFEST_POINTER_PREFIX = 'snapshot_manifest:'
+LATEST_MANIFEST_KEY = f"{MANIFEST_POINTER_PREFIX}latest"
+
+# Which model's ids fill each URL parameter when enumerating endpoints
+PARAMETER_MODELS = {
+    'make_id': Make,
+    'model_id': CarModel,
+    'product_id': Product,
+    'variant_id': Variant,
+}
+
+# 'pk' means a different model on each route, so it is mapped per URL name
+PK_MODELS = {
+    'variant-detail': Variant,
+}
+
+# Extra query strings rendered for views that support them
+VIEW_QUERY_MODES = {
+    'ProductGridMixin': ['view=grid'],
+}
+
+
+def get_storage():
+    return storages[settings.SNAPSHOT_STORAGE]
+
+
+def storage_name(name):
+    return f"{settings.SNAPSHOT_PREFIX}{name}"
+
+
+def data_name(sha, encoding=None):
+    suffix = {'gzip': '.gz', 'br': '.br'}.get(encoding, '')
+    return storage_name(f"data/{sha}.json{suffix}")
+
+
+def versions_token():
+    versions = '.'.join(str(version) for version in get_versions(SNAPSHOT_VERSIONS))
+    return hashlib.md5(versions.encode()).hexdigest()
+
+
+def load_manifest(name, storage=None):
+    storage = storage or get_storage()
+    try:
+        with storage.open(name) as manifest_file:
+            return json.loads(manifest_file.read())
+    except (FileNotFoundError, OSError, ValueError):
+        return {'version': None, 'entries': {}}
+
+
+def latest_manifest(storage=None):
+    name = cache.get(LATEST_MANIFEST_KEY)
+    return name, load_manifest(name, storage) if name else {'version': None, 'entries': {}}
+
+
+# Manifests are written once under a new name and never overwritten, so a reader never
+# sees a missing or half-written one. Publishing it points the versions token the
+# build started from at it; the pointers live in the shared cache next to the versions.
+def save_manifest(manifest, storage=None):
+    storage = storage or get_storage()
+    return storage.save(
+        storage_name(f"manifests/{manifest['version']}.json"),
+        ContentFile(json.dumps(manifest, sort_keys=True).encode()),
+    )
+
+
+def publish_manifest(name, token):
+    cache.set_many({f"{MANIFEST_POINTER_PREFIX}{token}": name, LATEST_MANIFEST_KEY: name}, None)
+
+
+# Every GET endpoint in api/urls.py, with parameterized URLs expanded for every row
+def snapshot_paths():
+    paths = []
+    for pattern in urlpatterns:
+        if not isinstance(pattern, URLPattern):
+            continue
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if view_class is None or not hasattr(view_class, 'get'):
+            continue
+
+        parameters = list(pattern.pattern.converters)
+        id_lists = []
+        for parameter in parameters:
+            model = PK_MODELS.get(pattern.name) if parameter == 'pk' else PARAMETER_MODELS.get(parameter)
+            if model is None:
+                raise ImproperlyConfigured(f"{pattern.name}: no model is mapped to the URL parameter {parameter!r}")
+            id_lists.append(list(model.objects.order_by('id').values_list('id', flat=True)))
+
+        query_modes = [''] + [
+            f"?{query}"
+            for base in view_class.__mro__
+            for query in VIEW_QUERY_MODES.get(base.__name__, [])
+        ]
+        for ids in itertools.product(*id_lists):
+            path = reverse(pattern.name, kwargs=dict(zip(parameters, ids)))
+            paths.extend(path + query for query in query_modes)
+    return paths
+
+
+class SnapshotRenderer:
+    """Renders API paths in-process, as a JSON client at base_url would see them."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.factory = RequestFactory(HTTP_HOST=parts.netloc, HTTP_ACCEPT='application/json')
+        self.secure = parts.scheme == 'https'
+
+    def render(self, path):
+        request = self.factory.get(path, secure=self.secure)
+        match = resolve(request.path_info)
+        request.resolver_match = match
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    # The path and, for paginated lists, every page reached through the `next` links
+    def render_pages(self, path):
+        pages = []
+        while path:
+            response = self.render(path)
+            if response.status_code != 200:
+                break
+            pages.append((path, response.content))
+            path = None
+            if response.get('Content-Type', '').startswith('application/json'):
+                data = json.loads(response.content)
+                if isinstance(data, dict) and set(data) == {'next', 'previous', 'results'} and data['next']:
+                    parts = urlsplit(data['next'])
+                    path = f"{parts.path}?{parts.query}"
+        return pages
+
+
+# Writes the body and its encodings unless a snapshot with the same content already
+# exists. known_shas is shared between worker threads and guarded by lock.
+def write_snapshot(storage, body, known_shas, lock):
+    sha = hashlib.sha256(body).hexdigest()
+    encodings = sorted(available_encodings())
+    with lock:
+        if sha in known_shas:
+            return sha, encodings, 0
+        known_shas.add(sha)
+    if storage.exists(data_name(sha)):
+        return sha, encodings, 0
+    for encoding, data in [(None, body)] + list(compress(body).items()):
+        storage.save(data_name(sha, encoding), ContentFile(data))
+    return sha, encodings, 1
+
+
+# Snapshot serving
+
+# (name, manifest) last loaded by this process. Manifests never change, so each is read
+# from storage once instead of being fetched and unpickled from the cache per request.
+_loaded_manifest = (None, None)
+
+
+# The manifest built from the current model versions, or None once anything changed since
+def get_manifest():
+    global _loaded_manifest
+    name = cache.get(f"{MANIFEST_POINTER_PREFIX}{versions_token()}")
+    if name is None:
+        return None
+    loaded_name, manifest = _loaded_manifest
+    if loaded_name != name:
+        manifest = load_manifest(name)
+        if manifest['version'] is None:
+            return None  # unreadable; tried again on the next request
+        _loaded_manifest = (name, manifest)
+    return manifest
+
+
+def read_snapshot(sha, encoding):
+    # Snapshot files are content-addressed and never change, so they can be cached indefinitely
+    cache_key = f"snapshot:{sha}:{encoding or 'identity'}"
+    body = cache.get(cache_key)
+    if body is None:
+        with get_storage().open(data_name(sha, encoding)) as snapshot_file:
+            body = snapshot_file.read()
+        cache.set(cache_key, body, None)
+    return body
+
+
+def serve_snapshot(request):
+    if 'text/html' in request.META.get('HTTP_ACCEPT', ''):
+        return None  # leave the browsable API to the live views
+    manifest = get_manifest()
+    entry = manifest['entries'].get(request.get_full_path()) if manifest else None
+    if entry is None:
+        return None
+
+    encoding = choose_encoding(request, entry['encodings'])
+    etag = quote_etag(f"{entry['sha']}-{encoding}" if encoding else entry['sha'])
+    # Manifests written before entries carried their modification time have none
+    modified = entry.get('modified')
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        not_modified = etag in parse_etags(request.META['HTTP_IF_NONE_MATCH'])
+    else:
+        since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        not_modified = since is not None and modified is not None and modified <= since
+    if not_modified:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(read_snapshot(entry['sha'], encoding), content_type=entry['content_type'])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = etag
+    if modified is not None:
+        response.headers['Last-Modified'] = http_date(modified)
+    response.headers['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def build_version():
+    return time.strftime('%Y%m%d%H%M%S', time.gmtime())
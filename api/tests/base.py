@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
+from api.models import CarModel, Make, Product, ProductMakeModelConnection, Variant
+
+# The real two-tier backend, with an in-memory shared tier instead of the file cache
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'api.cache_backends.TwoTierCache',
+        'LOCATION': 'shared',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-tests',
+    },
+}
+
+
+class CatalogTestMixin:
+    """
+    Runs against a fresh cache and a temporary media directory instead of S3, with
+    helpers for building a small make -> model -> product catalog.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            CACHES=TEST_CACHES,
+            STORAGES={
+                'default': {
+                    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                    'OPTIONS': {'location': cls.media_root},
+                },
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+            MEDIA_ROOT=cls.media_root,
+            SERVE_SNAPSHOTS=False,
+        )
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+    def make_model(self, name, parent):
+        return CarModel.objects.create(
+            name=name, parent_type=ContentType.objects.get_for_model(parent), parent_id=parent.id
+        )
+
+    def make_product(self, name, *parents):
+        product = Product.objects.create(name=name)
+        for parent in parents:
+            ProductMakeModelConnection.objects.create(
+                product=product, parent_type=ContentType.objects.get_for_model(parent), parent_id=parent.id
+            )
+        return product
+
+    def make_variant(self, product, name='Base'):
+        return Variant.objects.create(
+            name=name, product_name=f"{product.name} {name}", description='', product=product
+        )
+
+    def make_catalog(self):
+        # BMW > 3 Series > M3, BMW > X5 and Audi > A4, one product under each leaf
+        self.bmw = Make.objects.create(name='BMW')
+        self.audi = Make.objects.create(name='Audi')
+        self.series3 = self.make_model('3 Series', self.bmw)
+        self.m3 = self.make_model('M3', self.series3)
+        self.x5 = self.make_model('X5', self.bmw)
+        self.a4 = self.make_model('A4', self.audi)
+        self.m3_product = self.make_product('BMW 3 Series M3', self.bmw, self.series3, self.m3)
+        self.x5_product = self.make_product('BMW X5', self.bmw, self.x5)
+        self.a4_product = self.make_product('Audi A4', self.audi, self.a4)
+
+
+class CatalogTestCase(CatalogTestMixin, APITestCase):
+    pass
+
+
+# For code that writes from its own threads, which can't see a TestCase's transaction
+class CatalogTransactionTestCase(CatalogTestMixin, APITransactionTestCase):
+    pass
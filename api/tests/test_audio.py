@@ -0,0 +1,109 @@
+from io import StringIO
+from unittest import mock
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from api.audio import DECODE_SAMPLE_RATE, WAVEFORM_SCALE, build_waveform, compute_peaks
+from api.management.commands.build_waveforms import Command as BuildWaveformsCommand
+from api.models import AudioTrack
+from .base import CatalogTestCase, CatalogTransactionTestCase
+
+# One second of a rising ramp, as decode_track would return it
+SAMPLES = np.linspace(0, 1000, DECODE_SAMPLE_RATE).astype(np.int16)
+
+
+class AudioTrackMixin:
+    def setUp(self):
+        super().setUp()
+        self.variant = self.make_variant(self.make_product('BMW X5'))
+
+    def audio_track(self, name='Idle', data=b'mp3 data'):
+        return AudioTrack.objects.create(
+            variant=self.variant, name=name, track=default_storage.save(f"audio_tracks/{name}.mp3", ContentFile(data))
+        )
+
+
+@mock.patch('api.audio.decode_track', return_value=SAMPLES)
+class WaveformTests(AudioTrackMixin, CatalogTestCase):
+    def test_peaks_are_normalised(self, decode_track):
+        peaks = compute_peaks(SAMPLES, count=10)
+        self.assertEqual(len(peaks), 10)
+        self.assertEqual(peaks[-1], WAVEFORM_SCALE)
+        self.assertEqual(peaks, sorted(peaks))
+
+    def test_saving_does_not_decode(self, decode_track):
+        with self.captureOnCommitCallbacks(execute=True):
+            audio_track = self.audio_track()
+            audio_track.name = 'Revving'
+            audio_track.save()
+        decode_track.assert_not_called()
+
+    def test_waveform_is_stored(self, decode_track):
+        audio_track = self.audio_track()
+        build_waveform(audio_track)
+        audio_track.refresh_from_db()
+        self.assertEqual((audio_track.duration, audio_track.size, len(audio_track.peaks)), (1.0, 8, 600))
+
+    def test_new_file_clears_the_waveform(self, decode_track):
+        audio_track = self.audio_track()
+        build_waveform(audio_track)
+
+        audio_track.track = default_storage.save('audio_tracks/Revving.mp3', ContentFile(b'other'))
+        audio_track.save()
+        audio_track.refresh_from_db()
+        self.assertEqual((audio_track.peaks, audio_track.duration, audio_track.size), ([], None, None))
+
+    def test_other_edits_keep_the_waveform(self, decode_track):
+        audio_track = self.audio_track()
+        build_waveform(audio_track)
+        audio_track.name = 'Revving'
+        audio_track.save()
+        audio_track.refresh_from_db()
+        self.assertEqual(audio_track.duration, 1.0)
+
+    def test_waveform_of_a_replaced_file_is_not_stored(self, decode_track):
+        audio_track = self.audio_track()
+        AudioTrack.objects.filter(pk=audio_track.pk).update(track='audio_tracks/Revving.mp3')
+        build_waveform(audio_track)
+        audio_track.refresh_from_db()
+        self.assertIsNone(audio_track.duration)
+
+
+class BuildWaveformsCommandTests(AudioTrackMixin, CatalogTransactionTestCase):
+    def test_command_builds_missing_waveforms_and_bumps_once(self):
+        tracks = [self.audio_track(name) for name in ('Idle', 'Revving')]
+        broken = self.audio_track('Broken', b'broken')
+
+        def decode_track(data):
+            if data == b'broken':
+                raise RuntimeError("ffmpeg failed")
+            return SAMPLES
+
+        with mock.patch('api.audio.decode_track', side_effect=decode_track), \
+                mock.patch('api.management.commands.build_waveforms.bump_version') as bump_version:
+            call_command('build_waveforms', '--workers', '2', stdout=StringIO())
+        bump_version.assert_called_once_with(AudioTrack)
+
+        for audio_track in tracks:
+            audio_track.refresh_from_db()
+            self.assertEqual(audio_track.duration, 1.0)
+        broken.refresh_from_db()
+        self.assertIsNone(broken.duration)
+
+    def test_failed_tracks_are_skipped_until_their_file_changes(self):
+        audio_track = self.audio_track()
+        command = BuildWaveformsCommand(stdout=StringIO())
+        with mock.patch('api.audio.decode_track', side_effect=RuntimeError("ffmpeg failed")):
+            failed = command.build_tracks(False, 1)
+        self.assertEqual(failed, {(audio_track.id, audio_track.track.name)})
+
+        with mock.patch('api.audio.decode_track', return_value=SAMPLES) as decode_track:
+            self.assertEqual(command.build_tracks(False, 1, exclude=failed, quiet=True), set())
+            decode_track.assert_not_called()
+
+            audio_track.track = default_storage.save('audio_tracks/Revving.mp3', ContentFile(b'other'))
+            audio_track.save()
+            command.build_tracks(False, 1, exclude=failed, quiet=True)
+        audio_track.refresh_from_db()
+        self.assertEqual(audio_track.duration, 1.0)
@@ -0,0 +1,94 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from api.bulk import MAX_STATS_PER_VARIANT, import_stats
+from api.models import Stat
+from .base import CatalogTestCase
+
+
+def stat_row(variant, name, number='1', unit='s', **fields):
+    return {'variant': variant.id, 'name': name, 'number': number, 'unit': unit, **fields}
+
+
+class ImportStatsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.variant = self.make_variant(self.make_product('BMW X5'))
+        Stat.objects.create(variant=self.variant, name='0-100', number='4.3', unit='s')
+
+    def stats(self):
+        return {stat.name: stat.number for stat in Stat.objects.filter(variant=self.variant)}
+
+    def test_rows_are_created_updated_or_left_alone(self):
+        result = import_stats([
+            stat_row(self.variant, '0-100', '4.3'),
+            stat_row(self.variant, 'Power', '460', 'kW'),
+        ])
+        self.assertEqual(result, {'created': 1, 'updated': 0, 'unchanged': 1})
+
+        result = import_stats([stat_row(self.variant, '0-100', '4.1')])
+        self.assertEqual(result, {'created': 0, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(self.stats(), {'0-100': '4.1', 'Power': '460'})
+
+    def test_dry_run_writes_nothing(self):
+        result = import_stats([stat_row(self.variant, 'Power', '460', 'kW')], dry_run=True)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(self.stats(), {'0-100': '4.3'})
+
+    def test_limit_counts_existing_stats(self):
+        rows = [stat_row(self.variant, name) for name in ('Power', 'Torque', 'Weight')]
+        with self.assertRaises(ValidationError) as raised:
+            import_stats(rows)
+        self.assertEqual(raised.exception.detail[0]['non_field_errors'][0], f"A variant can only have {MAX_STATS_PER_VARIANT} stats.")
+        self.assertEqual(self.stats(), {'0-100': '4.3'})
+
+    def test_updates_do_not_count_towards_the_limit(self):
+        import_stats([stat_row(self.variant, name) for name in ('Power', 'Torque')])
+        result = import_stats([stat_row(self.variant, name, '2') for name in ('0-100', 'Power', 'Torque')])
+        self.assertEqual(result['updated'], 3)
+
+    def test_errors_are_reported_per_row(self):
+        rows = [
+            stat_row(self.variant, 'Power'),
+            {'variant': 999999, 'name': 'Power', 'number': '1', 'unit': 'kW'},
+            stat_row(self.variant, 'Power'),
+        ]
+        with self.assertRaises(ValidationError) as raised:
+            import_stats(rows)
+        errors = raised.exception.detail
+        self.assertEqual(errors[0], {})
+        self.assertIn('variant', errors[1])
+        self.assertIn('name', errors[2])
+        self.assertEqual(self.stats(), {'0-100': '4.3'})
+
+    def test_malformed_rows_are_rejected_by_the_serializer(self):
+        with self.assertRaises(ValidationError) as raised:
+            import_stats([{'variant': self.variant.id, 'name': 'A name that is too long', 'number': '1'}])
+        self.assertEqual(set(raised.exception.detail[0]), {'name', 'unit'})
+
+
+class StatBulkViewTests(CatalogTestCase):
+    url = reverse('stat-bulk')
+
+    def setUp(self):
+        super().setUp()
+        self.variant = self.make_variant(self.make_product('BMW X5'))
+
+    def test_staff_only(self):
+        response = self.client.post(self.url, [stat_row(self.variant, 'Power')], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_import_invalidates_cached_stats(self):
+        stats_url = reverse('stats-by-variant', kwargs={'variant_id': self.variant.id})
+        self.assertEqual(self.client.get(stats_url).json(), [])
+
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        response = self.client.post(self.url, [stat_row(self.variant, 'Power', '460', 'kW')], format='json')
+        self.assertEqual(response.json(), {'created': 1, 'updated': 0, 'unchanged': 0})
+        self.assertEqual([stat['name'] for stat in self.client.get(stats_url).json()], ['Power'])
+
+    def test_invalid_import_is_a_400(self):
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        response = self.client.post(self.url, [stat_row(self.variant, 'Power'), stat_row(self.variant, 'Power')], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Stat.objects.count(), 0)
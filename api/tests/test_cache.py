@@ -0,0 +1,145 @@
+import gzip
+from django.urls import reverse
+from api.cache import ScopedVersion, bump_scoped_versions, bump_version, get_versions, version_key
+from api.models import Make, VariantImage
+from .base import CatalogTestCase
+
+
+class VersionTests(CatalogTestCase):
+    def test_bump_version_always_increases(self):
+        versions = [get_versions([Make])[0]]
+        for _ in range(3):
+            bump_version(Make)
+            versions.append(get_versions([Make])[0])
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_saving_a_row_bumps_its_model_version(self):
+        before = get_versions([Make])
+        Make.objects.create(name='BMW')
+        self.assertGreater(get_versions([Make]), before)
+
+    def test_scoped_versions_are_bumped_independently(self):
+        scoped = ScopedVersion(VariantImage, 'variant', 'variant_id')
+        versions = get_versions([VariantImage, scoped], {'variant_id': 1})
+        other = get_versions([scoped], {'variant_id': 2})
+
+        bump_scoped_versions(VariantImage, 'variant', [1])
+
+        self.assertEqual(get_versions([VariantImage])[0], versions[0])
+        self.assertGreater(get_versions([scoped], {'variant_id': 1})[0], versions[1])
+        self.assertEqual(get_versions([scoped], {'variant_id': 2}), other)
+
+    def test_named_scope_shares_the_model_key_prefix(self):
+        self.assertEqual(ScopedVersion(VariantImage, 'galleries').key({}), version_key(VariantImage, 'galleries'))
+        self.assertEqual(version_key(VariantImage, 'galleries'), f"{version_key(VariantImage)}:galleries")
+
+
+class VersionedCachePageTests(CatalogTestCase):
+    url = reverse('make-list')
+
+    def test_hit_runs_no_queries(self):
+        Make.objects.create(name='BMW')
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_write_invalidates_cached_response(self):
+        Make.objects.create(name='BMW')
+        self.assertEqual([make['name'] for make in self.client.get(self.url).json()], ['BMW'])
+
+        Make.objects.create(name='Audi')
+        self.assertEqual(sorted(make['name'] for make in self.client.get(self.url).json()), ['Audi', 'BMW'])
+
+    def test_read_inside_an_open_write_is_not_kept(self):
+        Make.objects.create(name='BMW')
+        with self.captureOnCommitCallbacks(execute=True):
+            Make.objects.create(name='Audi')
+            # Stands in for a concurrent read that caches under the version the write bumped
+            during = self.client.get(self.url)
+        after = self.client.get(self.url, HTTP_IF_NONE_MATCH=during['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], during['ETag'])
+
+    def test_other_model_writes_keep_the_entry(self):
+        Make.objects.create(name='BMW')
+        self.client.get(self.url)
+        bump_version(VariantImage)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_write_methods_are_not_cached(self):
+        response = self.client.post(reverse('product-list'), {'name': 'BMW X5'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('ETag', response)
+
+
+class ConditionalGetTests(CatalogTestCase):
+    url = reverse('make-list')
+
+    def setUp(self):
+        super().setUp()
+        Make.objects.create(name='BMW')
+
+    def test_validators_are_sent(self):
+        response = self.client.get(self.url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_matching_etag_gets_304_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since_gets_304(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Make.objects.create(name='Audi')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_accept_header_changes_the_etag(self):
+        json_etag = self.client.get(self.url, HTTP_ACCEPT='application/json')['ETag']
+        html_etag = self.client.get(self.url, HTTP_ACCEPT='text/html')['ETag']
+        self.assertNotEqual(json_etag, html_etag)
+
+
+class CompressedEntryTests(CatalogTestCase):
+    url = reverse('make-list')
+
+    def setUp(self):
+        super().setUp()
+        # Enough makes for the body to pass MIN_COMPRESS_LENGTH
+        Make.objects.bulk_create([Make(name=f"Make {number}") for number in range(20)])
+        bump_version(Make)
+
+    def test_gzip_is_served_when_accepted(self):
+        identity = self.client.get(self.url)
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), identity.content)
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+
+    def test_refused_encoding_is_not_served(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_each_encoding_has_its_own_etag(self):
+        identity = self.client.get(self.url)['ETag']
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        self.assertEqual(compressed, f'{identity[:-1]}-gzip"')
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], compressed)
+
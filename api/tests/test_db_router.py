@@ -0,0 +1,90 @@
+import time
+from unittest import mock
+from django.db import connections
+from django.test import TestCase, override_settings
+from api.models import Make
+from core.db_router import (
+    end_request_routing,
+    pin_primary,
+    pin_primary_after_write,
+    replica_monitor,
+    start_request_routing,
+)
+
+REPLICA = 'replica_0'
+
+# A second, in-memory sqlite alias standing in for the replica. It is registered when
+# the module is imported, so the test runner sets it up like any configured database;
+# the router never migrates it, so the tests create its one table themselves.
+connections.settings[REPLICA] = connections.configure_settings({
+    'default': connections.settings['default'],
+    REPLICA: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+})[REPLICA]
+
+
+@override_settings(REPLICA_DATABASES=[REPLICA], REPLICA_MAX_LAG=5, REPLICA_CHECK_INTERVAL=60)
+class ReplicaRouterTests(TestCase):
+    """The replica holds a row the primary does not, so each read shows where it went."""
+
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        with connections[REPLICA].schema_editor() as editor:
+            editor.create_model(Make)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connections[REPLICA].schema_editor() as editor:
+            editor.delete_model(Make)
+
+    def setUp(self):
+        Make.objects.using(REPLICA).create(name='Replica')
+        Make.objects.create(name='Primary')
+        status = mock.patch.dict(replica_monitor.status, clear=True)
+        status.start()
+        self.addCleanup(status.stop)
+
+    def read(self):
+        return list(Make.objects.values_list('name', flat=True))
+
+    def routed(self):
+        token = start_request_routing()
+        self.addCleanup(end_request_routing, token)
+
+    def test_reads_outside_a_request_go_to_the_primary(self):
+        self.assertEqual(self.read(), ['Primary'])
+
+    def test_reads_in_a_request_go_to_the_replica(self):
+        self.routed()
+        self.assertEqual(self.read(), ['Replica'])
+
+    def test_writes_go_to_the_primary_and_pin_later_reads(self):
+        self.routed()
+        self.assertEqual(self.read(), ['Replica'])
+        Make.objects.create(name='Written')
+        self.assertEqual(Make.objects.using(REPLICA).count(), 1)
+        self.assertEqual(self.read(), ['Primary', 'Written'])
+
+    def test_pin_only_lasts_for_its_request(self):
+        token = start_request_routing()
+        pin_primary()
+        self.assertEqual(self.read(), ['Primary'])
+        end_request_routing(token)
+
+        self.routed()
+        self.assertEqual(self.read(), ['Replica'])
+
+    def test_recent_writes_pin_the_primary(self):
+        self.routed()
+        pin_primary_after_write(time.time() * 1000 - 60_000)
+        self.assertEqual(self.read(), ['Replica'])
+        pin_primary_after_write(time.time() * 1000)
+        self.assertEqual(self.read(), ['Primary'])
+
+    def test_unusable_replica_falls_back_to_the_primary(self):
+        self.routed()
+        with mock.patch.object(replica_monitor, 'check', return_value=False):
+            self.assertEqual(self.read(), ['Primary'])
@@ -0,0 +1,63 @@
+from django.urls import reverse
+from api.facets import facet_search
+from .base import CatalogTestCase
+
+
+class FacetSearchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_catalog()
+
+    def test_no_selection_matches_everything(self):
+        facets = facet_search([], [])
+        self.assertEqual(facets['product_ids'], [self.m3_product.id, self.x5_product.id, self.a4_product.id])
+        self.assertEqual(facets['makes'], {self.bmw.id: 2, self.audi.id: 1})
+        self.assertEqual(facets['models'], {self.series3.id: 1, self.m3.id: 1, self.x5.id: 1, self.a4.id: 1})
+
+    def test_make_counts_ignore_the_make_selection(self):
+        facets = facet_search([self.bmw.id], [])
+        self.assertEqual(facets['product_ids'], [self.m3_product.id, self.x5_product.id])
+        self.assertEqual(facets['makes'], {self.bmw.id: 2, self.audi.id: 1})
+        self.assertEqual(facets['models'], {self.series3.id: 1, self.m3.id: 1, self.x5.id: 1})
+
+    def test_facets_are_anded_and_ids_ored(self):
+        self.assertEqual(facet_search([self.audi.id], [self.series3.id])['product_ids'], [])
+        self.assertEqual(
+            facet_search([], [self.m3.id, self.a4.id])['product_ids'], [self.m3_product.id, self.a4_product.id]
+        )
+
+    def test_model_connection_counts_for_its_ancestors(self):
+        product = self.make_product('BMW M3 Touring', self.m3)
+        self.assertEqual(facet_search([self.bmw.id], [self.series3.id])['product_ids'], [self.m3_product.id, product.id])
+        facets = facet_search([], [])
+        self.assertEqual(facets['makes'][self.bmw.id], 3)
+        self.assertEqual(facets['models'][self.series3.id], 2)
+
+    def test_new_connection_rebuilds_the_index(self):
+        self.assertEqual(facet_search([self.audi.id], [])['product_ids'], [self.a4_product.id])
+        product = self.make_product('Audi A4 Avant', self.a4)
+        self.assertEqual(facet_search([self.audi.id], [])['product_ids'], [self.a4_product.id, product.id])
+
+
+class ProductFacetsViewTests(CatalogTestCase):
+    url = reverse('product-facets')
+
+    def setUp(self):
+        super().setUp()
+        self.make_catalog()
+
+    def test_response_lists_products_and_counts(self):
+        response = self.client.get(self.url, {'make': f"{self.bmw.id}", 'model': f"{self.x5.id},{self.a4.id}"}).json()
+        self.assertEqual(response['count'], 1)
+        self.assertEqual([product['id'] for product in response['results']], [self.x5_product.id])
+        self.assertEqual(response['facets']['makes'], {str(self.bmw.id): 1, str(self.audi.id): 1})
+
+    def test_grid_view_is_supported(self):
+        self.make_variant(self.x5_product)
+        response = self.client.get(self.url, {'model': self.x5.id, 'view': 'grid'}).json()
+        self.assertEqual(response['results'][0]['variant_count'], 1)
+
+    def test_invalid_ids_are_rejected(self):
+        response = self.client.get(self.url, {'make': 'bmw'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('make', response.json())
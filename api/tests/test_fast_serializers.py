@@ -0,0 +1,51 @@
+from unittest import mock
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from rest_framework import generics
+from api.fast_serializers import ValuesListMixin, ValuesPlan
+from api.serializers import VariantImageSerializer
+from .base import TEST_CACHES, CatalogTestCase
+
+
+class ValuesListMixinTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_catalog()
+        for product in (self.m3_product, self.x5_product):
+            self.make_variant(product, 'Competition – 510 hp ✓')
+            self.make_variant(product, 'Touring')
+
+    def assertRendersLikeTheSerializer(self, url, params=None):
+        fast = self.client.get(url, params)
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        with mock.patch.object(ValuesListMixin, 'list', generics.ListAPIView.list), \
+                mock.patch.object(ValuesPlan, 'serialize') as serialize:
+            plain = self.client.get(url, params)
+        serialize.assert_not_called()
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, plain.content)
+        return fast.json()
+
+    def test_models_match_the_serializer(self):
+        models = self.assertRendersLikeTheSerializer(reverse('model-list'))
+        self.assertEqual(len(models), 4)
+        self.assertEqual(models[0]['parent_type']['model'], 'make')
+
+    def test_variants_match_the_serializer(self):
+        variants = self.assertRendersLikeTheSerializer(reverse('variant-list'))
+        self.assertEqual(variants[0]['product'], {'id': self.m3_product.id, 'name': self.m3_product.name})
+
+    def test_variants_of_a_product_match_the_serializer(self):
+        url = reverse('variants-by-product', kwargs={'product_id': self.x5_product.id})
+        self.assertEqual(len(self.assertRendersLikeTheSerializer(url)), 2)
+
+    def test_pages_match_the_serializer(self):
+        page = self.assertRendersLikeTheSerializer(reverse('variant-list'), {'page_size': 3})
+        self.assertEqual(len(page['results']), 3)
+
+    def test_fields_that_need_an_instance_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesPlan(VariantImageSerializer)
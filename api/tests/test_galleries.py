@@ -0,0 +1,146 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from api.bulk import update_galleries
+from api.cache import ScopedVersion, get_versions
+from api.models import VariantImage
+from .base import CatalogTestCase
+
+
+class UpdateGalleriesTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        product = self.make_product('BMW X5')
+        self.variant = self.make_variant(product, 'Base')
+        self.other = self.make_variant(product, 'Competition')
+        self.images = self.gallery(self.variant, 3)
+        self.other_images = self.gallery(self.other, 2)
+
+    def gallery(self, variant, count):
+        return VariantImage.objects.bulk_create([
+            VariantImage(variant=variant, image=f"variant_images/{variant.id}_{position}.jpg", position=position, is_main=position == 0)
+            for position in range(count)
+        ])
+
+    def order(self, variant):
+        return list(VariantImage.objects.filter(variant=variant).order_by('position').values_list('id', flat=True))
+
+    def main(self, variant):
+        return VariantImage.objects.get(variant=variant, is_main=True).id
+
+    def versions(self):
+        return get_versions([
+            VariantImage,
+            ScopedVersion(VariantImage, 'galleries'),
+            ScopedVersion(VariantImage, 'main_images'),
+            ScopedVersion(VariantImage, 'variant', 'variant_id'),
+        ], {'variant_id': self.variant.id})
+
+    def test_listed_images_come_first(self):
+        first, second, third = self.images
+        result = update_galleries([{'variant': self.variant.id, 'images': [third.id]}])
+        self.assertEqual(self.order(self.variant), [third.id, first.id, second.id])
+        self.assertEqual(result, {'variants': 1, 'reordered': 3, 'main_switched': 0})
+
+    def test_main_image_is_switched(self):
+        result = update_galleries([{'variant': self.variant.id, 'main': self.images[2].id}])
+        self.assertEqual(self.main(self.variant), self.images[2].id)
+        self.assertEqual(VariantImage.objects.filter(variant=self.variant, is_main=True).count(), 1)
+        self.assertEqual(result['main_switched'], 1)
+
+    def test_several_variants_in_one_call(self):
+        update_galleries([
+            {'variant': self.variant.id, 'images': [self.images[1].id], 'main': self.images[1].id},
+            {'variant': self.other.id, 'main': self.other_images[1].id},
+        ])
+        self.assertEqual(self.order(self.variant)[0], self.images[1].id)
+        self.assertEqual(self.main(self.variant), self.images[1].id)
+        self.assertEqual(self.main(self.other), self.other_images[1].id)
+
+    def test_one_invalid_item_rejects_the_whole_update(self):
+        with self.assertRaises(ValidationError) as raised:
+            update_galleries([
+                {'variant': self.variant.id, 'images': [self.images[2].id]},
+                {'variant': self.other.id, 'main': self.images[0].id},
+                {'variant': self.variant.id, 'main': self.images[1].id},
+            ])
+        errors = raised.exception.detail
+        self.assertEqual(errors[0], {})
+        self.assertIn('main', errors[1])
+        self.assertIn('variant', errors[2])
+        self.assertEqual(self.order(self.variant), [image.id for image in self.images])
+
+    def test_duplicate_image_ids_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            update_galleries([{'variant': self.variant.id, 'images': [self.images[0].id, self.images[0].id]}])
+
+    def test_unknown_variant_is_rejected(self):
+        with self.assertRaises(ValidationError) as raised:
+            update_galleries([{'variant': self.variant.id, 'main': self.images[1].id}, {'variant': 999999}])
+        self.assertEqual(raised.exception.detail[1]['variant'], ['Invalid pk "999999" - object does not exist.'])
+        self.assertEqual(self.main(self.variant), self.images[0].id)
+
+    def test_reorder_bumps_the_variant_and_gallery_scopes(self):
+        model, galleries, mains, variant = self.versions()
+        other = get_versions([ScopedVersion(VariantImage, 'variant', 'variant_id')], {'variant_id': self.other.id})
+
+        update_galleries([{'variant': self.variant.id, 'images': [self.images[1].id]}])
+
+        new_model, new_galleries, new_mains, new_variant = self.versions()
+        self.assertEqual((new_model, new_mains), (model, mains))
+        self.assertGreater(new_galleries, galleries)
+        self.assertGreater(new_variant, variant)
+        self.assertEqual(get_versions([ScopedVersion(VariantImage, 'variant', 'variant_id')], {'variant_id': self.other.id}), other)
+
+    def test_main_switch_bumps_only_the_main_images_scope(self):
+        model, galleries, mains, variant = self.versions()
+        update_galleries([{'variant': self.variant.id, 'main': self.images[1].id}])
+        new_model, new_galleries, new_mains, new_variant = self.versions()
+        self.assertEqual((new_model, new_galleries), (model, galleries))
+        self.assertGreater(new_mains, mains)
+        self.assertGreater(new_variant, variant)
+
+    def test_no_op_bumps_nothing(self):
+        versions = self.versions()
+        result = update_galleries([{'variant': self.variant.id, 'images': [image.id for image in self.images], 'main': self.images[0].id}])
+        self.assertEqual(result, {'variants': 0, 'reordered': 0, 'main_switched': 0})
+        self.assertEqual(self.versions(), versions)
+
+
+class VariantImageGalleryViewTests(CatalogTestCase):
+    url = reverse('variant-image-gallery')
+
+    def setUp(self):
+        super().setUp()
+        self.variant = self.make_variant(self.make_product('BMW X5'))
+        self.images = VariantImage.objects.bulk_create([
+            VariantImage(variant=self.variant, image=f"variant_images/{position}.jpg", position=position)
+            for position in range(3)
+        ])
+
+    def test_staff_only(self):
+        response = self.client.post(self.url, [{'variant': self.variant.id, 'main': self.images[0].id}], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_update_invalidates_the_variant_gallery(self):
+        gallery_url = reverse('variant-images-by-variant', kwargs={'variant_id': self.variant.id})
+        self.assertEqual([image['id'] for image in self.client.get(gallery_url).json()], [image.id for image in self.images])
+
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        order = [image.id for image in reversed(self.images)]
+        response = self.client.post(self.url, [{'variant': self.variant.id, 'images': order}], format='json')
+        self.assertEqual(response.status_code, 200)
+
+        gallery = self.client.get(gallery_url).json()
+        self.assertEqual([image['id'] for image in gallery], order)
+        self.assertEqual([image['position'] for image in gallery], [0, 1, 2])
+
+    def test_main_switch_invalidates_product_grids(self):
+        self.images[0].is_main = True
+        self.images[0].save()
+        grid_url = reverse('products-with-variant-image')
+        self.assertEqual(self.client.get(grid_url, {'view': 'grid'}).json()[0]['main_image'], self.images[0].image.url)
+
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        self.client.post(self.url, [{'variant': self.variant.id, 'main': self.images[2].id}], format='json')
+        self.assertEqual(self.client.get(grid_url, {'view': 'grid'}).json()[0]['main_image'], self.images[2].image.url)
@@ -0,0 +1,109 @@
+from io import StringIO
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db.models.signals import post_save
+from api.cache import get_versions
+from api.facets import facet_search
+from api.hierarchy import get_catalog_tree
+from api.models import CarModel, Make
+from .base import CatalogTestCase
+
+
+class CarModelPathTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_catalog()
+
+    def refresh(self, *car_models):
+        for car_model in car_models:
+            car_model.refresh_from_db()
+
+    def test_paths_are_set_on_create(self):
+        self.assertEqual(self.series3.path, f"{self.bmw.id}/")
+        self.assertEqual(self.m3.path, f"{self.bmw.id}/{self.series3.id}/")
+        self.assertEqual(self.m3.make_id, self.bmw.id)
+        self.assertEqual(set(self.bmw.descendants()), {self.series3, self.m3, self.x5})
+
+    def test_ancestors_take_one_query(self):
+        with self.assertNumQueries(1):
+            ancestors = self.m3.ancestors()
+        self.assertEqual([(type(node).__name__, node.id) for node in ancestors], [('Make', self.bmw.id), ('CarModel', self.series3.id)])
+
+    def test_reparenting_moves_the_subtree(self):
+        self.series3.parent_id = self.audi.id
+        self.series3.save()
+        self.refresh(self.m3)
+        self.assertEqual(self.m3.path, f"{self.audi.id}/{self.series3.id}/")
+        self.assertEqual(facet_search([self.audi.id], [])['product_ids'], [self.m3_product.id, self.a4_product.id])
+
+    def test_version_is_bumped_after_the_subtree_is_rewritten(self):
+        at_post_save = []
+
+        def record_version(sender, **kwargs):
+            at_post_save.extend(get_versions([CarModel]))
+        post_save.connect(record_version, sender=CarModel)
+        self.addCleanup(post_save.disconnect, record_version, sender=CarModel)
+
+        self.series3.parent_id = self.audi.id
+        self.series3.save()
+        self.assertGreater(get_versions([CarModel])[0], at_post_save[0])
+
+    def test_moving_under_a_pathless_model_clears_the_subtree(self):
+        orphan = CarModel.objects.create(name='Orphan', parent_type=self.m3.parent_type, parent_id=999999)
+        self.assertEqual(orphan.path, '')
+
+        self.series3.parent_type = self.m3.parent_type
+        self.series3.parent_id = orphan.id
+        self.series3.save()
+        self.refresh(self.series3, self.m3)
+        self.assertEqual((self.series3.path, self.m3.path), ('', ''))
+
+        # Giving the top of the subtree a make restores every path below it
+        orphan.parent_type = ContentType.objects.get_for_model(Make)
+        orphan.parent_id = self.bmw.id
+        orphan.save()
+        self.refresh(self.series3, self.m3)
+        self.assertEqual(self.m3.path, f"{self.bmw.id}/{orphan.id}/{self.series3.id}/")
+
+    def test_deleting_a_make_clears_its_subtree(self):
+        self.bmw.delete()
+        self.refresh(self.series3, self.m3, self.x5)
+        self.assertEqual({self.series3.path, self.m3.path, self.x5.path}, {''})
+        self.assertEqual(self.m3.ancestors(), [])
+        self.assertNotIn(self.bmw.id, facet_search([], [])['makes'])
+        self.assertNotIn(self.m3.id, facet_search([], [])['models'])
+
+    def test_deleting_a_model_clears_its_subtree_only(self):
+        self.series3.delete()
+        self.refresh(self.m3, self.x5)
+        self.assertEqual(self.m3.path, '')
+        self.assertIsNone(self.m3.make_id)
+        self.assertEqual(self.x5.path, f"{self.bmw.id}/")
+        self.assertEqual([node['name'] for node in get_catalog_tree()[1]['children']], ['X5'])
+
+
+class RebuildModelPathsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_catalog()
+
+    def test_rebuild_fixes_paths_and_invalidates_the_cache(self):
+        CarModel.objects.filter(id=self.m3.id).update(path='')
+        version = get_versions([CarModel])[0]
+
+        output = StringIO()
+        call_command('rebuild_model_paths', stdout=output)
+
+        self.m3.refresh_from_db()
+        self.assertEqual(self.m3.path, f"{self.bmw.id}/{self.series3.id}/")
+        self.assertIn('Updated paths for 1 of 4 models', output.getvalue())
+        self.assertGreater(get_versions([CarModel])[0], version)
+
+    def test_unreachable_models_get_no_path(self):
+        CarModel.objects.filter(id=self.series3.id).update(parent_id=self.m3.id, parent_type=self.m3.parent_type)
+        output = StringIO()
+        call_command('rebuild_model_paths', stdout=output)
+
+        paths = CarModel.objects.filter(id__in=[self.series3.id, self.m3.id]).values_list('path', flat=True)
+        self.assertEqual(set(paths), {''})
+        self.assertIn('2 models have no reachable make', output.getvalue())
@@ -0,0 +1,87 @@
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+from api.cache import get_versions
+from api.images import build_derivatives, derivative_formats
+from api.models import VariantImage
+from .base import CatalogTestCase, CatalogTransactionTestCase
+
+
+def jpeg(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+class VariantImageMixin:
+    def setUp(self):
+        super().setUp()
+        self.variant = self.make_variant(self.make_product('BMW X5'))
+
+    def variant_image(self, width=800, height=600):
+        return VariantImage.objects.create(
+            variant=self.variant, image=default_storage.save('variant_images/front.jpg', jpeg(width, height))
+        )
+
+
+class DerivativeTests(VariantImageMixin, CatalogTestCase):
+    def test_derivatives_are_written_without_upscaling(self):
+        variant_image = self.variant_image()
+        derivatives = build_derivatives(variant_image)
+
+        formats = [image_format.lower() for image_format in derivative_formats()]
+        self.assertEqual(
+            [(derivative['width'], derivative['format']) for derivative in derivatives],
+            [(width, image_format) for width in (320, 640) for image_format in formats],
+        )
+        self.assertEqual(derivatives[0]['height'], 240)
+        for derivative in derivatives:
+            self.assertTrue(default_storage.exists(derivative['name']))
+
+        variant_image.refresh_from_db()
+        self.assertEqual(variant_image.derivatives, derivatives)
+        self.assertTrue(variant_image.placeholder.startswith('data:image/jpeg;base64,'))
+
+    def test_new_file_clears_the_old_derivatives(self):
+        variant_image = self.variant_image()
+        old = build_derivatives(variant_image)
+
+        variant_image.image = default_storage.save('variant_images/rear.jpg', jpeg(400, 300))
+        with self.captureOnCommitCallbacks(execute=True):
+            variant_image.save()
+
+        variant_image.refresh_from_db()
+        self.assertEqual((variant_image.derivatives, variant_image.placeholder), ([], ''))
+        self.assertFalse(any(default_storage.exists(derivative['name']) for derivative in old))
+
+    def test_other_edits_keep_the_derivatives(self):
+        variant_image = self.variant_image()
+        derivatives = build_derivatives(variant_image)
+        variant_image.is_main = True
+        variant_image.save()
+        variant_image.refresh_from_db()
+        self.assertEqual(variant_image.derivatives, derivatives)
+
+    def test_building_does_not_bump_per_image(self):
+        variant_image = self.variant_image()
+        version = get_versions([VariantImage])
+        build_derivatives(variant_image)
+        self.assertEqual(get_versions([VariantImage]), version)
+
+
+class BuildImageDerivativesCommandTests(VariantImageMixin, CatalogTransactionTestCase):
+    def test_command_builds_missing_derivatives_and_bumps_once(self):
+        built = self.variant_image()
+        build_derivatives(built)
+        missing = [self.variant_image(400, 300) for _ in range(2)]
+
+        with mock.patch('api.management.commands.build_image_derivatives.bump_version') as bump_version:
+            call_command('build_image_derivatives', '--workers', '2', stdout=StringIO())
+        bump_version.assert_called_once_with(VariantImage)
+
+        for variant_image in missing:
+            variant_image.refresh_from_db()
+            self.assertEqual(variant_image.derivatives[0]['width'], 320)
@@ -0,0 +1,99 @@
+import os
+import tempfile
+from django.core.files import File
+from django.core.files.storage import default_storage
+from api.ingest import Checkpoint, IngestJob, MediaIngestor
+from api.models import VariantImage
+from .base import CatalogTestCase
+
+
+class MediaIngestorTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.variant = self.make_variant(self.make_product('BMW X5'))
+        self.source_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.source_dir.cleanup)
+        self.checkpoint_path = os.path.join(self.source_dir.name, 'checkpoint.json')
+        self.jobs = [self.job(f"image_{number}.jpg") for number in range(5)]
+
+    def job(self, file_name, **fields):
+        path = os.path.join(self.source_dir.name, file_name)
+        with open(path, 'wb') as source_file:
+            source_file.write(file_name.encode())
+        return IngestJob(path, {'variant': self.variant, **fields})
+
+    def store(self, job, name):
+        with open(job.source_path, 'rb') as source_file:
+            return default_storage.save(name, File(source_file))
+
+    def ingest(self, jobs, **kwargs):
+        ingestor = MediaIngestor(
+            VariantImage, 'image', Checkpoint(self.checkpoint_path), workers=2, batch_size=2, log=lambda message: None, **kwargs
+        )
+        ingestor.run(jobs)
+        return ingestor
+
+    def test_run_uploads_and_saves_every_file(self):
+        saved = []
+        ingestor = self.ingest(self.jobs, on_saved=saved.extend)
+
+        images = VariantImage.objects.filter(variant=self.variant)
+        self.assertEqual(images.count(), 5)
+        self.assertEqual(ingestor.uploaded_files, 5)
+        self.assertEqual(len(saved), 5)
+        for image in images:
+            self.assertTrue(default_storage.exists(image.image.name))
+
+        entries = Checkpoint(self.checkpoint_path).entries
+        self.assertTrue(all(entries[job.key]['saved'] for job in self.jobs))
+
+    def test_rerun_skips_saved_files(self):
+        self.ingest(self.jobs)
+        ingestor = self.ingest(self.jobs)
+        self.assertEqual(ingestor.uploaded_files, 0)
+        self.assertEqual(ingestor.saved_rows, 0)
+        self.assertEqual(VariantImage.objects.count(), 5)
+
+    def test_uploaded_files_are_not_uploaded_again(self):
+        # The last run stopped after uploading the first two files
+        checkpoint = Checkpoint(self.checkpoint_path)
+        for job in self.jobs[:2]:
+            checkpoint.mark_uploaded(job.key, self.store(job, f"variant_images/{os.path.basename(job.source_path)}"))
+        checkpoint.flush()
+
+        ingestor = self.ingest(self.jobs)
+        self.assertEqual(ingestor.uploaded_files, 3)
+        self.assertEqual(VariantImage.objects.count(), 5)
+        stored = set(VariantImage.objects.values_list('image', flat=True))
+        self.assertTrue({checkpoint.get(job.key)['name'] for job in self.jobs[:2]} <= stored)
+
+    def test_rows_saved_before_the_checkpoint_are_not_duplicated(self):
+        self.ingest(self.jobs)
+        # The last run stopped between bulk_create and the checkpoint flush
+        checkpoint = Checkpoint(self.checkpoint_path)
+        for entry in checkpoint.entries.values():
+            entry['saved'] = False
+        checkpoint.flush()
+
+        ingestor = self.ingest(self.jobs)
+        self.assertEqual(ingestor.saved_rows, 0)
+        self.assertEqual(VariantImage.objects.count(), 5)
+
+    def test_replaced_rows_are_deleted_with_their_file(self):
+        old = VariantImage.objects.create(variant=self.variant, image=self.store(self.jobs[0], 'variant_images/old.jpg'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingest([IngestJob(self.jobs[1].source_path, {'variant': self.variant}, replaces=old.id)])
+
+        self.assertFalse(VariantImage.objects.filter(id=old.id).exists())
+        self.assertFalse(default_storage.exists(old.image.name))
+        self.assertEqual(VariantImage.objects.count(), 1)
+
+    def test_failed_upload_skips_only_its_file(self):
+        missing = self.job('missing.jpg')
+        missing.key  # fingerprinted, then the file disappears before the upload
+        os.remove(missing.source_path)
+
+        ingestor = self.ingest([missing] + self.jobs)
+        self.assertEqual(ingestor.saved_rows, 5)
+        self.assertIsNone(Checkpoint(self.checkpoint_path).get(missing.key))
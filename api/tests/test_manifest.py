@@ -0,0 +1,175 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from api.ingest import Checkpoint
+from api.manifest import (
+    apply_diff,
+    diff_audio,
+    diff_images,
+    ensure_main_images,
+    read_manifest,
+    resolve_rows,
+    resolve_variants,
+)
+from api.models import AudioTrack, VariantImage
+from .base import CatalogTestCase
+
+
+class ManifestTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.variant = self.make_variant(self.make_product('BMW X5'))
+        self.base_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.base_dir.cleanup)
+        self.base_path = self.base_dir.name
+        self.checkpoint_path = os.path.join(self.base_path, 'checkpoint.json')
+
+    def write(self, relative_path, content):
+        path = os.path.join(self.base_path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as source_file:
+            source_file.write(content)
+        return path
+
+    def apply(self, model, file_field, diff):
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_diff(model, file_field, diff, Checkpoint(self.checkpoint_path), workers=2, log=lambda message: None)
+
+
+class DiffImagesTests(ManifestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.paths = [self.write(f"x5/{name}.jpg", name) for name in ('front', 'side', 'rear')]
+
+    def sync(self):
+        diff = diff_images({self.variant: self.paths}, self.base_path)
+        self.apply(VariantImage, 'image', diff)
+        ensure_main_images([self.variant])
+        return diff
+
+    def images(self):
+        return list(VariantImage.objects.filter(variant=self.variant).order_by('position'))
+
+    def test_first_sync_imports_every_file_in_order(self):
+        diff = self.sync()
+        self.assertEqual((diff.new, diff.changed, diff.removed, diff.unchanged), (3, 0, 0, 0))
+
+        images = self.images()
+        self.assertEqual([image.position for image in images], [0, 1, 2])
+        self.assertEqual([image.source.split(':')[0] for image in images], ['x5/front.jpg', 'x5/side.jpg', 'x5/rear.jpg'])
+        self.assertEqual([image.is_main for image in images], [True, False, False])
+
+    def test_unchanged_files_produce_no_jobs(self):
+        self.sync()
+        diff = diff_images({self.variant: self.paths}, self.base_path)
+        self.assertEqual(diff.jobs, [])
+        self.assertEqual(diff.unchanged, 3)
+
+    def test_changed_file_replaces_its_row_and_keeps_main(self):
+        self.sync()
+        old = self.images()[0]
+        self.write('x5/front.jpg', 'front, retouched')
+
+        diff = diff_images({self.variant: self.paths}, self.base_path)
+        self.assertEqual((diff.new, diff.changed, diff.unchanged), (0, 1, 2))
+        self.assertEqual(diff.jobs[0].replaces, old.id)
+        self.assertTrue(diff.jobs[0].fields['is_main'])
+
+        self.apply(VariantImage, 'image', diff)
+        images = self.images()
+        self.assertEqual(len(images), 3)
+        self.assertNotEqual(images[0].id, old.id)
+        self.assertTrue(images[0].is_main)
+        self.assertFalse(default_storage.exists(old.image.name))
+
+    def test_removed_file_deletes_only_its_row(self):
+        self.sync()
+        removed = self.images()[1]
+        admin_upload = VariantImage.objects.create(variant=self.variant, image='variant_images/admin.jpg', position=3)
+
+        diff = diff_images({self.variant: [self.paths[0], self.paths[2]]}, self.base_path)
+        self.assertEqual(diff.stale, [removed.id])
+        self.apply(VariantImage, 'image', diff)
+
+        self.assertFalse(VariantImage.objects.filter(id=removed.id).exists())
+        self.assertFalse(default_storage.exists(removed.image.name))
+        self.assertTrue(VariantImage.objects.filter(id=admin_upload.id).exists())
+
+    def test_rows_imported_without_a_source_are_adopted(self):
+        legacy = VariantImage.objects.create(variant=self.variant, image='variant_images/front_Ab3dE5g.jpg', is_main=True)
+
+        diff = diff_images({self.variant: self.paths}, self.base_path)
+        self.assertEqual(list(diff.adopted), [legacy.id])
+        self.assertEqual(diff.new, 2)
+
+        self.apply(VariantImage, 'image', diff)
+        legacy.refresh_from_db()
+        self.assertTrue(legacy.source.startswith('x5/front.jpg:'))
+        self.assertEqual(VariantImage.objects.filter(variant=self.variant).count(), 3)
+
+    def test_main_image_is_reassigned_when_it_leaves_the_manifest(self):
+        self.sync()
+        diff = diff_images({self.variant: self.paths[1:]}, self.base_path)
+        self.apply(VariantImage, 'image', diff)
+        self.assertEqual(ensure_main_images([self.variant]), 1)
+        self.assertEqual([image.is_main for image in self.images()], [True, False])
+
+
+class DiffAudioTests(ManifestTestCase):
+    def test_tracks_are_limited_per_variant(self):
+        paths = [self.write(f"x5/{name}.wav", name) for name in ('idle', 'launch', 'pass_by', 'redline')]
+        messages = []
+        diff = diff_audio({self.variant: paths}, self.base_path, log=messages.append)
+        self.assertEqual([job.fields['name'] for job in diff.jobs], ['Idle', 'Launch', 'Pass By'])
+        self.assertEqual(len(messages), 1)
+
+    def test_admin_tracks_count_towards_the_limit(self):
+        AudioTrack.objects.bulk_create([
+            AudioTrack(variant=self.variant, name=name, track=f"audio_tracks/{name}.wav") for name in ('Cold Start', 'Exhaust')
+        ])
+        paths = [self.write(f"x5/{name}.wav", name) for name in ('idle', 'launch')]
+        diff = diff_audio({self.variant: paths}, self.base_path, log=lambda message: None)
+        self.assertEqual([job.fields['name'] for job in diff.jobs], ['Idle'])
+        self.assertEqual(diff.stale, [])
+
+    def test_changed_track_replaces_its_row(self):
+        track = AudioTrack.objects.bulk_create([AudioTrack(variant=self.variant, name='Idle', track='audio_tracks/idle.wav', source='x5/idle.wav:1:1')])[0]
+        diff = diff_audio({self.variant: [self.write('x5/idle.wav', 'idle')]}, self.base_path)
+        self.assertEqual(diff.changed, 1)
+        self.assertEqual(diff.jobs[0].replaces, track.id)
+
+
+class ReadManifestTests(ManifestTestCase):
+    def test_csv_rows_are_read_below_the_header(self):
+        path = self.write('manifest.csv', "Product,Images,Audio\nBMW X5 Base, x5 ,\n,orphan,\nAudi A4 Base,a4\n")
+        self.assertEqual(
+            [(row.product_name, row.image_folder, row.audio_folder) for row in read_manifest(path)],
+            [('BMW X5 Base', 'x5', ''), ('Audi A4 Base', 'a4', '')],
+        )
+
+    def test_shared_product_names_resolve_to_none(self):
+        duplicate = self.make_variant(self.make_product('BMW X5 Competition'))
+        duplicate.product_name = self.variant.product_name
+        duplicate.save()
+        other = self.make_variant(self.make_product('Audi A4'))
+
+        variants = resolve_variants([self.variant.product_name, other.product_name, 'Missing'])
+        self.assertEqual(variants, {self.variant.product_name: None, other.product_name: other})
+
+    @mock.patch('api.manifest.LOOKUP_CHUNK_SIZE', 2)
+    def test_rows_are_resolved_one_chunk_at_a_time(self):
+        path = self.write('manifest.csv', "Product,Images,Audio\n" + "BMW X5 Base,x5,\n" * 5)
+        rows = resolve_rows(read_manifest(path))
+        with self.assertNumQueries(1):
+            row, variants = next(rows)
+        self.assertEqual(variants, {row.product_name: self.variant})
+        with self.assertNumQueries(2):
+            self.assertEqual(len(list(rows)), 4)
+
+    def test_unreadable_manifest_is_reported(self):
+        output = StringIO()
+        call_command('add_images', '--manifest', os.path.join(self.base_path, 'missing.csv'), stdout=output)
+        self.assertIn('Error loading manifest', output.getvalue())
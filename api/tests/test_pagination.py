@@ -0,0 +1,50 @@
+from urllib.parse import parse_qs, urlsplit
+from django.urls import reverse
+from api.models import Product
+from .base import CatalogTestCase
+
+
+class IdCursorPaginationTests(CatalogTestCase):
+    url = reverse('product-list')
+
+    def setUp(self):
+        super().setUp()
+        self.products = Product.objects.bulk_create([Product(name=f"Product {number}") for number in range(5)])
+
+    def test_lists_are_unpaginated_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual([product['id'] for product in response.json()], [product.id for product in self.products])
+
+    def test_page_size_returns_a_page(self):
+        page = self.client.get(self.url, {'page_size': 2}).json()
+        self.assertEqual([product['id'] for product in page['results']], [product.id for product in self.products[:2]])
+        self.assertIsNone(page['previous'])
+        self.assertIn('cursor=', page['next'])
+
+    def test_following_next_links_walks_every_row_once(self):
+        ids = []
+        url = f"{self.url}?page_size=2"
+        while url:
+            page = self.client.get(url).json()
+            ids.extend(product['id'] for product in page['results'])
+            url = page['next']
+        self.assertEqual(ids, [product.id for product in self.products])
+
+    def test_cursor_alone_paginates_with_the_default_page_size(self):
+        next_url = self.client.get(self.url, {'page_size': 1}).json()['next']
+        cursor = parse_qs(urlsplit(next_url).query)['cursor'][0]
+        page = self.client.get(self.url, {'cursor': cursor}).json()
+        self.assertEqual([product['id'] for product in page['results']], [product.id for product in self.products[1:]])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_filtered_list_paginates_on_request(self):
+        product = self.products[0]
+        variants = [self.make_variant(product, name) for name in ('A', 'B', 'C')]
+        url = reverse('variants-by-product', kwargs={'product_id': product.id})
+
+        self.assertEqual(len(self.client.get(url).json()), 3)
+        page = self.client.get(url, {'page_size': 2}).json()
+        self.assertEqual([variant['id'] for variant in page['results']], [variant.id for variant in variants[:2]])
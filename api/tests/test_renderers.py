@@ -0,0 +1,75 @@
+import datetime
+import decimal
+import io
+import json
+from unittest import skipIf
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+
+
+@skipIf(orjson is None, "orjson is not installed")
+class FastJSONRendererTests(SimpleTestCase):
+    def assertRendersLikeStock(self, data, accepted_media_type=None, renderer_context=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type, renderer_context),
+            JSONRenderer().render(data, accepted_media_type, renderer_context),
+        )
+
+    def test_api_payloads_match_the_stock_renderer(self):
+        self.assertRendersLikeStock([
+            {
+                'id': 1,
+                'name': 'Catback – Grade 5 titanium ✓',
+                'created': datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+                'day': datetime.date(2024, 5, 1),
+                'price': decimal.Decimal('12.50'),
+                'label': gettext_lazy('Subscribed'),
+                'peaks': [0.0, 0.25, 1.0],
+                'duration': 12345678.9,
+                'extra': None,
+                'flags': {1: True},
+            },
+        ])
+
+    def test_javascript_line_separators_are_escaped(self):
+        self.assertRendersLikeStock({'text': 'a\u2028b\u2029c'})
+
+    def test_wide_integers_and_indented_output_use_the_stock_renderer(self):
+        self.assertRendersLikeStock({'id': 2 ** 70})
+        self.assertRendersLikeStock({'id': 1}, 'application/json; indent=4', {})
+
+    def test_exponent_floats_differ_but_parse_the_same(self):
+        data = {'values': [1e16, 1e-7]}
+        fast = FastJSONRenderer().render(data)
+        self.assertEqual(fast, b'{"values":[1e16,1e-7]}')
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(data)))
+
+    def test_non_finite_floats_become_null(self):
+        self.assertEqual(FastJSONRenderer().render({'value': float('nan')}), b'{"value":null}')
+
+
+@skipIf(orjson is None, "orjson is not installed")
+class FastJSONParserTests(SimpleTestCase):
+    def parse(self, body, parser_class=FastJSONParser, encoding='utf-8'):
+        return parser_class().parse(io.BytesIO(body), parser_context={'encoding': encoding})
+
+    def test_parses_like_the_stock_parser(self):
+        body = '[{"variant": 1, "name": "Power ✓", "number": "460", "ratio": 1e-07}]'.encode()
+        self.assertEqual(self.parse(body), self.parse(body, JSONParser))
+
+    def test_other_encodings_use_the_stock_parser(self):
+        body = '{"name": "Müller"}'.encode('latin-1')
+        self.assertEqual(self.parse(body, encoding='latin-1'), {'name': 'Müller'})
+
+    def test_invalid_json_is_a_parse_error(self):
+        with self.assertRaises(ParseError):
+            self.parse(b'{"name": ')
+
+    def test_non_finite_constants_are_rejected(self):
+        with self.assertRaises(ParseError):
+            self.parse(b'{"value": NaN}')
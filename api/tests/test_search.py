@@ -0,0 +1,69 @@
+from django.urls import reverse
+from api.models import Make
+from api.search import search_index
+from .base import CatalogTestCase
+
+
+def hits(results):
+    return [(result['type'], result['name']) for result in results]
+
+
+class SearchIndexTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        search_index.segments.clear()
+        self.make_catalog()
+
+    def test_leading_matches_rank_first_then_type_then_length(self):
+        self.make_variant(self.x5_product)
+        self.assertEqual(hits(search_index.search('bmw')), [
+            ('make', 'BMW'),
+            ('product', 'BMW X5'),
+            ('product', 'BMW 3 Series M3'),
+            ('variant', 'BMW X5 Base'),
+        ])
+
+    def test_names_starting_with_the_query_outrank_better_types(self):
+        self.assertEqual(hits(search_index.search('m3')), [('model', 'M3'), ('product', 'BMW 3 Series M3')])
+
+    def test_every_token_must_prefix_a_word(self):
+        self.assertEqual(hits(search_index.search('ser')), [('model', '3 Series'), ('product', 'BMW 3 Series M3')])
+        self.assertEqual(hits(search_index.search('a4 au')), [('product', 'Audi A4')])
+        self.assertEqual(search_index.search('bmw a4'), [])
+
+    def test_limit_and_empty_queries(self):
+        self.assertEqual(hits(search_index.search('BMW', limit=2)), [('make', 'BMW'), ('product', 'BMW X5')])
+        self.assertEqual(search_index.search('  -- '), [])
+
+    def test_variant_hits_carry_their_product(self):
+        variant = self.make_variant(self.a4_product)
+        self.assertEqual(search_index.search('audi a4 base'), [
+            {'type': 'variant', 'id': variant.id, 'name': 'Audi A4 Base', 'product_id': self.a4_product.id},
+        ])
+
+    def test_edits_are_searchable_at_once(self):
+        self.assertEqual(search_index.search('mercedes'), [])
+        Make.objects.create(name='Mercedes-Benz')
+        self.assertEqual(hits(search_index.search('merc')), [('make', 'Mercedes-Benz')])
+
+
+class SearchViewTests(CatalogTestCase):
+    url = reverse('search')
+
+    def setUp(self):
+        super().setUp()
+        search_index.segments.clear()
+        self.make_catalog()
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url, {'q': 'bmw'})
+        self.assertEqual(hits(response.json())[0], ('make', 'BMW'))
+        self.assertEqual(self.client.get(self.url, {'q': 'bmw'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        Make.objects.create(name='BMW Alpina')
+        response = self.client.get(self.url, {'q': 'bmw'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(('make', 'BMW Alpina'), hits(response.json()))
+
+    def test_invalid_limit_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'bmw', 'limit': 'ten'}).status_code, 400)
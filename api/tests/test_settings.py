@@ -0,0 +1,49 @@
+import os
+import runpy
+from unittest import mock
+from django.conf import settings
+from django.db import connections
+from django.db.backends.postgresql.base import DatabaseWrapper
+from django.test import SimpleTestCase
+
+SETTINGS_PATH = os.path.join(settings.BASE_DIR, 'core', 'settings.py')
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def load_databases(self, **environ):
+        environ = {'DB_NAME': 'zenrenne', 'DB_REPLICAS': '', **environ}
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_path(SETTINGS_PATH)['DATABASES']
+
+    def pool(self, alias, settings_dict):
+        settings_dict = connections.configure_settings({'default': settings_dict})['default']
+        wrapper = DatabaseWrapper(settings_dict, alias=alias)
+        self.addCleanup(DatabaseWrapper._connection_pools.pop, alias, None)
+        return wrapper.pool
+
+    def test_pooling_uses_the_pool_options_and_no_persistent_connections(self):
+        databases = self.load_databases(DB_POOL='true', DB_POOL_MAX_SIZE='7', DB_CONN_MAX_AGE='60')
+        default = databases['default']
+        self.assertEqual(default['CONN_MAX_AGE'], 0)
+        self.assertEqual(
+            default['OPTIONS']['pool'],
+            {'min_size': 2, 'max_size': 7, 'timeout': 10.0, 'max_idle': 600.0, 'max_lifetime': 3600.0},
+        )
+
+        # Django hands the options to psycopg_pool as they are, without opening the pool
+        pool = self.pool('settings-test-default', default)
+        self.assertEqual((pool.min_size, pool.max_size, pool.timeout), (2, 7, 10.0))
+        self.assertTrue(pool.closed)
+
+    def test_replicas_share_the_pool_options(self):
+        databases = self.load_databases(DB_POOL='true', DB_REPLICAS='replica.internal:5433/zenrenne_replica')
+        replica = databases['replica_0']
+        self.assertEqual((replica['HOST'], replica['PORT'], replica['NAME']), ('replica.internal', '5433', 'zenrenne_replica'))
+        self.assertEqual(replica['CONN_MAX_AGE'], 0)
+        self.assertEqual(replica['OPTIONS'], {'pool': databases['default']['OPTIONS']['pool'], 'connect_timeout': 2})
+        self.assertEqual(self.pool('settings-test-replica', replica).max_size, 10)
+
+    def test_without_pooling_connections_persist(self):
+        default = self.load_databases(DB_POOL='false', DB_CONN_MAX_AGE='30')['default']
+        self.assertEqual(default['CONN_MAX_AGE'], 30)
+        self.assertNotIn('pool', default['OPTIONS'])
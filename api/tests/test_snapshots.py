@@ -0,0 +1,78 @@
+from io import StringIO
+from unittest import mock
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils.http import http_date
+from api import snapshots
+from api.snapshots import get_manifest, serve_snapshot, snapshot_paths
+from .base import CatalogTransactionTestCase
+
+
+class SnapshotTests(CatalogTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_catalog()
+        self.factory = RequestFactory(HTTP_ACCEPT='application/json')
+        loaded_manifest = mock.patch.object(snapshots, '_loaded_manifest', (None, None))
+        loaded_manifest.start()
+        self.addCleanup(loaded_manifest.stop)
+
+    def build(self, now):
+        with mock.patch('time.time', return_value=now):
+            call_command('build_snapshot', '--workers', '2', stdout=StringIO())
+
+    def serve(self, path, **headers):
+        return serve_snapshot(self.factory.get(path, **headers))
+
+    def test_snapshot_is_served_with_validators(self):
+        self.build(1_700_000_000)
+        path = reverse('product-page', kwargs={'product_id': self.x5_product.id})
+
+        response = self.serve(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.client.get(path).content)
+        self.assertEqual(response['Last-Modified'], http_date(1_700_000_000))
+
+        self.assertEqual(self.serve(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.serve(path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.serve(path, HTTP_IF_MODIFIED_SINCE=http_date(1_600_000_000)).status_code, 200)
+        # An ETag that does not match wins over a date that does
+        self.assertEqual(
+            self.serve(path, HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200
+        )
+
+    def test_last_modified_only_moves_for_changed_paths(self):
+        self.build(1_700_000_000)
+        self.x5_product.name = 'BMW X5 M'
+        self.x5_product.save()
+        self.build(1_800_000_000)
+
+        changed = reverse('product-page', kwargs={'product_id': self.x5_product.id})
+        unchanged = reverse('product-page', kwargs={'product_id': self.a4_product.id})
+        self.assertEqual(self.serve(changed)['Last-Modified'], http_date(1_800_000_000))
+        self.assertEqual(self.serve(unchanged)['Last-Modified'], http_date(1_700_000_000))
+
+    def test_manifest_is_loaded_once_per_build(self):
+        self.build(1_700_000_000)
+        with mock.patch('api.snapshots.load_manifest', wraps=snapshots.load_manifest) as load_manifest:
+            for _ in range(3):
+                self.assertIsNotNone(get_manifest())
+        load_manifest.assert_called_once()
+
+    def test_no_snapshot_once_the_data_changes(self):
+        self.build(1_700_000_000)
+        self.a4_product.save()
+        self.assertIsNone(self.serve(reverse('product-page', kwargs={'product_id': self.a4_product.id})))
+
+    def test_url_parameters_are_filled_from_their_models(self):
+        variant = self.make_variant(self.a4_product)
+        paths = snapshot_paths()
+        self.assertIn(reverse('variant-detail', kwargs={'pk': variant.id}), paths)
+        self.assertIn(reverse('carmodel-by-make', kwargs={'make_id': self.audi.id}), paths)
+
+    def test_unmapped_url_parameters_are_rejected(self):
+        with mock.patch.dict(snapshots.PK_MODELS, clear=True):
+            with self.assertRaises(ImproperlyConfigured):
+                snapshot_paths()
@@ -1,4 +1,5 @@
 from django.urls import path
+from .async_views import variant_full
 from .views import (
     ContentTypeListAPIView,
     MakeListAPIView,
@@ -7,9 +8,13 @@ from .views import (
     CarModelByMakeView,
     CarModelByModelView,
     ModelsByProductView,
+    CatalogTreeView,
+    SearchView,
     ProductListView,
+    ProductPageView,
     ProductsByMakeView,
     ProductsByModelView,
+    ProductFacetsView,
     ProductMakeModelConnectionListView,
     ProductsWithVariantImageView,
     VariantListView,
@@ -17,10 +22,13 @@ from .views import (
     VariantsWithImageByProductView,
     VariantImageListView,
     VariantImagesByVariantView,
+    VariantImageGalleryView,
     StatListAPIView,
     StatByVariantAPIView,
+    StatBulkView,
     AudioTrackListAPIView,
     AudioTrackByVariantAPIView,
+    DatabasePoolStatsView,
     NewsletterSubscribeView,
     NewsletterUnsubscribeView
 )
@@ -37,27 +45,37 @@ urlpatterns = [
     path('models/model/<int:model_id>/', CarModelByModelView.as_view(), name='carmodel-by-model'),
     path('models/product/<int:product_id>/', ModelsByProductView.as_view(), name='models-by-product'),
 
+    path('catalog/tree/', CatalogTreeView.as_view(), name='catalog-tree'),
+    path('search/', SearchView.as_view(), name='search'),
+
     path('products/', ProductListView.as_view(), name='product-list'),
     path('products/make/<int:make_id>/', ProductsByMakeView.as_view(), name='products-by-make'),
     path('products/model/<int:model_id>/', ProductsByModelView.as_view(), name='products-by-model'),
+    path('products/facets/', ProductFacetsView.as_view(), name='product-facets'),
     path('products/with-variant-image/', ProductsWithVariantImageView.as_view(), name='products-with-variant-image'),
+    path('products/<int:product_id>/page/', ProductPageView.as_view(), name='product-page'),
 
     path('productconnections/', ProductMakeModelConnectionListView.as_view(), name='product-connection-list'),
 
     path('variants/', VariantListView.as_view(), name='variant-list'),
     path('variants/<int:pk>/', VariantDetailView.as_view(), name='variant-detail'),
+    path('variants/<int:pk>/full/', variant_full, name='variant-full'),
     path('variants/product/<int:product_id>', VariantListView.as_view(), name='variants-by-product'),
     path('variants/product/<int:product_id>/with-image/', VariantsWithImageByProductView.as_view(), name='variants-with-image-by-product'),
 
     path('variantimages/', VariantImageListView.as_view(), name='variant-image-list'),
     path('variantimages/variant/<int:variant_id>', VariantImagesByVariantView.as_view(), name='variant-images-by-variant'),
+    path('variantimages/gallery/', VariantImageGalleryView.as_view(), name='variant-image-gallery'),
 
     path('stats/', StatListAPIView.as_view(), name='stat-list'),
     path('stats/variant/<int:variant_id>/', StatByVariantAPIView.as_view(), name='stats-by-variant'),
+    path('stats/bulk/', StatBulkView.as_view(), name='stat-bulk'),
 
     path('audiotracks/', AudioTrackListAPIView.as_view(), name='audiotrack-list'),
     path('audiotracks/variant/<int:variant_id>/', AudioTrackByVariantAPIView.as_view(), name='audiotracks-by-variant'),
 
+    path('db/pool/', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+
     path('subscribe/', NewsletterSubscribeView.as_view(), name='newsletter-subscribe'),
     path('unsubscribe/', NewsletterUnsubscribeView.as_view(), name='newsletter-unsubscribe'),
     
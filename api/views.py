@@ -1,10 +1,12 @@
-from django.db.models import Exists, OuterRef
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils.decorators import method_decorator
 from django.core.cache import cache
-from django.views.decorators.cache import cache_page
 from rest_framework import generics
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 from .models import (
     Make, 
     CarModel, 
@@ -21,14 +23,24 @@ from .serializers import (
     MakeSerializer, 
     ModelSerializer, 
     ProductSerializer, 
+    ProductGridSerializer,
     ProductMakeModelConnectionSerializer, 
     VariantSerializer, 
     VariantImageSerializer,
     StatSerializer,
     AudioTrackSerializer,
+    ProductPageSerializer,
     NewsletterSubscriberSerializer
 )
+from .cache import ScopedVersion, versioned_cache_page
+from .pagination import IdCursorPagination
+from .fast_serializers import ValuesListMixin
+from .hierarchy import get_catalog_tree
+from .facets import FACET_MODELS, facet_search
+from .search import MAX_LIMIT, SEARCH_CACHE_TIME, SEARCH_MODELS, search_index
+from .bulk import import_stats, update_galleries
 from django.contrib.contenttypes.models import ContentType
+from core.db_pool import pool_stats
 
 # Helper function to cache ContentType lookups
 def get_cached_content_type(model):
@@ -39,23 +51,45 @@ def get_cached_content_type(model):
         cache.set(cache_key, content_type)
     return content_type
 
-# Cache for 1 hour
-CACHE_TIME = 60 * 60
+# ?view=grid switches a product listing to cards with the main image, variant count
+# and variant names, all fetched as annotated subqueries in the listing query itself
+class ProductGridMixin:
+    def is_grid(self):
+        return self.request.query_params.get('view') == 'grid'
+
+    def get_serializer_class(self):
+        if self.is_grid():
+            return ProductGridSerializer
+        return super().get_serializer_class()
+
+    def with_grid_fields(self, queryset):
+        if not self.is_grid():
+            return queryset
+
+        # The main image, falling back to the first image of any variant in gallery order
+        images = VariantImage.objects.filter(variant__product=OuterRef('pk')).order_by('-is_main', 'position', 'id')
+        variants = Variant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+
+        return queryset.annotate(
+            main_image=Subquery(images.values('image')[:1]),
+            variant_count=Coalesce(Subquery(variants.annotate(count=Count('id')).values('count')), Value(0)),
+            variant_names=Subquery(variants.annotate(names=ArrayAgg('name', ordering='id')).values('names')),
+        )
 
 # ContentType List API
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(ContentType), name='dispatch')
 class ContentTypeListAPIView(generics.ListAPIView):
     queryset = ContentType.objects.all()
     serializer_class = ContentTypeSerializer
 
-# Cache Make List for 1 hour
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+# Make List
+@method_decorator(versioned_cache_page(Make), name='dispatch')
 class MakeListAPIView(generics.ListAPIView):
     queryset = Make.objects.all()
     serializer_class = MakeSerializer
 
 # Get Makes by Product
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(Make, ProductMakeModelConnection), name='dispatch')
 class MakesByProductView(generics.GenericAPIView):
     serializer_class = MakeSerializer
 
@@ -78,14 +112,20 @@ class MakesByProductView(generics.GenericAPIView):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+# Whole make -> model -> sub-model tree for the browse dropdown in one response
+@method_decorator(versioned_cache_page(Make, CarModel), name='dispatch')
+class CatalogTreeView(generics.GenericAPIView):
+    def get(self, request, *args, **kwargs):
+        return Response(get_catalog_tree())
+
 # Car Model List
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
-class ModelListAPIView(generics.ListAPIView):
-    queryset = CarModel.objects.all().select_related('parent_type')  # Pre-fetch ContentType
+@method_decorator(versioned_cache_page(CarModel), name='dispatch')
+class ModelListAPIView(ValuesListMixin, generics.ListAPIView):
+    queryset = CarModel.objects.order_by('id').select_related('parent_type')  # Pre-fetch ContentType
     serializer_class = ModelSerializer
 
 # CarModel by Make View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(CarModel), name='dispatch')
 class CarModelByMakeView(generics.GenericAPIView):
     serializer_class = ModelSerializer
 
@@ -109,7 +149,7 @@ class CarModelByMakeView(generics.GenericAPIView):
         return Response(serializer.data)
 
 # CarModel by Model View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(CarModel), name='dispatch')
 class CarModelByModelView(generics.GenericAPIView):
     serializer_class = ModelSerializer
 
@@ -133,7 +173,7 @@ class CarModelByModelView(generics.GenericAPIView):
         return Response(serializer.data)
 
 # Models by Product View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(CarModel, ProductMakeModelConnection), name='dispatch')
 class ModelsByProductView(generics.GenericAPIView):
     serializer_class = ModelSerializer
 
@@ -157,20 +197,43 @@ class ModelsByProductView(generics.GenericAPIView):
         return Response(serializer.data)
 
 # Product List API
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(Product), name='dispatch')
 class ProductListView(generics.ListCreateAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    pagination_class = IdCursorPagination
+
+# Everything the product page renders in one response, in a fixed five queries:
+# the product, its variants, and their images, stats and audio tracks
+@method_decorator(versioned_cache_page(
+    Product, Variant, VariantImage, Stat, AudioTrack, ScopedVersion(VariantImage, 'product', 'product_id')
+), name='dispatch')
+class ProductPageView(generics.RetrieveAPIView):
+    serializer_class = ProductPageSerializer
+    lookup_url_kwarg = 'product_id'
+    queryset = Product.objects.prefetch_related(
+        Prefetch(
+            'variants',
+            queryset=Variant.objects.order_by('id').prefetch_related(
+                Prefetch('images', queryset=VariantImage.objects.order_by('position', 'id')),
+                Prefetch('stats', queryset=Stat.objects.order_by('id')),
+                Prefetch('audio_tracks', queryset=AudioTrack.objects.order_by('id')),
+            )
+        )
+    )
 
 # ProductMakeModelConnection List
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(ProductMakeModelConnection), name='dispatch')
 class ProductMakeModelConnectionListView(generics.ListCreateAPIView):
     queryset = ProductMakeModelConnection.objects.all()
     serializer_class = ProductMakeModelConnectionSerializer
+    pagination_class = IdCursorPagination
 
 # Products by Make
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
-class ProductsByMakeView(generics.GenericAPIView):
+@method_decorator(versioned_cache_page(
+    Product, ProductMakeModelConnection, Variant, VariantImage, ScopedVersion(VariantImage, 'main_images')
+), name='dispatch')
+class ProductsByMakeView(ProductGridMixin, generics.GenericAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
@@ -179,10 +242,10 @@ class ProductsByMakeView(generics.GenericAPIView):
             return Product.objects.none()
 
         content_type = get_cached_content_type(Make)
-        return Product.objects.filter(
+        return self.with_grid_fields(Product.objects.filter(
             productmakemodelconnection__parent_id=make_id,
             productmakemodelconnection__parent_type=content_type
-        )
+        ))
 
     def get(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -192,8 +255,10 @@ class ProductsByMakeView(generics.GenericAPIView):
         return Response(serializer.data)
 
 # Products by Model View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
-class ProductsByModelView(generics.GenericAPIView):
+@method_decorator(versioned_cache_page(
+    Product, ProductMakeModelConnection, Variant, VariantImage, ScopedVersion(VariantImage, 'main_images')
+), name='dispatch')
+class ProductsByModelView(ProductGridMixin, generics.GenericAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
@@ -202,10 +267,10 @@ class ProductsByModelView(generics.GenericAPIView):
             return Product.objects.none()
 
         content_type = get_cached_content_type(CarModel)
-        return Product.objects.filter(
+        return self.with_grid_fields(Product.objects.filter(
             productmakemodelconnection__parent_id=model_id,
             productmakemodelconnection__parent_type=content_type
-        )
+        ))
 
     def get(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -214,9 +279,44 @@ class ProductsByModelView(generics.GenericAPIView):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+# Products under any set of makes/models (?make=1,2&model=5) with product counts for
+# every make and model node, answered from the cached bitmap index in api/facets.py
+@method_decorator(versioned_cache_page(*FACET_MODELS, Variant, VariantImage, ScopedVersion(VariantImage, 'main_images')), name='dispatch')
+class ProductFacetsView(ProductGridMixin, generics.GenericAPIView):
+    serializer_class = ProductSerializer
+
+    def get_ids(self, name):
+        value = self.request.query_params.get(name, '')
+        try:
+            return [int(part) for part in value.split(',') if part.strip()]
+        except ValueError:
+            raise ValidationError({name: "Expected a comma separated list of ids."})
+
+    def get(self, request, *args, **kwargs):
+        facets = facet_search(self.get_ids('make'), self.get_ids('model'))
+        queryset = self.with_grid_fields(Product.objects.filter(id__in=facets['product_ids']).order_by('id'))
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({
+            'count': len(facets['product_ids']),
+            'results': serializer.data,
+            'facets': {'makes': facets['makes'], 'models': facets['models']},
+        })
+
+# Typeahead over make, model, product and variant names (?q=bmw m3&limit=10). Answered
+# from the in-process index in api/search.py. Versioned like the other read views, so
+# repeated queries get an ETag/Last-Modified and a 304; entries expire after minutes
+@method_decorator(versioned_cache_page(*SEARCH_MODELS, timeout=SEARCH_CACHE_TIME), name='dispatch')
+class SearchView(generics.GenericAPIView):
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({'limit': "Expected an integer."})
+        return Response(search_index.search(request.query_params.get('q', ''), limit))
+
 # Products with at least one variant and at least one image associated with a variant
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
-class ProductsWithVariantImageView(generics.ListAPIView):
+@method_decorator(versioned_cache_page(Product, Variant, VariantImage, ScopedVersion(VariantImage, 'main_images')), name='dispatch')
+class ProductsWithVariantImageView(ProductGridMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
@@ -225,28 +325,29 @@ class ProductsWithVariantImageView(generics.ListAPIView):
         variants_with_images = Variant.objects.filter(product_id=OuterRef('pk')).filter(Exists(variant_with_image_qs))
         
         # Filter products that have variants with images
-        return Product.objects.filter(Exists(variants_with_images))
+        return self.with_grid_fields(Product.objects.filter(Exists(variants_with_images)))
 
 # Variant List View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
-class VariantListView(generics.ListAPIView):
+@method_decorator(versioned_cache_page(Variant, Product), name='dispatch')
+class VariantListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = VariantSerializer
+    pagination_class = IdCursorPagination
 
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
         if product_id:
-            return Variant.objects.filter(product_id=product_id).select_related('product')
+            return Variant.objects.filter(product_id=product_id).order_by('id').select_related('product')
         
         return Variant.objects.all().select_related('product')
 
 # Variant Detail View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(Variant, Product), name='dispatch')
 class VariantDetailView(generics.RetrieveAPIView):
     queryset = Variant.objects.all()
     serializer_class = VariantSerializer
 
 # Variants by product ID that have at least one image
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(Variant, Product, VariantImage), name='dispatch')
 class VariantsWithImageByProductView(generics.ListAPIView):
     serializer_class = VariantSerializer
 
@@ -263,13 +364,16 @@ class VariantsWithImageByProductView(generics.ListAPIView):
         return Variant.objects.filter(product_id=product_id).filter(Exists(variant_with_image_qs))
 
 # Variant Image List View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(
+    VariantImage, ScopedVersion(VariantImage, 'galleries'), ScopedVersion(VariantImage, 'main_images')
+), name='dispatch')
 class VariantImageListView(generics.ListAPIView):
     queryset = VariantImage.objects.all()
     serializer_class = VariantImageSerializer
+    pagination_class = IdCursorPagination
 
-# Variant Images by Product
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+# Variant Images by Product, in gallery order
+@method_decorator(versioned_cache_page(VariantImage, ScopedVersion(VariantImage, 'variant', 'variant_id')), name='dispatch')
 class VariantImagesByVariantView(generics.ListAPIView):
     serializer_class = VariantImageSerializer
 
@@ -278,16 +382,25 @@ class VariantImagesByVariantView(generics.ListAPIView):
         if not variant_id:
             return VariantImage.objects.none()
 
-        return VariantImage.objects.filter(variant_id=variant_id).select_related('variant')
+        return VariantImage.objects.filter(variant_id=variant_id).select_related('variant').order_by('position', 'id')
+
+# Reorders galleries and switches main images of many variants at once (staff only):
+# a JSON list of {variant, images, main}. See api/bulk.py
+class VariantImageGalleryView(generics.GenericAPIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        return Response(update_galleries(request.data))
 
 # Stat List View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(Stat), name='dispatch')
 class StatListAPIView(generics.ListAPIView):
     queryset = Stat.objects.all()
     serializer_class = StatSerializer
+    pagination_class = IdCursorPagination
 
 # Stats by Variant
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(Stat), name='dispatch')
 class StatByVariantAPIView(generics.ListAPIView):
     serializer_class = StatSerializer
 
@@ -295,14 +408,23 @@ class StatByVariantAPIView(generics.ListAPIView):
         variant_id = self.kwargs['variant_id']
         return Stat.objects.filter(variant_id=variant_id).select_related('variant')
 
+# Creates or updates many stats at once (staff only): a JSON list of {variant, name,
+# number, unit, additional} rows, matched on (variant, name). See api/bulk.py
+class StatBulkView(generics.GenericAPIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        return Response(import_stats(request.data))
+
 # Audio Track List View
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(AudioTrack), name='dispatch')
 class AudioTrackListAPIView(generics.ListAPIView):
     queryset = AudioTrack.objects.all()
     serializer_class = AudioTrackSerializer
+    pagination_class = IdCursorPagination
 
 # Audio Tracks by Variant
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+@method_decorator(versioned_cache_page(AudioTrack), name='dispatch')
 class AudioTrackByVariantAPIView(generics.ListAPIView):
     serializer_class = AudioTrackSerializer
 
@@ -311,7 +433,14 @@ class AudioTrackByVariantAPIView(generics.ListAPIView):
         return AudioTrack.objects.filter(variant_id=variant_id).select_related('variant')
 
 
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
+# Connection pool metrics of the worker process that answers the request (staff only)
+class DatabasePoolStatsView(generics.GenericAPIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(pool_stats())
+
+
 class NewsletterSubscribeView(generics.CreateAPIView):
     queryset = NewsletterSubscriber.objects.all()
     serializer_class = NewsletterSubscriberSerializer
@@ -332,7 +461,6 @@ class NewsletterSubscribeView(generics.CreateAPIView):
         return Response(serializer.data, status=201)
 
 # Unsubscribe a user
-@method_decorator(cache_page(CACHE_TIME), name='dispatch')
 class NewsletterUnsubscribeView(generics.GenericAPIView):
     serializer_class = NewsletterSubscriberSerializer
 
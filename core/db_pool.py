@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import connections
+
+
+# Pool metrics for every configured database in this process. Each gunicorn worker
+# and management command has its own pools, so the numbers are per process.
+def pool_stats():
+    stats = {}
+    for alias in settings.DATABASES:
+        connection = connections[alias]
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            stats[alias] = {
+                'pooled': False,
+                'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+                'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            }
+            continue
+
+        raw = pool.get_stats()
+        checkouts = raw.get('requests_num', 0)
+        stats[alias] = {
+            'pooled': True,
+            'open': not pool.closed,  # pools open on the first query in the process
+            'min_size': pool.min_size,
+            'max_size': pool.max_size,
+            'size': raw.get('pool_size', 0),
+            'available': raw.get('pool_available', 0),
+            'waiting': raw.get('requests_waiting', 0),
+            'checkouts': checkouts,
+            'queued_checkouts': raw.get('requests_queued', 0),
+            'wait_ms_total': raw.get('requests_wait_ms', 0),
+            'wait_ms_average': round(raw.get('requests_wait_ms', 0) / checkouts, 3) if checkouts else 0,
+            'checkout_errors': raw.get('requests_errors', 0),
+            'connections_opened': raw.get('connections_num', 0),
+            'connect_ms_total': raw.get('connections_ms', 0),
+            'connection_errors': raw.get('connections_errors', 0),
+            'connections_lost': raw.get('connections_lost', 0),  # failed the health check
+            'bad_returns': raw.get('returns_bad', 0),
+        }
+    return stats
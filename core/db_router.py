@@ -0,0 +1,128 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds of replay lag on a hot standby; 0 when it has replayed everything it received
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class RequestRouting:
+    """Per-request routing state, set by ReplicaRoutingMiddleware."""
+
+    def __init__(self):
+        self.pinned = False  # every query goes to the primary from now on
+        self.alias = None  # replica picked for this request, so its reads are consistent
+
+
+# None outside a routed request, so management commands, the shell and background
+# threads always read from the primary
+_routing = ContextVar('replica_routing', default=None)
+
+
+def start_request_routing():
+    return _routing.set(RequestRouting())
+
+
+def end_request_routing(token):
+    _routing.reset(token)
+
+
+def pin_primary():
+    routing = _routing.get()
+    if routing is not None:
+        routing.pinned = True
+
+
+# Model versions are write timestamps (see api/cache.py). A replica may not have
+# replayed a write that recent yet, so anything read for it, and then cached under
+# the new version, has to come from the primary.
+def pin_primary_after_write(last_write_ms):
+    if time.time() * 1000 - last_write_ms < settings.REPLICA_MAX_LAG * 1000:
+        pin_primary()
+
+
+class ReplicaMonitor:
+    """
+    Per-process health and lag status of each replica, refreshed at most every
+    REPLICA_CHECK_INTERVAL seconds. Only one thread runs a check at a time; the
+    others keep using the last known status meanwhile.
+    """
+
+    def __init__(self):
+        self.status = {}
+        self.lock = threading.Lock()
+
+    def usable(self, alias):
+        checked_at, usable = self.status.get(alias, (None, False))
+        if checked_at is not None and time.monotonic() - checked_at < settings.REPLICA_CHECK_INTERVAL:
+            return usable
+        if not self.lock.acquire(blocking=False):
+            return usable
+        try:
+            usable = self.check(alias)
+            self.status[alias] = (time.monotonic(), usable)
+        finally:
+            self.lock.release()
+        return usable
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(POSTGRES_LAG_SQL)
+                    lag = float(cursor.fetchone()[0] or 0)
+                else:
+                    cursor.execute('SELECT 1')
+                    lag = 0
+        except DatabaseError as e:
+            logger.warning("Replica %s is unavailable, reading from the primary: %s", alias, e)
+            connection.close()
+            return False
+
+        if lag > settings.REPLICA_MAX_LAG:
+            logger.warning("Replica %s is %.1fs behind, reading from the primary", alias, lag)
+            return False
+        return True
+
+
+replica_monitor = ReplicaMonitor()
+
+
+class ReplicaRouter:
+    """
+    Sends reads of safe, non-admin requests to a healthy replica that is within
+    REPLICA_MAX_LAG of the primary. Writes, and every query after a write in the
+    same request, go to the primary, as does everything outside a request.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or routing.pinned:
+            return 'default'
+        if routing.alias is None or not replica_monitor.usable(routing.alias):
+            replicas = [alias for alias in settings.REPLICA_DATABASES if replica_monitor.usable(alias)]
+            routing.alias = random.choice(replicas) if replicas else None
+        return routing.alias or 'default'
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
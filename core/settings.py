@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -94,6 +95,8 @@ INSTALLED_APPS += ['dal', 'dal_select2']
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.SnapshotMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -127,6 +130,20 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connections come from a psycopg pool in each process (web workers and management
+# commands alike), so requests stop paying for a new TCP/TLS connection and login.
+# CONN_HEALTH_CHECKS makes the pool check a connection before handing it out.
+# DB_POOL=false falls back to persistent per-thread connections (CONN_MAX_AGE).
+DB_POOL = os.getenv('DB_POOL', 'true').lower() == 'true'
+
+DB_POOL_OPTIONS = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),  # seconds to wait for a free connection
+    'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 600)),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -135,9 +152,93 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASS'),  # PostgreSQL password
         'HOST': os.getenv('DB_HOST'),  # Example: 'localhost' or SiteGround's PostgreSQL host address
         'PORT': os.getenv('DB_PORT'),  # PostgreSQL port (default is 5432)
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pool': DB_POOL_OPTIONS} if DB_POOL else {},
     }
 }
 
+# Read replicas, as comma separated host[:port][/name] entries that share the primary's
+# credentials, e.g. DB_REPLICAS=replica-1.internal,replica-2.internal. Two databases on
+# one local server work too: DB_REPLICAS=localhost:5432/zenrenne_replica.
+# core.db_router.ReplicaRouter sends reads of GET API requests to them.
+REPLICA_DATABASES = []
+for index, entry in enumerate(filter(None, (part.strip() for part in os.getenv('DB_REPLICAS', '').split(',')))):
+    address, _, name = entry.partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'OPTIONS': {**DATABASES['default']['OPTIONS'], 'connect_timeout': 2},  # an unreachable replica must fail fast
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Replicas further behind than this are skipped, and reads within this many seconds
+# of a write to the data they cover go to the primary
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 5))
+REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Two tiers: a small LRU inside each gunicorn worker in front of a cache shared by all
+# workers. The shared tier defaults to a local file cache; point CACHE_BACKEND and
+# CACHE_LOCATION at e.g. django.core.cache.backends.redis.RedisCache and a redis:// URL
+# to share it across machines.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'api.cache_backends.TwoTierCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', 500)),
+            'L1_TIMEOUT': int(os.getenv('CACHE_L1_TIMEOUT', 60)),
+        },
+    },
+    'shared': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'zenrenne_cache')),
+    },
+}
+
+if CACHE_BACKEND.endswith('FileBasedCache'):
+    CACHES['shared']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))}
+
+
+# Catalog snapshots (see the build_snapshot command). With SERVE_SNAPSHOTS on, read
+# endpoints are answered from the prebuilt files in the SNAPSHOT_STORAGE backend while
+# the model versions match the build's, so build_snapshot must use the same shared cache.
+SERVE_SNAPSHOTS = os.getenv('SERVE_SNAPSHOTS', 'false').lower() == 'true'
+SNAPSHOT_STORAGE = os.getenv('SNAPSHOT_STORAGE', 'default')
+SNAPSHOT_PREFIX = 'snapshots/'
+SNAPSHOT_BASE_URL = os.getenv('SNAPSHOT_BASE_URL', 'https://zenrenne-backend.onrender.com')
+
+
+# Serve the main read endpoints from the async views in api/async_views.py. Meant for
+# the ASGI deployment (gunicorn with uvicorn workers, see render.yaml); under WSGI each
+# async view gets its own event loop and only the concurrent fetches inside it help.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
+
+if ASYNC_VIEWS and not DEBUG:
+    # Static files come from S3 outside DEBUG, and WhiteNoise is sync-only middleware
+    # that would push every request through a thread
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
+# Processes used to render responsive image derivatives (see api/images.py)
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv('IMAGE_DERIVATIVE_WORKERS', 2))
+
+# Used to decode audio tracks for waveform peaks (see api/audio.py); unset, the binary
+# bundled with imageio-ffmpeg is used
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -175,6 +276,19 @@ USE_TZ = True
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST framework
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Allows all domains to make requests
 
@@ -24,6 +24,9 @@ urlpatterns = [
     path('api/', include('api.urls')),
 ]
 
+if settings.ASYNC_VIEWS:
+    urlpatterns.insert(1, path('api/', include('api.async_urls')))
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     import debug_toolbar